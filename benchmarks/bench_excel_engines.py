@@ -0,0 +1,106 @@
+"""
+Excel 解析引擎 / 并行解析基准测试
+在项目的多行表头工作簿上对比 openpyxl 与 python-calamine（已安装时）的 read_all_excel 耗时，
+并检查不同引擎的解析结果是否一致；--workers > 1 时再以多进程并行解析，
+校验其结果（含 dtype）与逐个解析完全一致。默认使用 main.py 中的考核评估总表与补充材料表头配置。
+
+用法:
+    python benchmarks/bench_excel_engines.py
+    python benchmarks/bench_excel_engines.py data/detailed_data/江北区-25-06.xlsx --repeat 5 --workers 4
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+from main import ASSESSMENT_FILE, ASSESSMENT_HEADER, SUPPLEMENTARY_HEADER
+from utils.file_io import _calamine_available, read_all_excel
+
+DETAILED_DATA_DIR = _PROJECT_ROOT / "data" / "detailed_data"
+
+
+def default_workbooks():
+    """考核评估总表 + 补充材料目录下的全部工作簿，返回 [(path, header), ...]"""
+    books = []
+    assessment = _PROJECT_ROOT / ASSESSMENT_FILE
+    if assessment.exists():
+        books.append((assessment, ASSESSMENT_HEADER))
+    if DETAILED_DATA_DIR.exists():
+        for path in sorted(DETAILED_DATA_DIR.glob("*.xls*")):
+            books.append((path, SUPPLEMENTARY_HEADER))
+    return books
+
+
+def compare(left, right):
+    """返回不一致的 sheet 列表"""
+    mismatched = []
+    if list(left) != list(right):
+        return ["<sheet 列表不同>"]
+    for name in left:
+        try:
+            pd.testing.assert_frame_equal(left[name], right[name], check_exact=True)
+        except AssertionError:
+            mismatched.append(name)
+    return mismatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("files", nargs="*", help="工作簿路径（默认使用 data/ 下的项目数据）")
+    parser.add_argument("--header", default=None, help="表头配置 JSON（指定 files 时使用，默认 SUPPLEMENTARY_HEADER）")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4, help="并行解析的进程数（<=1 时跳过并行校验）")
+    args = parser.parse_args()
+
+    if args.files:
+        header = json.loads(args.header) if args.header else SUPPLEMENTARY_HEADER
+        books = [(Path(f), header) for f in args.files]
+    else:
+        books = default_workbooks()
+    if not books:
+        print("未找到工作簿，请通过参数指定")
+        sys.exit(1)
+
+    engines = ["openpyxl"]
+    if _calamine_available():
+        engines.append("calamine")
+    else:
+        print("python-calamine 未安装，仅测试 openpyxl（pip install python-calamine）")
+
+    print(f"{'工作簿':<30}{'引擎':<10}{'最佳耗时':>10}{'sheet 数':>9}")
+    for path, header in books:
+        results = {}
+        for engine in engines:
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                dfs = read_all_excel(path, header=header, use_cache=False, max_workers=1, engine=engine)
+                best = min(best, time.perf_counter() - start)
+            results[engine] = dfs
+            print(f"{path.name:<30}{engine:<10}{best:>9.2f}s{len(dfs):>9}")
+        if len(results) > 1:
+            mismatched = compare(results["openpyxl"], results["calamine"])
+            print(f"{'':<30}结果一致: {'OK' if not mismatched else '不一致 ' + str(mismatched)}")
+        if args.workers > 1:
+            engine = engines[-1]
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                dfs = read_all_excel(path, header=header, use_cache=False, max_workers=args.workers, engine=engine)
+                best = min(best, time.perf_counter() - start)
+            label = f"{engine}x{args.workers}"
+            print(f"{path.name:<30}{label:<10}{best:>9.2f}s{len(dfs):>9}")
+            mismatched = compare(results[engine], dfs)
+            print(f"{'':<30}并行与逐个解析一致: {'OK' if not mismatched else '不一致 ' + str(mismatched)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Prompt 模板渲染基准测试与回归校验
+对比每次渲染都重新读取源码 + 解析 AST + 计算引用变量的旧流程与 PromptRenderer 的编译缓存
+（含 auto_reload 的 mtime 检查与关闭 auto_reload 两种模式），校验 prompts/ 下各模板渲染结果一致。
+
+用法:
+    python benchmarks/bench_prompt_render.py [--repeat 2000]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from jinja2 import meta
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+from utils.prompt_renderer import PromptRenderer
+
+# 各模板的典型填充变量
+CASES = {
+    "data_analysis_system.j2": {},
+    "data_analysis_user.j2": {
+        "region_name": "渝北区",
+        "assessment_schema": "【Sheet 1】 \"考核评估数据\"\n    [0] 区县 > 名称 > 名称  (str)\n" * 50,
+        "max_queries": 5,
+        "task_instruction": "",
+    },
+    "doc_writing_system.j2": {},
+    "doc_writing_user.j2": {
+        "analysis_result": "### 查询: ...\n\n分析结果正文。\n" * 200,
+        "df_text": "",
+        "region_name": "渝北区",
+    },
+    "doc_writing_map_user.j2": {
+        "kind": "数据分析结果",
+        "chunk": "### 查询: ...\n\n分析结果正文。\n" * 200,
+        "chunk_index": 1,
+        "chunk_count": 6,
+        "region_name": "渝北区",
+    },
+    "doc_writing_reduce_user.j2": {
+        "section_summaries": "【数据分析结果 1】\n要点摘要。\n" * 30,
+        "df_text": "",
+        "region_name": "渝北区",
+    },
+    "rewriting_system.j2": {},
+    "rewriting_chunk_user.j2": {
+        "chunk": "## 二、亮点与问题\n\n正文段落。\n" * 20,
+        "chunk_index": 2,
+        "chunk_count": 5,
+        "title": "渝北区软件产业分析报告",
+        "outline": "- 一、总体概述\n- 二、亮点与问题\n- 三、分析与建议",
+    },
+}
+
+
+def render_uncached(renderer: PromptRenderer, template_name: str, **kwargs) -> str:
+    """优化前的渲染流程（基准对照）"""
+    env = renderer.env
+    template = env.get_template(template_name)
+    source = env.loader.get_source(env, template_name)[0]
+    template_vars = meta.find_undeclared_variables(env.parse(source))
+    _ = set(kwargs.keys()) - template_vars
+    return template.render(**kwargs).strip()
+
+
+def best_time(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    reload_renderer = PromptRenderer(auto_reload=True, bytecode_cache_dir=None)
+    static_renderer = PromptRenderer(auto_reload=False, bytecode_cache_dir=None)
+    static_renderer.precompile()
+
+    print(f"{'模板':<26}{'旧流程':>10}{'缓存(mtime)':>14}{'缓存(静态)':>12}")
+    for name, kwargs in CASES.items():
+        expected = render_uncached(reload_renderer, name, **kwargs)
+        assert reload_renderer.render(name, **kwargs) == expected, name
+        assert static_renderer.render(name, **kwargs) == expected, name
+
+        old = best_time(lambda: render_uncached(reload_renderer, name, **kwargs), args.repeat)
+        cached = best_time(lambda: reload_renderer.render(name, **kwargs), args.repeat)
+        static = best_time(lambda: static_renderer.render(name, **kwargs), args.repeat)
+        print(f"{name:<26}{old * 1e6:>8.0f}us{cached * 1e6:>12.0f}us{static * 1e6:>10.0f}us")
+    print("输出一致: OK")
+
+
+if __name__ == "__main__":
+    main()
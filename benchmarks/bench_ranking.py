@@ -0,0 +1,106 @@
+"""
+排名列基准测试
+对比逐列实现与 utils.ranking.add_ranking_columns 在宽表（默认 600 列、MultiIndex 三层表头）上的
+耗时与峰值内存，并校验两者输出完全一致。
+
+用法: python benchmarks/bench_ranking.py [--rows 2000] [--cols 600] [--repeat 3]
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+from utils.ranking import add_ranking_columns
+
+
+def add_ranking_columns_per_column(df: pd.DataFrame, ignore_columns) -> pd.DataFrame:
+    """优化前的逐列实现（基准对照）"""
+    ignore_set = {ignore_columns} if isinstance(ignore_columns, int) else set(ignore_columns)
+    new_data = {}
+    for col_idx, col in enumerate(df.columns):
+        series = df.iloc[:, col_idx]
+        new_data[col] = series
+        if col_idx in ignore_set:
+            continue
+        if pd.api.types.is_numeric_dtype(series):
+            rank_series = series.rank(ascending=False, method="min").astype("Int64")
+            if isinstance(df.columns, pd.MultiIndex):
+                new_name = (*col[:-1], str(col[-1]) + "排名")
+            else:
+                new_name = str(col) + "排名"
+            new_data[new_name] = rank_series
+    return pd.DataFrame(new_data)
+
+
+def make_table(rows: int, cols: int, seed: int = 0) -> pd.DataFrame:
+    """构造与考核评估表结构相近的宽表：前两列为名称/序号，其余为带缺失值的 float / int 指标"""
+    rng = np.random.default_rng(seed)
+    data = {
+        0: [f"地区{i}" for i in range(rows)],
+        1: np.arange(rows),
+    }
+    for j in range(2, cols):
+        if j % 3 == 0:
+            data[j] = rng.integers(0, 100, rows)
+        else:
+            values = rng.normal(size=rows)
+            values[rng.random(rows) < 0.05] = np.nan
+            data[j] = values
+    df = pd.DataFrame(data)
+    df.columns = pd.MultiIndex.from_tuples(
+        [("区县", "名称", "名称"), ("区县", "序号", "序号")]
+        + [(f"一级{j // 50}", f"二级{j // 10}", f"指标{j}") for j in range(2, cols)]
+    )
+    return df
+
+
+def measure(func, df: pd.DataFrame, repeat: int):
+    """返回 (最佳耗时秒, 峰值内存 MB, 结果)"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df, [0, 1])
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(df, [0, 1])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / (1024 * 1024), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--cols", type=int, default=600)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_table(args.rows, args.cols)
+    print(f"表大小: {df.shape[0]} 行 × {df.shape[1]} 列")
+
+    old_time, old_peak, old_result = measure(add_ranking_columns_per_column, df, args.repeat)
+    new_time, new_peak, new_result = measure(add_ranking_columns, df, args.repeat)
+
+    pd.testing.assert_frame_equal(old_result, new_result, check_exact=True)
+    assert list(old_result.columns.names) == list(new_result.columns.names)
+    print("输出一致: OK")
+
+    print(f"{'实现':<12}{'耗时':>12}{'峰值内存':>14}")
+    print(f"{'逐列':<12}{old_time * 1000:>10.1f}ms{old_peak:>12.1f}MB")
+    print(f"{'向量化':<12}{new_time * 1000:>10.1f}ms{new_peak:>12.1f}MB")
+    print(f"加速比: {old_time / new_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+表结构描述（列画像）基准测试与回归校验
+对比逐列 nunique / dropna 的旧实现与 utils.data_inspector.profile_columns 的单次列式画像，
+在 CSV 风格的大表（高基数 ID、低基数类别、含缺失数值、全空列、Int64、日期）上
+校验 describe_dataframes_schema 输出文本完全一致，并比较耗时。
+
+用法:
+    python benchmarks/bench_schema_profile.py [--rows 200000] [--cols 40] [--repeat 3]
+    python benchmarks/bench_schema_profile.py data/insightbench/dataset_1/data.csv data/daco/db_1/*.csv
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+from utils.data_inspector import _describe_sheet_columns, _truncate_str
+
+# (max_sample_rows, max_unique_values)：DACO 初始规划 / 每步筛选 / 默认参数
+PARAM_SETS = [(3, 10), (0, 10), (3, 0), (0, 0)]
+
+
+def _get_sample_values(series: pd.Series, n: int = 3, max_str_len: int = 30) -> str:
+    non_null = series.dropna()
+    if len(non_null) == 0:
+        return "[全部为空]"
+    samples = non_null.head(n).tolist()
+    formatted = [repr(_truncate_str(v, max_str_len)) for v in samples]
+    null_count = series.isna().sum()
+    suffix = f"  (空值数: {null_count})" if null_count > 0 else ""
+    return f"[{', '.join(formatted)}]{suffix}"
+
+
+def describe_per_column(df: pd.DataFrame, max_sample_rows: int, max_unique_values: int):
+    """优化前的逐列实现（基准对照）"""
+    is_multi = isinstance(df.columns, pd.MultiIndex)
+    lines = [f"  表头: MultiIndex({df.columns.nlevels}层)" if is_multi else "  表头: 单层"]
+    for col_idx, col in enumerate(df.columns):
+        if is_multi:
+            label = " > ".join(str(c).replace('\n', '\\n') for c in col)
+        else:
+            label = '"' + str(col).replace('\n', '\\n') + '"'
+        series = df.iloc[:, col_idx]
+        col_line = f"    [{col_idx}] {label}  ({series.dtype})"
+        if max_sample_rows > 0:
+            col_line += f"  示例: {_get_sample_values(series, max_sample_rows)}"
+        if max_unique_values > 0:
+            nunique = series.nunique()
+            if 0 < nunique <= max_unique_values:
+                uniques = [_truncate_str(v) for v in series.dropna().unique().tolist()]
+                col_line += f"  唯一值: {uniques}"
+        lines.append(col_line)
+    return lines
+
+
+def make_table(rows: int, cols: int, seed: int = 0) -> pd.DataFrame:
+    """构造 CSV 风格的大表：pd.read_csv 常见的各类列混合"""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for j in range(cols):
+        kind = j % 8
+        if kind == 0:
+            data[f"id_{j}"] = np.arange(rows)
+        elif kind == 1:
+            values = pd.Series(rng.choice(["Hardware", "Software", "Network", "Database"], rows))
+            values[rng.random(rows) < 0.1] = None
+            data[f"category_{j}"] = values
+        elif kind == 2:
+            values = rng.normal(size=rows)
+            values[rng.random(rows) < 0.2] = np.nan
+            data[f"metric_{j}"] = values
+        elif kind == 3:
+            data[f"description_{j}"] = [f"ticket {i}: a fairly long free-text description line" for i in range(rows)]
+        elif kind == 4:
+            data[f"empty_{j}"] = np.full(rows, np.nan)
+        elif kind == 5:
+            values = pd.array(rng.integers(1, 6, rows), dtype="Int64")
+            values[rng.random(rows) < 0.05] = pd.NA
+            data[f"priority_{j}"] = values
+        elif kind == 6:
+            data[f"opened_at_{j}"] = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")
+        else:
+            values = rng.integers(0, 3, rows).astype(float)
+            values[:rows // 2] = np.nan
+            data[f"flag_{j}"] = values
+    return pd.DataFrame(data)
+
+
+def best_time(func, df: pd.DataFrame, params, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(df, *params)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("files", nargs="*", help="可选：额外校验的 CSV 文件（如 InsightBench / DACO 数据表）")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--cols", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cases = {"合成大表": make_table(args.rows, args.cols)}
+    multi = make_table(args.rows // 10, args.cols, seed=1)
+    multi.columns = pd.MultiIndex.from_tuples([(f"组{j // 4}", c) for j, c in enumerate(multi.columns)])
+    cases["合成大表(MultiIndex)"] = multi
+    for path in args.files:
+        cases[Path(path).name] = pd.read_csv(path)
+
+    print(f"{'用例':<26}{'形状':>14}{'参数':>10}{'旧实现':>10}{'新实现':>10}")
+    for label, df in cases.items():
+        for params in PARAM_SETS:
+            expected = describe_per_column(df, *params)
+            assert _describe_sheet_columns(df, *params) == expected, (label, params)
+            old = best_time(describe_per_column, df, params, args.repeat)
+            new = best_time(_describe_sheet_columns, df, params, args.repeat)
+            shape = f"{df.shape[0]}x{df.shape[1]}"
+            print(f"{label:<26}{shape:>14}{str(params):>10}{old * 1000:>8.1f}ms{new * 1000:>8.1f}ms")
+    print("输出一致: OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,17 @@ from typing import List, Dict, Any, Tuple, Optional
 import tempfile
 
 
-from utils import logger
+from utils import logger, tracing
 from utils.prompts import SIMPLE_AGENT_SYSTEM_PROMPT, SIMPLE_AGENT_DEBUG_TEMPLATE, get_simple_agent_var_instruction
-from utils.temp_file import get_var_storage_info, save_variable_to_temp
+from utils.temp_file import acquire_variable_file, release_variable_file
 from utils.helper import extract_code_from_response, build_variable_preamble
+from utils.worker_pool import get_worker_pool
 from llm import OpenAILikeLLM, LLMConfig
 load_dotenv()
 
+# 是否默认使用常驻预热工作进程池执行代码（设为 0 则每步启动独立子进程）
+_USE_WORKER_POOL = os.getenv("CODE_AGENT_WORKER_POOL", "1") != "0"
+
 
 class CodeAgent:
     """
@@ -20,7 +24,7 @@ class CodeAgent:
     
     工作原理：
     1. 将任务描述发送给 LLM，要求它生成 Python 代码（用 <code></code> 包裹）
-    2. 提取代码块，保存为临时 .py 文件并用当前 Python 环境执行
+    2. 提取代码块，交给常驻预热工作进程执行（或保存为临时 .py 文件用独立子进程执行）
     3. 如果执行成功，返回 stdout 输出作为结果
     4. 如果执行失败，将错误信息反馈给 LLM 进行 debug，重新生成代码
     5. 重复直到成功或达到 max_steps 次数限制
@@ -30,7 +34,9 @@ class CodeAgent:
         api_base: API 基础 URL
         api_key: API 密钥
         additional_authorized_imports: 允许使用的额外 Python 库（仅做提示，不做强制限制）
-        **kwargs: 传递给 LLMConfig 的额外参数 (temperature, top_p, seed, max_tokens 等)
+        **kwargs: 传递给 LLMConfig 的额外参数 (temperature, top_p, seed, max_tokens 等)，
+            以及 execution_timeout（单步代码执行超时秒数）、
+            use_worker_pool（是否使用常驻工作进程池，默认读取 CODE_AGENT_WORKER_POOL）
     """
 
     def __init__(
@@ -54,6 +60,7 @@ class CodeAgent:
         self.llm.set_system_prompt(SIMPLE_AGENT_SYSTEM_PROMPT)
         self.imports = additional_authorized_imports
         self.execution_timeout = kwargs.get('execution_timeout', 60)
+        self.use_worker_pool = kwargs.get('use_worker_pool', _USE_WORKER_POOL)
 
     def run(
         self,
@@ -79,9 +86,9 @@ class CodeAgent:
 
         try:
             for key, value in additional_args.items():
-                suffix, type_name = get_var_storage_info(value)
-                temp_path = save_variable_to_temp(key, value, suffix, type_name)
-                logger.info(f"[CodeAgent] 变量 '{key}' 保存到临时文件: {temp_path}")
+                # DataFrame 走内容寻址缓存：相同内容只序列化一次，跨查询 / 重试复用
+                temp_path, type_name = acquire_variable_file(key, value)
+                logger.info(f"[CodeAgent] 变量 '{key}' 使用临时文件: {temp_path}")
                 file_paths[key] = temp_path
                 var_paths[key] = temp_path
                 var_type_info[key] = type_name
@@ -93,17 +100,19 @@ class CodeAgent:
             # 清空对话历史，开始新会话
             self.llm.clear_history()
 
-            result = self._run_loop(full_query, var_paths, max_steps)
+            with tracing.span("code_agent", model=self.llm.config.model, max_steps=max_steps) as sp:
+                result = self._run_loop(full_query, var_paths, var_type_info, max_steps)
+                sp.set(success=result is not None)
             return result
 
         except Exception as e:
             logger.error(f"[CodeAgent] 运行出错: {e}")
             return None
         finally:
-            # 清理临时文件
+            # 释放临时文件（缓存文件仅减少引用计数，其余直接删除）
             for temp_path in file_paths.values():
                 try:
-                    os.remove(temp_path)
+                    release_variable_file(temp_path)
                 except Exception as e:
                     logger.error(f"[CodeAgent] 无法删除临时文件 {temp_path}: {e}")
 
@@ -111,6 +120,7 @@ class CodeAgent:
         self,
         query: str,
         var_paths: Dict[str, str],
+        var_type_info: Dict[str, str],
         max_steps: int,
     ) -> Optional[str]:
         """核心执行循环：生成代码 → 执行 → 成功则返回 / 失败则 debug 重试。"""
@@ -123,7 +133,8 @@ class CodeAgent:
         logger.info(separator)
         logger.log_to_file(query, label="PROMPT")
 
-        response = self.llm.chat(query, keep_history=True)
+        with tracing.span("code_agent.llm", step=1, kind="generate"):
+            response = self.llm.chat(query, keep_history=True)
         code = extract_code_from_response(response.content)
 
         if code is None:
@@ -139,7 +150,9 @@ class CodeAgent:
             logger.info(separator)
             logger.log_to_file(code, label="CODE")
 
-            success, output = self._execute_code(code, var_paths)
+            with tracing.span("code_agent.execute", step=step) as sp:
+                success, output = self._execute_code(code, var_paths, var_type_info)
+                sp.set(success=success)
 
             if success:
                 logger.info(f"\n{separator}")
@@ -168,7 +181,8 @@ class CodeAgent:
             debug_msg = SIMPLE_AGENT_DEBUG_TEMPLATE.format(code=code, error=output)
             logger.log_to_file(debug_msg, label="DEBUG_PROMPT")
             
-            response = self.llm.chat(debug_msg, keep_history=True)
+            with tracing.span("code_agent.llm", step=step + 1, kind="debug"):
+                response = self.llm.chat(debug_msg, keep_history=True)
             new_code = extract_code_from_response(response.content)
 
             if new_code is None:
@@ -188,21 +202,43 @@ class CodeAgent:
     )
 
     def _execute_code(
-        self, code: str, var_paths: Dict[str, str]
+        self, code: str, var_paths: Dict[str, str], var_type_info: Optional[Dict[str, str]] = None
     ) -> Tuple[bool, str]:
-        """将代码保存到临时 .py 文件并用当前 Python 环境执行。
+        """注入前置代码后执行。优先使用常驻工作进程池，不可用时回退到独立子进程。
         
         返回:
             (success: bool, output: str) - 成功时 output 为 stdout，失败时为 stderr
         """
         # 在代码顶部注入 final_answer shim + 变量路径赋值
         preamble_parts = [self._FINAL_ANSWER_SHIM]
-        var_preamble = build_variable_preamble(var_paths)
+        var_preamble = build_variable_preamble(var_paths, var_type_info)
         if var_preamble:
             preamble_parts.append(var_preamble)
         preamble = "\n".join(preamble_parts)
         full_code = preamble + "\n\n" + code
 
+        if self.use_worker_pool:
+            try:
+                pool = get_worker_pool()
+            except Exception as e:
+                logger.warning(f"[CodeAgent] 工作进程池不可用，回退到独立子进程: {e}")
+            else:
+                try:
+                    success, stdout, stderr = pool.run(
+                        full_code,
+                        timeout=self.execution_timeout,
+                        cwd=os.getcwd(),
+                    )
+                except TimeoutError:
+                    return False, f"代码执行超时（超过 {self.execution_timeout} 秒）"
+                except Exception as e:
+                    return False, f"执行代码时出现异常: {type(e).__name__}: {e}"
+                return self._format_execution_result(success, stdout, stderr)
+
+        return self._execute_code_subprocess(full_code)
+
+    def _execute_code_subprocess(self, full_code: str) -> Tuple[bool, str]:
+        """将代码保存到临时 .py 文件并用当前 Python 环境在独立子进程中执行。"""
         # 写入临时 .py 文件
         temp_fd, temp_script = tempfile.mkstemp(suffix='.py', prefix='simple_agent_')
         try:
@@ -217,15 +253,9 @@ class CodeAgent:
                 timeout=self.execution_timeout,
                 cwd=os.getcwd(),
             )
-
-            if result.returncode == 0:
-                return True, result.stdout
-            else:
-                # 合并 stderr 和 stdout（有些错误信息可能在 stdout 里）
-                error_output = result.stderr
-                if result.stdout:
-                    error_output = f"stdout:\n{result.stdout}\nstderr:\n{error_output}"
-                return False, error_output
+            return self._format_execution_result(
+                result.returncode == 0, result.stdout, result.stderr
+            )
 
         except subprocess.TimeoutExpired:
             return False, f"代码执行超时（超过 {self.execution_timeout} 秒）"
@@ -237,6 +267,18 @@ class CodeAgent:
             except OSError:
                 pass
 
+    @staticmethod
+    def _format_execution_result(
+        success: bool, stdout: str, stderr: str
+    ) -> Tuple[bool, str]:
+        """成功时返回 stdout；失败时合并 stderr 和 stdout（有些错误信息可能在 stdout 里）。"""
+        if success:
+            return True, stdout
+        error_output = stderr
+        if stdout:
+            error_output = f"stdout:\n{stdout}\nstderr:\n{error_output}"
+        return False, error_output
+
 
 def create_code_agent(
     model: str,
@@ -4,26 +4,35 @@
 利用 LLM 生成分析查询指令，并通过 DataInspectorMCPTool 执行多轮数据分析。
 """
 
+import contextvars
 import json
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Dict, List, Optional, Union, Any
 
 import pandas as pd
 
 from llm import BaseLLM
-from utils import logger
+from utils import logger, tracing
 from utils.data_inspector import (
     describe_dataframes_schema,
     DataInspectorMCPTool,
 )
 from utils.file_io import read_all_excel
+from utils.lazy_workbook import LazySheet, materialize_sheets, open_lazy_workbook
 from utils.prompt_renderer import render_prompt
+from utils.schema_renderer import default_token_budget, render_compact_schema
 
 
 # 补充材料默认目录
 _DETAILED_DATA_DIR = Path(__file__).parent / "data" / "detailed_data"
 
+# 查询并发执行的默认最大并发数（可通过环境变量 MAX_CONCURRENT_QUERIES 覆盖，
+# 或在 code_agent_kwargs 中传入 "max_concurrency"）
+_DEFAULT_MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENT_QUERIES", "4"))
+
 
 # ============================================================
 # 主入口
@@ -37,6 +46,7 @@ def analyze_data(
     max_queries: int = 5,
     schema_max_sample_rows: int = 3,
     schema_max_unique_values: int = 8,
+    schema_token_budget: Optional[int] = None,
     code_agent_model: Optional[str] = None,
     code_agent_kwargs: Optional[Dict[str, Any]] = None,
 ) -> List[Dict[str, str]]:
@@ -46,7 +56,7 @@ def analyze_data(
     流程:
         1. 使用 describe_dataframes_schema 获取所有表的结构
         2. 将结构信息 + task_instruction 发送给 LLM，生成多条查询指令
-        3. 通过 DataInspectorMCPTool 逐条执行查询
+        3. 通过 DataInspectorMCPTool 并发执行查询（结果保持规划顺序）
         4. 返回每条查询的结果列表
 
     Args:
@@ -56,8 +66,11 @@ def analyze_data(
         max_queries: LLM 最多生成的查询指令数量
         schema_max_sample_rows: schema 描述中每列展示的示例行数
         schema_max_unique_values: schema 描述中展示 unique 值的最大数量
+        schema_token_budget: 规划 prompt 与每条查询 prompt 中 schema 的 token 预算
+            （None 时读取 SCHEMA_TOKEN_BUDGET，>0 时使用紧凑格式，0 表示原格式）
         code_agent_model: 执行查询所用的 CodeAgent 模型
         code_agent_kwargs: 传递给 query_dataframes 的额外参数
+            （可含 "max_steps" 与 "max_concurrency"）
 
     Returns:
         List[Dict[str, str]]: 每项为 {"query": str, "result": str}
@@ -65,10 +78,13 @@ def analyze_data(
     code_agent_kwargs = code_agent_kwargs or {}
 
     # ---- Step 1: 生成 Schema ----
-    full_schema = describe_dataframes_schema(
+    if schema_token_budget is None:
+        schema_token_budget = default_token_budget()
+    full_schema = _build_schema(
         dfs,
         max_sample_rows=schema_max_sample_rows,
         max_unique_values=schema_max_unique_values,
+        token_budget=schema_token_budget,
     )
 
     # ---- Step 2: LLM 生成查询指令 ----
@@ -85,13 +101,14 @@ def analyze_data(
         logger.warning("[analyze_data] LLM 未生成任何有效查询指令")
         return []
 
-    # ---- Step 3: 逐条执行查询 ----
+    # ---- Step 3: 并发执行查询 ----
     return _execute_queries(
         query_instructions=query_instructions,
         all_dfs=dfs,
         code_agent_model=code_agent_model,
         code_agent_kwargs=code_agent_kwargs,
         log_prefix="analyze_data",
+        schema_token_budget=schema_token_budget,
     )
 
 
@@ -105,6 +122,8 @@ def analyze_region(
     max_queries: int = 5,
     code_agent_model: Optional[str] = None,
     code_agent_kwargs: Optional[Dict[str, Any]] = None,
+    lazy_load: bool = False,
+    schema_token_budget: Optional[int] = None,
 ) -> str:
     """
     对指定地区进行完整的数据分析。
@@ -113,7 +132,7 @@ def analyze_region(
         1. 在 detailed_data 目录下查找文件名包含地区名原文的 Excel 补充材料
         2. 使用 describe_dataframes_schema 获取考核数据 + 补充材料的表结构
         3. 将结构信息发送给 LLM，生成多条自然语言查询指令
-        4. 通过 DataInspectorMCPTool 逐条执行查询
+        4. 通过 DataInspectorMCPTool 并发执行查询（结果保持规划顺序）
         5. 将所有查询结果拼接为完整字符串返回
 
     Args:
@@ -125,6 +144,12 @@ def analyze_region(
         max_queries: LLM 最多生成的查询指令数量，默认 5
         code_agent_model: 执行查询所用的 CodeAgent 模型（默认 None → 使用环境变量）
         code_agent_kwargs: 传递给 query_dataframes 的额外参数
+            （可含 "max_steps" 与 "max_concurrency"）
+        lazy_load: 是否按需加载补充材料（默认 False）：规划阶段只读取各 sheet 的前若干行
+            与行数，完整数据仅在查询被路由到该 sheet 时才解析；此时规划用 schema 中未加载 sheet 的
+            列类型 / 示例值 / 唯一值来自预览行，行数可能为估计值（schema 中会注明）
+        schema_token_budget: 规划 prompt 与每条查询 prompt 中 schema 的 token 预算
+            （None 时读取 SCHEMA_TOKEN_BUDGET，>0 时使用紧凑格式，0 表示原格式）
 
     Returns:
         str: 所有查询结果拼接的完整分析字符串
@@ -143,11 +168,15 @@ def analyze_region(
     # 考核评估数据
     assessment_dfs = {"考核评估数据": assessment_df}
 
-    # 补充材料
-    supplementary_dfs: Dict[str, pd.DataFrame] = {}
+    # 补充材料（lazy_load 时为 LazySheet，查询时再加载）
+    supplementary_dfs: Dict[str, Union[pd.DataFrame, LazySheet]] = {}
     for file_path in supplementary_files:
         try:
-            file_dfs = read_all_excel(file_path, header=supplementary_header)
+            with tracing.span("excel.load", file=file_path.name, lazy=lazy_load):
+                if lazy_load:
+                    file_dfs = open_lazy_workbook(file_path, header=supplementary_header)
+                else:
+                    file_dfs = read_all_excel(file_path, header=supplementary_header)
             file_name = file_path.stem
             for sheet_name, df in file_dfs.items():
                 key = f"{file_name}__{sheet_name}"
@@ -159,12 +188,15 @@ def analyze_region(
         f"[{region_name}] 数据读取完成 — "
         f"考核数据: {assessment_df.shape}, "
         f"补充材料: {len(supplementary_dfs)} 个 Sheet"
+        + ("（按需加载）" if lazy_load else "")
     )
 
     # ---- Step 3: LLM 生成查询指令 ----
     # 合并 schema 用于 LLM 规划（LLM 需要看到所有表的结构才能决定每条查询用哪些表）
     all_dfs = {**assessment_dfs, **supplementary_dfs}
-    full_schema = describe_dataframes_schema(all_dfs)
+    if schema_token_budget is None:
+        schema_token_budget = default_token_budget()
+    full_schema = _build_schema(all_dfs, token_budget=schema_token_budget)
 
     query_instructions = _generate_query_instructions(
         llm=llm,
@@ -181,15 +213,25 @@ def analyze_region(
         logger.warning(f"[{region_name}] LLM 未生成任何有效查询指令")
         return f"# {region_name} 数据分析报告\n\n未能生成有效的查询指令，请检查输入数据和 LLM 配置。"
 
-    # ---- Step 4: 逐条执行查询 ----
+    # ---- Step 4: 并发执行查询 ----
     query_results = _execute_queries(
         query_instructions=query_instructions,
         all_dfs=all_dfs,
         code_agent_model=code_agent_model,
         code_agent_kwargs=code_agent_kwargs,
         log_prefix=region_name,
+        schema_token_budget=schema_token_budget,
     )
 
+    if lazy_load:
+        loaded = [
+            k for k, v in supplementary_dfs.items()
+            if isinstance(v, LazySheet) and v.is_loaded
+        ]
+        logger.info(
+            f"[{region_name}] 补充材料实际加载 {len(loaded)}/{len(supplementary_dfs)} 个 Sheet: {loaded}"
+        )
+
     # ---- Step 5: 汇总结果 ----
     results = []
     for qr in query_results:
@@ -240,101 +282,213 @@ def _find_supplementary_files(
     return sorted(matched, key=lambda p: p.name)
 
 
+def _build_schema(
+    dfs: Dict[str, Union[pd.DataFrame, LazySheet]],
+    max_sample_rows: int = 0,
+    max_unique_values: int = 0,
+    token_budget: int = 0,
+) -> str:
+    """
+    生成规划用 schema：token_budget > 0 时使用紧凑格式，否则为 describe_dataframes_schema 原格式。
+    在 trace 内时把紧凑格式相比原格式节省的 token 数记到 schema span 并写入日志
+    （需额外渲染一次原格式，不在 trace 内时跳过）。
+    """
+    with tracing.span("schema", sheets=len(dfs), token_budget=token_budget) as sp:
+        if token_budget > 0:
+            schema = render_compact_schema(
+                dfs, token_budget, max_sample_rows=max_sample_rows, max_unique_values=max_unique_values
+            )
+            sp.set(tokens=schema.tokens)
+            if isinstance(sp, tracing.Span):
+                sp.set(baseline_tokens=schema.baseline_tokens, saved_tokens=schema.saved_tokens)
+                logger.info(
+                    f"[Schema] 紧凑格式节省 {schema.saved_tokens} tokens "
+                    f"({schema.baseline_tokens} → {schema.tokens})"
+                )
+            return schema.text
+        return describe_dataframes_schema(
+            dfs, max_sample_rows=max_sample_rows, max_unique_values=max_unique_values
+        )
+
+
 def _execute_queries(
     query_instructions: List[Dict[str, Any]],
-    all_dfs: Dict[str, pd.DataFrame],
+    all_dfs: Dict[str, Union[pd.DataFrame, LazySheet]],
     code_agent_model: Optional[str],
     code_agent_kwargs: Dict[str, Any],
     log_prefix: str = "",
+    max_concurrency: Optional[int] = None,
+    schema_token_budget: Optional[int] = None,
 ) -> List[Dict[str, str]]:
     """
-    逐条执行查询指令，返回结构化结果列表。
+    并发执行查询指令，返回结构化结果列表（顺序与 query_instructions 一致）。
+
+    各查询之间互不依赖，使用线程池并发执行（每条查询内部的 LLM 调用与
+    子进程执行都是 I/O 等待）。单条查询失败不影响其他查询，失败项以
+    "[查询失败] ..." 的形式返回。
 
     Args:
         query_instructions: [{"query": str, "sheets": List[str]}, ...]
-        all_dfs: 全部可用的 {sheet_name: DataFrame}
+        all_dfs: 全部可用的 {sheet_name: DataFrame | LazySheet}，LazySheet 在被查询选中时才加载
         code_agent_model: CodeAgent 模型名
-        code_agent_kwargs: 额外参数
+        code_agent_kwargs: 额外参数（其中 max_steps / max_concurrency 会被单独取出）
         log_prefix: 日志前缀
+        max_concurrency: 最大并发查询数；None 时依次读取
+            code_agent_kwargs["max_concurrency"] 和 _DEFAULT_MAX_CONCURRENCY
+        schema_token_budget: 每条查询 prompt 中 schema 的 token 预算（None 时读取 SCHEMA_TOKEN_BUDGET）
 
     Returns:
         List[Dict[str, str]]: [{"query": str, "result": str}, ...]
     """
+    if max_concurrency is None:
+        max_concurrency = code_agent_kwargs.get(
+            "max_concurrency", _DEFAULT_MAX_CONCURRENCY
+        )
+    max_concurrency = max(1, min(int(max_concurrency), len(query_instructions) or 1))
+
+    effective_max_steps = code_agent_kwargs.get("max_steps", 3)
+    agent_kwargs = {
+        k: v for k, v in code_agent_kwargs.items()
+        if k not in ("max_steps", "max_concurrency")
+    }
+
     mcp_tool = DataInspectorMCPTool()
-    results: List[Dict[str, str]] = []
-    all_sheet_names = list(all_dfs.keys())
+    total = len(query_instructions)
+    results: List[Optional[Dict[str, str]]] = [None] * total
 
-    for i, instr_item in enumerate(query_instructions, 1):
-        query_text = instr_item["query"]
-        requested_sheets = instr_item.get("sheets", [])
+    logger.info(
+        f"[{log_prefix}] 开始执行 {total} 条查询，最大并发数: {max_concurrency}"
+    )
 
-        logger.info(
-            f"[{log_prefix}] 执行查询 {i}/{len(query_instructions)}: "
-            f"{query_text[:80]}... | sheets={requested_sheets}"
-        )
+    with ThreadPoolExecutor(
+        max_workers=max_concurrency,
+        thread_name_prefix="query",
+    ) as executor:
+        future_to_idx = {
+            # 复制当前上下文，使各查询的 span 挂在调用方的 trace 下
+            executor.submit(
+                contextvars.copy_context().run,
+                _run_single_query,
+                mcp_tool=mcp_tool,
+                index=i,
+                total=total,
+                instr_item=instr_item,
+                all_dfs=all_dfs,
+                code_agent_model=code_agent_model,
+                max_steps=effective_max_steps,
+                agent_kwargs=agent_kwargs,
+                log_prefix=log_prefix,
+                schema_token_budget=schema_token_budget,
+            ): i
+            for i, instr_item in enumerate(query_instructions, 1)
+        }
+        for future in as_completed(future_to_idx):
+            i = future_to_idx[future]
+            query_text = query_instructions[i - 1]["query"]
+            try:
+                results[i - 1] = future.result()
+            except Exception as e:
+                logger.error(f"[{log_prefix}] 查询 {i} 执行异常: {type(e).__name__}: {e}")
+                results[i - 1] = {
+                    "query": query_text,
+                    "result": f"[查询失败] {type(e).__name__}: {e}",
+                }
+
+    return results  # type: ignore[return-value]
+
+
+def _run_single_query(
+    mcp_tool: DataInspectorMCPTool,
+    index: int,
+    total: int,
+    instr_item: Dict[str, Any],
+    all_dfs: Dict[str, Union[pd.DataFrame, LazySheet]],
+    code_agent_model: Optional[str],
+    max_steps: int,
+    agent_kwargs: Dict[str, Any],
+    log_prefix: str = "",
+    schema_token_budget: Optional[int] = None,
+) -> Dict[str, str]:
+    """
+    执行单条查询指令：按 sheets 筛选 DataFrame → 加载选中的 LazySheet → 调用 DataInspectorMCPTool。
 
-        # 筛选出本次查询需要的 DataFrame
-        if requested_sheets:
-            filtered_dfs = {}
-            for sname in requested_sheets:
-                if sname in all_dfs:
-                    filtered_dfs[sname] = all_dfs[sname]
-                else:
-                    matched = [k for k in all_sheet_names if sname in k or k in sname]
-                    if matched:
-                        for m in matched:
-                            filtered_dfs[m] = all_dfs[m]
-                        logger.warning(
-                            f"[{log_prefix}] Sheet '{sname}' 未精确匹配，"
-                            f"模糊匹配到: {matched}"
-                        )
-                    else:
-                        logger.warning(
-                            f"[{log_prefix}] Sheet '{sname}' 不存在，跳过"
-                        )
-            if not filtered_dfs:
-                logger.warning(
-                    f"[{log_prefix}] 查询 {i} 的 sheets 全部无法匹配，"
-                    f"回退使用全部数据"
-                )
-                filtered_dfs = all_dfs
-        else:
-            filtered_dfs = all_dfs
+    Returns:
+        Dict[str, str]: {"query": str, "result": str}
+    """
+    query_text = instr_item["query"]
+    requested_sheets = instr_item.get("sheets", [])
+
+    logger.info(
+        f"[{log_prefix}] 执行查询 {index}/{total}: "
+        f"{query_text[:80]}... | sheets={requested_sheets}"
+    )
+
+    with tracing.span("query", index=index, sheets=requested_sheets) as sp:
+        filtered_dfs = materialize_sheets(_select_query_dfs(
+            requested_sheets, all_dfs, index=index, log_prefix=log_prefix
+        ))
 
         logger.info(
-            f"[{log_prefix}] 查询 {i} 实际使用 {len(filtered_dfs)} 个 Sheet: "
+            f"[{log_prefix}] 查询 {index} 实际使用 {len(filtered_dfs)} 个 Sheet: "
             f"{list(filtered_dfs.keys())}"
         )
 
-        effective_max_steps = code_agent_kwargs.get("max_steps", 3)
-        agent_kwargs = {
-            k: v for k, v in code_agent_kwargs.items() if k != "max_steps"
-        }
-
         result = mcp_tool.run({
             "action": "query",
             "dfs": filtered_dfs,
             "instruction": query_text,
             "model": code_agent_model,
-            "max_steps": effective_max_steps,
+            "max_steps": max_steps,
+            "schema_token_budget": schema_token_budget,
             "agent_kwargs": agent_kwargs,
         })
+        sp.set(success="result" in result)
 
-        if "result" in result:
-            results.append({
-                "query": query_text,
-                "result": result["result"],
-            })
-        else:
-            error_msg = result.get("error", "未知错误")
-            results.append({
-                "query": query_text,
-                "result": f"[查询失败] {error_msg}",
-            })
+    logger.info(f"[{log_prefix}] 查询 {index} 完成")
 
-        logger.info(f"[{log_prefix}] 查询 {i} 完成")
+    if "result" in result:
+        return {"query": query_text, "result": result["result"]}
+    error_msg = result.get("error", "未知错误")
+    return {"query": query_text, "result": f"[查询失败] {error_msg}"}
 
-    return results
+
+def _select_query_dfs(
+    requested_sheets: List[str],
+    all_dfs: Dict[str, Union[pd.DataFrame, LazySheet]],
+    index: int = 0,
+    log_prefix: str = "",
+) -> Dict[str, Union[pd.DataFrame, LazySheet]]:
+    """
+    根据查询指令中的 sheets 字段筛选 DataFrame（精确匹配 → 模糊匹配 → 回退全部）。
+    """
+    if not requested_sheets:
+        return all_dfs
+
+    all_sheet_names = list(all_dfs.keys())
+    filtered_dfs = {}
+    for sname in requested_sheets:
+        if sname in all_dfs:
+            filtered_dfs[sname] = all_dfs[sname]
+        else:
+            matched = [k for k in all_sheet_names if sname in k or k in sname]
+            if matched:
+                for m in matched:
+                    filtered_dfs[m] = all_dfs[m]
+                logger.warning(
+                    f"[{log_prefix}] Sheet '{sname}' 未精确匹配，"
+                    f"模糊匹配到: {matched}"
+                )
+            else:
+                logger.warning(
+                    f"[{log_prefix}] Sheet '{sname}' 不存在，跳过"
+                )
+    if not filtered_dfs:
+        logger.warning(
+            f"[{log_prefix}] 查询 {index} 的 sheets 全部无法匹配，"
+            f"回退使用全部数据"
+        )
+        filtered_dfs = all_dfs
+    return filtered_dfs
 
 
 def _generate_query_instructions(
@@ -371,8 +525,11 @@ def _generate_query_instructions(
         {"role": "user", "content": user_prompt},
     ]
 
-    response = llm.generate(messages)
-    return _parse_query_instructions(response.content, max_queries)
+    with tracing.span("planning", model=llm.config.model) as sp:
+        response = llm.generate(messages)
+        query_instructions = _parse_query_instructions(response.content, max_queries)
+        sp.set(queries=len(query_instructions))
+    return query_instructions
 
 
 def _parse_query_instructions(
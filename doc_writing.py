@@ -19,17 +19,45 @@ Doc Writing 模块
         region_name="渝北区",
     )
     print(draft)
+
+    # 流式：按章节产出（下一个标题到达时上一章节即完成）
+    for section in writer.write_sections(analysis_result, assessment_df, region_name="渝北区"):
+        print(section)
+
+    # 分析结果过长时 map-reduce：各查询结果并行整理为要点摘要，再汇总撰写
+    draft = writer.write_document(analysis_result, assessment_df, region_name="渝北区")
 """
 
-from typing import Optional
+import contextvars
+import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import pandas as pd
 
 from llm import BaseLLM
-from utils import logger
+from llm.rate_limit import estimate_text_tokens, estimate_tokens
+from utils import logger, tracing
+from utils.markdown_sections import chunk_markdown, iter_sections, pack_chunks
 from utils.prompt_renderer import render_prompt
 
 
+# 默认配置（可通过环境变量覆盖）
+_DEFAULT_MAP_CHUNK_TOKENS = int(os.getenv("DOC_WRITING_MAP_CHUNK_TOKENS", "4000"))
+_DEFAULT_MAP_WORKERS = int(os.getenv("DOC_WRITING_MAP_WORKERS", "4"))
+_DEFAULT_MAP_REDUCE_MIN_TOKENS = int(os.getenv("DOC_WRITING_MAP_REDUCE_MIN_TOKENS", "12000"))
+
+# data_analysis.analyze_region 中每条查询结果的标题
+_QUERY_HEADING_RE = re.compile(r"^### 查询: ", re.MULTILINE)
+# 查询结果之间的分隔线
+_QUERY_SEPARATOR_RE = re.compile(r"\s*\n---\s*$")
+
+_ANALYSIS_KIND = "数据分析结果"
+_ASSESSMENT_KIND = "考核评估数据"
+
+
 class DocWriter:
     """
     报告初稿生成器。
@@ -80,33 +108,300 @@ class DocWriter:
         Returns:
             str: 报告初稿文本
         """
-        # 将 DataFrame 转为可读文本
+        messages = self._build_messages(analysis_result, assessment_df, region_name)
+        return self._write_messages(messages, region_name, **kwargs)
+
+    def _write_messages(
+        self,
+        messages: List[Dict[str, str]],
+        region_name: str,
+        **kwargs,
+    ) -> str:
+        """write() 的实现：发送已组装好的消息（write_document 复用估算 token 时渲染的 prompt）"""
+        response = self.llm.generate(messages, **kwargs)
+        logger.info(
+            f"DocWriter.write done: region={region_name}, "
+            f"input_len={len(messages[-1]['content'])}, output_len={len(response.content)}"
+        )
+        return response.content
+
+    def write_document(
+        self,
+        analysis_result: str,
+        assessment_df: pd.DataFrame,
+        region_name: str = "",
+        min_map_reduce_tokens: Optional[int] = None,
+        map_chunk_tokens: Optional[int] = None,
+        max_map_workers: Optional[int] = None,
+        **kwargs,
+    ) -> str:
+        """
+        生成报告初稿：prompt 不超过 min_map_reduce_tokens 时与 write() 相同（单次调用），
+        否则走 write_map_reduce()。
+
+        Args:
+            analysis_result: 上一步 data_analysis.analyze_region 返回的分析结果字符串
+            assessment_df: 原始多维考核指标 DataFrame
+            region_name: 地区名称（可选，用于报告标题）
+            min_map_reduce_tokens: 启用 map-reduce 的 prompt token 阈值，默认读取 DOC_WRITING_MAP_REDUCE_MIN_TOKENS
+            map_chunk_tokens: 单个 map 片段的 token 上限（同 write_map_reduce()）
+            max_map_workers: 并行的 map 调用数（同 write_map_reduce()）
+            **kwargs: 覆盖 LLM 生成参数
+
+        Returns:
+            str: 报告初稿文本
+        """
+        if min_map_reduce_tokens is None:
+            min_map_reduce_tokens = _DEFAULT_MAP_REDUCE_MIN_TOKENS
+        messages = self._build_messages(analysis_result, assessment_df, region_name)
+        tokens = estimate_tokens(messages)
+        if tokens <= min_map_reduce_tokens:
+            return self._write_messages(messages, region_name, **kwargs)
+        logger.info(
+            f"DocWriter.write_document: prompt {tokens} tokens > {min_map_reduce_tokens}, 使用 map-reduce"
+        )
+        return self.write_map_reduce(
+            analysis_result, assessment_df, region_name,
+            map_chunk_tokens=map_chunk_tokens, max_map_workers=max_map_workers, **kwargs,
+        )
+
+    def write_map_reduce(
+        self,
+        analysis_result: str,
+        assessment_df: pd.DataFrame,
+        region_name: str = "",
+        map_chunk_tokens: Optional[int] = None,
+        max_map_workers: Optional[int] = None,
+        **kwargs,
+    ) -> str:
+        """
+        map-reduce 生成报告初稿。
+
+        map：按查询切分分析结果（单条查询结果过长时按标题 / 段落继续切分，相邻的短结果合并），
+        每个不超过 map_chunk_tokens 的片段并行整理为要点摘要；考核表文本超过 map_chunk_tokens 时
+        按行切分后同样整理为摘要，否则原样交给 reduce。
+        reduce：将全部摘要（按原顺序）与考核表一起交给 LLM 撰写报告。
+
+        Args:
+            analysis_result: 上一步 data_analysis.analyze_region 返回的分析结果字符串
+            assessment_df: 原始多维考核指标 DataFrame
+            region_name: 地区名称（可选，用于报告标题）
+            map_chunk_tokens: 单个 map 片段的 token 上限，默认读取 DOC_WRITING_MAP_CHUNK_TOKENS
+            max_map_workers: 并行的 map 调用数，默认读取 DOC_WRITING_MAP_WORKERS
+            **kwargs: 覆盖 LLM 生成参数（map 与 reduce 调用共用）
+
+        Returns:
+            str: 报告初稿文本
+
+        Raises:
+            Exception: 任意 map 调用失败时抛出该异常
+        """
+        map_chunk_tokens = map_chunk_tokens or _DEFAULT_MAP_CHUNK_TOKENS
+        max_map_workers = max_map_workers or _DEFAULT_MAP_WORKERS
+
+        parts: List[Tuple[str, str]] = [
+            (_ANALYSIS_KIND, chunk)
+            for chunk in chunk_analysis_result(analysis_result, map_chunk_tokens)
+        ]
         df_text = _dataframe_to_text(assessment_df)
+        if estimate_text_tokens(df_text) > map_chunk_tokens:
+            parts += [
+                (_ASSESSMENT_KIND, chunk)
+                for chunk in _dataframe_chunks(assessment_df, map_chunk_tokens)
+            ]
+            df_text = ""
+
+        workers = max(1, min(max_map_workers, len(parts)))
+        logger.info(
+            f"DocWriter.write_map_reduce: region={region_name}, {len(parts)} 个 map 片段, 并发 {workers}"
+        )
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="doc-map") as executor:
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run, self._map_chunk,
+                    kind, chunk, index, len(parts), region_name, **kwargs,
+                )
+                for index, (kind, chunk) in enumerate(parts, 1)
+            ]
+            summaries = [future.result() for future in futures]
 
+        section_summaries = "\n\n".join(
+            f"【{kind} {index}】\n{summary.strip()}"
+            for index, ((kind, _), summary) in enumerate(zip(parts, summaries), 1)
+        )
         user_prompt = render_prompt(
-            "doc_writing_user.j2",
-            analysis_result=analysis_result,
+            "doc_writing_reduce_user.j2",
+            section_summaries=section_summaries,
             df_text=df_text,
             region_name=region_name,
         )
-
         messages = []
         if self._system_prompt:
             messages.append({"role": "system", "content": self._system_prompt})
         messages.append({"role": "user", "content": user_prompt})
 
-        response = self.llm.generate(messages, **kwargs)
+        with tracing.span("writing.reduce", inputs=len(parts)):
+            response = self.llm.generate(messages, **kwargs)
         logger.info(
-            f"DocWriter.write done: region={region_name}, "
-            f"input_len={len(user_prompt)}, output_len={len(response.content)}"
+            f"DocWriter.write_map_reduce done: region={region_name}, "
+            f"input_len={len(analysis_result)}, reduce_input_len={len(user_prompt)}, "
+            f"output_len={len(response.content)}"
         )
         return response.content
 
+    def _map_chunk(
+        self,
+        kind: str,
+        chunk: str,
+        index: int,
+        count: int,
+        region_name: str,
+        **kwargs,
+    ) -> str:
+        """map：将一个素材片段整理为要点摘要"""
+        user_prompt = render_prompt(
+            "doc_writing_map_user.j2",
+            kind=kind,
+            chunk=chunk,
+            chunk_index=index,
+            chunk_count=count,
+            region_name=region_name,
+        )
+        with tracing.span("writing.map", index=index, kind=kind):
+            response = self.llm.generate([{"role": "user", "content": user_prompt}], **kwargs)
+        logger.info(
+            f"DocWriter map [{index}/{count}] done: "
+            f"input_len={len(chunk)}, output_len={len(response.content)}"
+        )
+        return response.content
+
+    def write_stream(
+        self,
+        analysis_result: str,
+        assessment_df: pd.DataFrame,
+        region_name: str = "",
+        **kwargs,
+    ) -> Iterator[str]:
+        """
+        流式生成报告初稿，逐 chunk 返回文本（基于 BaseLLM.generate_stream）。
+        请求在调用时即构造，用量记到调用时所在的 span / 用量标签下。
+
+        Args:
+            analysis_result: 上一步 data_analysis.analyze_region 返回的分析结果字符串
+            assessment_df: 原始多维考核指标 DataFrame
+            region_name: 地区名称（可选，用于报告标题）
+            **kwargs: 覆盖 LLM 生成参数（temperature, max_tokens 等）
+
+        Returns:
+            Iterator[str]: 文本片段
+        """
+        messages = self._build_messages(analysis_result, assessment_df, region_name)
+        logger.info(
+            f"DocWriter.write_stream start: region={region_name}, "
+            f"input_len={len(messages[-1]['content'])}"
+        )
+        return self.llm.generate_stream(messages, **kwargs)
+
+    def write_sections(
+        self,
+        analysis_result: str,
+        assessment_df: pd.DataFrame,
+        region_name: str = "",
+        max_level: int = 2,
+        **kwargs,
+    ) -> Iterator[str]:
+        """
+        流式生成报告初稿，按 Markdown 标题逐章节返回（某章节之后的标题到达时该章节即完成）。
+
+        Args:
+            analysis_result: 上一步 data_analysis.analyze_region 返回的分析结果字符串
+            assessment_df: 原始多维考核指标 DataFrame
+            region_name: 地区名称（可选，用于报告标题）
+            max_level: 参与切分的最深标题级别
+            **kwargs: 覆盖 LLM 生成参数
+
+        Returns:
+            Iterator[str]: 章节文本（拼接后即为完整初稿）
+        """
+        chunks = self.write_stream(analysis_result, assessment_df, region_name, **kwargs)
+        return iter_sections(chunks, max_level=max_level)
+
+    def _build_messages(
+        self,
+        analysis_result: str,
+        assessment_df: pd.DataFrame,
+        region_name: str,
+    ) -> List[Dict[str, str]]:
+        """渲染 user prompt 并组装 system + user 消息"""
+        # 将 DataFrame 转为可读文本
+        df_text = _dataframe_to_text(assessment_df)
+
+        user_prompt = render_prompt(
+            "doc_writing_user.j2",
+            analysis_result=analysis_result,
+            df_text=df_text,
+            region_name=region_name,
+        )
+
+        messages = []
+        if self._system_prompt:
+            messages.append({"role": "system", "content": self._system_prompt})
+        messages.append({"role": "user", "content": user_prompt})
+        return messages
+
 
 # ============================================================
 # 辅助函数
 # ============================================================
 
+def chunk_analysis_result(analysis_result: str, max_tokens: int) -> List[str]:
+    """
+    将 analyze_region 的分析结果切成 token 受限的片段：按「### 查询: 」切成单条查询结果，
+    过长的查询结果再按标题 / 段落切分，相邻的短结果合并到不超过 max_tokens。
+    第一条查询之前的总标题与查询之间的分隔线不参与切分；不含查询标题时按普通 Markdown 切分。
+
+    Args:
+        analysis_result: 分析结果字符串
+        max_tokens: 单个片段的 token 上限
+
+    Returns:
+        List[str]: 按原顺序排列的片段
+    """
+    starts = [match.start() for match in _QUERY_HEADING_RE.finditer(analysis_result)]
+    if not starts:
+        return chunk_markdown(analysis_result, max_tokens)
+
+    bounds = starts + [len(analysis_result)]
+    units: List[str] = []
+    for start, end in zip(bounds, bounds[1:]):
+        result = _QUERY_SEPARATOR_RE.sub("", analysis_result[start:end]) + "\n\n"
+        if estimate_text_tokens(result) <= max_tokens:
+            units.append(result)
+        else:
+            units.extend(chunk_markdown(result, max_tokens))
+    return pack_chunks(units, max_tokens)
+
+
+def _dataframe_chunks(df: pd.DataFrame, max_tokens: int, max_rows: int = 200) -> List[str]:
+    """
+    按行把 _dataframe_to_text 展示的内容（大表为前后各 max_rows//2 行）切成若干块文本，
+    每块都带表头、约不超过 max_tokens；省略标注放在后半部分的第一块之前。
+    """
+    n_chunks = max(1, math.ceil(estimate_text_tokens(_dataframe_to_text(df, max_rows)) / max_tokens))
+    if len(df) <= max_rows:
+        segments = [("", df)]
+    else:
+        half = max_rows // 2
+        omitted = len(df) - max_rows
+        segments = [("", df.head(half)), (f"... 省略中间 {omitted} 行 ...\n\n", df.tail(half))]
+    rows = max(1, math.ceil(sum(len(part) for _, part in segments) / n_chunks))
+    return [
+        (prefix if i == 0 else "") + part.iloc[i:i + rows].to_string(index=True)
+        for prefix, part in segments
+        for i in range(0, len(part), rows)
+    ]
+
+
 def _dataframe_to_text(
     df: pd.DataFrame,
     max_rows: int = 200,
@@ -25,6 +25,7 @@ from utils.data_inspector import (
     DataInspectorMCPTool,
 )
 from utils.file_io import read_all_excel
+from utils.ranking import add_ranking_columns
 
 # ============================================================
 # 变量设置区 — 按需修改
@@ -70,25 +71,6 @@ def _find_supplementary_files(region: str, data_dir: Path) -> List[Path]:
     return sorted(matched, key=lambda p: p.name)
 
 
-def _add_ranking_columns(df: pd.DataFrame, ignore_columns: list) -> pd.DataFrame:
-    """为数值列添加排名列（与 main.py 逻辑一致）。"""
-    ignore_set = set(ignore_columns) if isinstance(ignore_columns, list) else {ignore_columns}
-    new_data = {}
-    for col_idx, col in enumerate(df.columns):
-        series = df.iloc[:, col_idx]
-        new_data[col] = series
-        if col_idx in ignore_set:
-            continue
-        if pd.api.types.is_numeric_dtype(series):
-            rank_series = series.rank(ascending=False, method="min").astype("Int64")
-            if isinstance(df.columns, pd.MultiIndex):
-                new_name = (*col[:-1], str(col[-1]) + "排名")
-            else:
-                new_name = str(col) + "排名"
-            new_data[new_name] = rank_series
-    return pd.DataFrame(new_data)
-
-
 def load_data() -> Dict[str, pd.DataFrame]:
     """加载考核评估总表 + 自动查找补充材料，返回 {sheet_name: DataFrame} 字典。"""
     all_dfs: Dict[str, pd.DataFrame] = {}
@@ -99,7 +81,7 @@ def load_data() -> Dict[str, pd.DataFrame]:
             assessment_dfs = read_all_excel(assessment_file, header=assessment_header)
             # 取第一个 sheet，并添加排名列（与 main.py 一致）
             assessment_df = list(assessment_dfs.values())[0]
-            assessment_df = _add_ranking_columns(assessment_df, assessment_ignore_columns)
+            assessment_df = add_ranking_columns(assessment_df, assessment_ignore_columns)
             all_dfs["考核评估数据"] = assessment_df
             logger.info(f"已加载考核评估总表: {assessment_file.name}, shape={assessment_df.shape}")
         except Exception as e:
@@ -11,6 +11,8 @@ from llm.llm import (
     Message,
     create_llm,
 )
+from llm.cache import LLMResponseCache, make_cache_key
+from llm.usage import BudgetExceededError, UsageLedger, get_usage_ledger, usage_tags
 
 __all__ = [
     "BaseLLM",
@@ -19,4 +21,10 @@ __all__ = [
     "LLMResponse",
     "Message",
     "create_llm",
+    "LLMResponseCache",
+    "make_cache_key",
+    "BudgetExceededError",
+    "UsageLedger",
+    "get_usage_ledger",
+    "usage_tags",
 ]
@@ -0,0 +1,222 @@
+"""
+LLM 响应缓存模块
+为 BaseLLM 提供可选的响应缓存层，避免 benchmark 重跑 / prompt 调试时重复请求相同内容。
+
+特性:
+- 确定性缓存键：hash(API 地址 + model + messages + 合并后的生成参数)
+- 两级缓存：内存 LRU + 可选的 SQLite 持久化层
+- TTL 过期、按条数 / 磁盘大小淘汰
+- 默认跳过 temperature > 0 的采样请求（可配置）
+- 不缓存被截断（finish_reason == "length"）或内容为空的响应
+- 命中 / 未命中计数
+
+用法::
+
+    from llm import OpenAILikeLLM, LLMConfig, LLMResponseCache
+
+    cache = LLMResponseCache(db_path=".cache/llm_cache.sqlite", ttl=7 * 86400)
+    llm = OpenAILikeLLM(config=LLMConfig(temperature=0), cache=cache)
+    llm.generate(messages)   # 第一次请求网络
+    llm.generate(messages)   # 第二次命中缓存
+    print(cache.stats())
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from utils import logger
+
+
+def make_cache_key(
+    model: str,
+    messages: List[Dict[str, str]],
+    params: Dict[str, Any],
+    api_base: str = "",
+) -> str:
+    """根据 API 地址、模型名、消息列表和生成参数计算确定性的缓存键（同名模型在不同服务商处不共享缓存）"""
+    payload = json.dumps(
+        {"api_base": api_base, "model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    LLM 响应缓存（线程安全）。
+
+    Args:
+        db_path: SQLite 持久化文件路径，None 表示仅使用内存缓存
+        max_memory_entries: 内存 LRU 最大条数
+        max_disk_bytes: SQLite 中缓存内容总大小上限（字节），<=0 表示不限制
+        ttl: 缓存有效期（秒），None 表示永不过期
+        cache_sampling: 是否缓存 temperature > 0 的请求（默认 False，直接绕过缓存）
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[Union[str, Path]] = None,
+        max_memory_entries: int = 1024,
+        max_disk_bytes: int = 512 * 1024 ** 2,
+        ttl: Optional[float] = None,
+        cache_sampling: bool = False,
+    ):
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self.cache_sampling = cache_sampling
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+        }
+
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path is not None:
+            db_path = Path(db_path)
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed)"
+            )
+            self._db.commit()
+            logger.info(f"LLMResponseCache initialized: db_path={db_path}")
+
+    # ---- 公开接口 ----
+
+    def should_cache(self, params: Dict[str, Any]) -> bool:
+        """判断本次请求是否走缓存；采样请求默认绕过（并计入 bypassed）"""
+        temperature = params.get("temperature") or 0
+        if temperature > 0 and not self.cache_sampling:
+            with self._lock:
+                self._counters["bypassed"] += 1
+            return False
+        return True
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """查询缓存，未命中或已过期返回 None"""
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                created, value = item
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self._counters["hits"] += 1
+                    self._counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    raw, created = row
+                    if not self._expired(created, now):
+                        self._db.execute(
+                            "UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key)
+                        )
+                        self._db.commit()
+                        value = json.loads(raw)
+                        self._put_memory(key, created, value)
+                        self._counters["hits"] += 1
+                        self._counters["disk_hits"] += 1
+                        return value
+                    self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self._counters["misses"] += 1
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """写入缓存（value 需可 JSON 序列化）"""
+        now = time.time()
+        with self._lock:
+            self._put_memory(key, now, value)
+            if self._db is not None:
+                raw = json.dumps(value, ensure_ascii=False)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created, accessed, size) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, raw, now, now, len(raw.encode("utf-8"))),
+                )
+                self._evict_disk()
+                self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中 / 未命中计数及当前缓存条数"""
+        with self._lock:
+            result = dict(self._counters)
+            result["memory_entries"] = len(self._memory)
+            if self._db is not None:
+                count, size = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+                ).fetchone()
+                result["disk_entries"] = count
+                result["disk_bytes"] = size
+            return result
+
+    def clear(self) -> None:
+        """清空内存与磁盘缓存"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def close(self) -> None:
+        """关闭 SQLite 连接"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ---- 内部方法 ----
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+
+    def _put_memory(self, key: str, created: float, value: Dict[str, Any]) -> None:
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        """按最近访问时间淘汰，直到磁盘缓存总大小不超过上限（调用方持有锁）"""
+        if self._db is None or self.max_disk_bytes <= 0:
+            return
+        total = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM llm_cache"
+        ).fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        rows = self._db.execute(
+            "SELECT key, size FROM llm_cache ORDER BY accessed ASC"
+        ).fetchall()
+        to_delete = []
+        for key, size in rows:
+            if total <= self.max_disk_bytes:
+                break
+            to_delete.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM llm_cache WHERE key = ?", to_delete)
@@ -0,0 +1,179 @@
+"""
+共享 HTTP 连接池模块
+进程级 OpenAI / AsyncOpenAI client 注册表：相同 (api_base, api_key, timeout) 的
+LLM 实例共享同一个 client 及其底层 httpx 连接池，避免每次请求重新建立 TCP / TLS 连接。
+
+- 同步 client：进程内共享，httpx.Client 本身线程安全，可直接用于线程池并发
+- 异步 client：httpx.AsyncClient 的连接绑定到事件循环，因此按事件循环分别缓存；
+  asyncio.run / asyncio.Runner 结束事件循环（shutdown_asyncgens）时自动关闭该循环下的 client，
+  其他方式关闭的事件循环在下次获取 client 时释放；不在事件循环中获取时共享同一个 client；
+  进程退出时关闭剩余的全部异步 client
+
+连接池参数可通过环境变量调整：
+    LLM_HTTP_MAX_CONNECTIONS   最大连接数（默认 100）
+    LLM_HTTP_MAX_KEEPALIVE     最大保活连接数（默认 20）
+    LLM_HTTP_KEEPALIVE_EXPIRY  保活连接空闲过期秒数（默认 60）
+"""
+
+import asyncio
+import atexit
+import os
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from utils import logger
+
+
+_ClientKey = Tuple[str, str, Optional[float]]
+
+_sync_clients: Dict[_ClientKey, Any] = {}
+# 事件循环 → (该循环下的 client, 负责在循环结束时关闭它们的 async generator)
+_async_clients: Dict[asyncio.AbstractEventLoop, Tuple[Dict[_ClientKey, Any], Any]] = {}
+# 不在事件循环中获取的 client
+_unbound_async_clients: Dict[_ClientKey, Any] = {}
+_lock = threading.Lock()
+
+
+def _http_limits():
+    """连接池参数"""
+    import httpx
+
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60")),
+    )
+
+
+def _client_kwargs(api_base: str, api_key: str, timeout: Optional[float]) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {"api_key": api_key}
+    if api_base:
+        kwargs["base_url"] = api_base
+    if timeout:
+        kwargs["timeout"] = timeout
+    return kwargs
+
+
+def get_sync_client(api_base: str, api_key: str, timeout: Optional[float] = None):
+    """获取（或创建）共享的同步 OpenAI client"""
+    key = (api_base or "", api_key or "", timeout)
+    with _lock:
+        client = _sync_clients.get(key)
+        if client is None:
+            from openai import OpenAI, DefaultHttpxClient
+
+            client = OpenAI(
+                **_client_kwargs(api_base, api_key, timeout),
+                http_client=DefaultHttpxClient(limits=_http_limits()),
+            )
+            _sync_clients[key] = client
+            logger.info(f"Shared OpenAI client created: base_url={api_base or 'default'}")
+        return client
+
+
+def _new_async_client(api_base: str, api_key: str, timeout: Optional[float]):
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+    return AsyncOpenAI(
+        **_client_kwargs(api_base, api_key, timeout),
+        http_client=DefaultAsyncHttpxClient(limits=_http_limits()),
+    )
+
+
+def get_async_client(api_base: str, api_key: str, timeout: Optional[float] = None):
+    """获取（或创建）当前事件循环下共享的 AsyncOpenAI client"""
+    key = (api_base or "", api_key or "", timeout)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    with _lock:
+        _release_closed_loops()
+        if loop is None:
+            # 不在事件循环中：同配置共享同一个 client
+            client = _unbound_async_clients.get(key)
+            if client is None:
+                client = _new_async_client(api_base, api_key, timeout)
+                _unbound_async_clients[key] = client
+            return client
+
+        entry = _async_clients.get(loop)
+        if entry is None:
+            entry = ({}, _close_on_loop_shutdown(loop))
+            _async_clients[loop] = entry
+            # 启动 async generator，使其注册到事件循环；shutdown_asyncgens 时执行其 finally
+            asyncio.ensure_future(entry[1].asend(None), loop=loop)
+        loop_clients = entry[0]
+        client = loop_clients.get(key)
+        if client is None:
+            client = _new_async_client(api_base, api_key, timeout)
+            loop_clients[key] = client
+            logger.info(f"Shared AsyncOpenAI client created: base_url={api_base or 'default'}")
+        return client
+
+
+async def _close_on_loop_shutdown(loop: asyncio.AbstractEventLoop) -> AsyncIterator[None]:
+    """挂起直到事件循环执行 shutdown_asyncgens，随后关闭该循环下的全部 client"""
+    try:
+        yield
+    finally:
+        with _lock:
+            entry = _async_clients.pop(loop, None)
+        if entry is not None:
+            await _aclose_all(list(entry[0].values()))
+
+
+async def _aclose_all(clients: List[Any]) -> None:
+    for client in clients:
+        try:
+            await client.close()
+        except Exception:
+            pass
+
+
+def _release_closed_loops() -> None:
+    """释放已关闭（且未经 shutdown_asyncgens）的事件循环下的 client（调用方持有锁）"""
+    for loop in [loop for loop in _async_clients if loop.is_closed()]:
+        del _async_clients[loop]
+
+
+def close_sync_clients() -> None:
+    """关闭并清空所有共享的同步 client"""
+    with _lock:
+        clients = list(_sync_clients.values())
+        _sync_clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception:
+            pass
+
+
+def close_async_clients() -> None:
+    """
+    关闭并清空所有共享的异步 client（进程退出时自动调用）。
+    不在事件循环中获取的 client 及所属事件循环仍可用（未关闭、未运行）的 client 在临时 / 原事件循环中关闭，
+    其余仅释放引用。
+    """
+    with _lock:
+        unbound = list(_unbound_async_clients.values())
+        _unbound_async_clients.clear()
+        loops = list(_async_clients.items())
+        _async_clients.clear()
+
+    if unbound:
+        try:
+            asyncio.run(_aclose_all(unbound))
+        except Exception:
+            pass
+    for loop, (loop_clients, _) in loops:
+        if loop.is_closed() or loop.is_running():
+            continue
+        try:
+            loop.run_until_complete(_aclose_all(list(loop_clients.values())))
+        except Exception:
+            pass
+
+
+atexit.register(close_async_clients)
@@ -5,22 +5,34 @@ LLM 通用基类模块
 - 流式 / 非流式输出
 - 多轮对话管理
 - 自动重试与错误处理
+- 可选的响应缓存（内存 LRU + SQLite 持久化）
+- 并发批量调用 + RPM / TPM 限流
+- 用量台账（按 stage / region 等标签聚合）与整次运行的 token 预算
 - 轻松扩展子类
 
 本模块服务于项目中所有需要调用 LLM 的场景，包括 CodeAgent 和其他模块。
 """
 
+import asyncio
+import contextvars
 import os
+import random
 import time
+from email.utils import parsedate_to_datetime
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from typing import (
-    Any, Dict, List, Optional, Union, Generator, AsyncGenerator, Callable,
+    Any, Dict, List, Optional, Tuple, Union, Generator, AsyncGenerator, Callable,
 )
 from dataclasses import dataclass, field
 
 from dotenv import load_dotenv
 
-from utils import logger
+from utils import logger, tracing
+from llm.cache import LLMResponseCache, make_cache_key
+from llm.rate_limit import RateLimiter, estimate_tokens
+from llm.usage import get_usage_ledger
+from llm.client_pool import get_sync_client, get_async_client
 
 load_dotenv()
 
@@ -51,6 +63,7 @@ class LLMResponse:
     usage: Optional[Dict[str, int]] = None  # prompt_tokens, completion_tokens, total_tokens
     finish_reason: Optional[str] = None
     raw_response: Optional[Any] = None  # 保留原始响应对象
+    cached: bool = False  # 是否来自响应缓存
 
     def __str__(self) -> str:
         return self.content
@@ -78,8 +91,15 @@ class LLMConfig:
     max_retries: int = 3
     retry_delay: float = 1.0  # 首次重试等待秒数
     retry_backoff: float = 2.0  # 指数退避倍数
+    retry_jitter: float = 0.25  # 随机抖动比例：实际等待 = delay * (1 + U(0, jitter))
+    retry_after_max: float = 60.0  # 服务端 Retry-After 的最长采纳秒数
     timeout: Optional[float] = 120.0  # 请求超时秒数
 
+    # 并发与限流参数
+    max_concurrency: int = 8  # batch / abatch 的最大并发请求数
+    requests_per_minute: Optional[float] = None  # 每分钟最大请求数，None 表示不限制
+    tokens_per_minute: Optional[float] = None  # 每分钟最大 token 数，None 表示不限制
+
     def __post_init__(self):
         # 从环境变量补全空值
         if not self.model:
@@ -99,7 +119,7 @@ class BaseLLM(ABC):
     LLM 调用的抽象基类。
     
     子类只需实现 _call_api() 和可选的 _call_api_stream()，
-    即可获得重试、日志、对话管理等通用能力。
+    即可获得重试、日志、对话管理、响应缓存等通用能力。
     
     用法示例::
     
@@ -110,10 +130,27 @@ class BaseLLM(ABC):
         
         llm = MyLLM(config=LLMConfig(model="gpt-4"))
         response = llm.chat("你好")
+
+    Args:
+        config: LLMConfig 配置
+        cache: 可选的 LLMResponseCache，传入后非流式调用会先查缓存
+        **kwargs: 未传 config 时用于构造 LLMConfig
     """
 
-    def __init__(self, config: Optional[LLMConfig] = None, **kwargs):
+    def __init__(
+        self,
+        config: Optional[LLMConfig] = None,
+        cache: Optional[LLMResponseCache] = None,
+        **kwargs,
+    ):
         self.config = config or LLMConfig(**kwargs)
+        self.cache = cache
+        self._rate_limiter: Optional[RateLimiter] = None
+        if self.config.requests_per_minute or self.config.tokens_per_minute:
+            self._rate_limiter = RateLimiter(
+                requests_per_minute=self.config.requests_per_minute,
+                tokens_per_minute=self.config.tokens_per_minute,
+            )
         self._history: List[Message] = []
         self._system_prompt: Optional[str] = None
 
@@ -166,6 +203,10 @@ class BaseLLM(ABC):
         """返回对话历史的副本"""
         return list(self._history)
 
+    def cache_stats(self) -> Dict[str, int]:
+        """返回响应缓存的命中 / 未命中计数（未启用缓存时返回空字典）"""
+        return self.cache.stats() if self.cache is not None else {}
+
     def chat(
         self,
         message: str,
@@ -210,6 +251,98 @@ class BaseLLM(ABC):
         """
         return self._call_with_retry(messages, **kwargs)
 
+    def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        **kwargs,
+    ) -> Generator[str, None, None]:
+        """
+        无状态流式调用：传入完整消息列表，逐 chunk 返回文本（带预算 + 限流；
+        仅在尚未收到任何 chunk 时重试）。
+
+        预算检查在调用时立即进行；token 用量与 trace / 用量标签取调用时的上下文，
+        因此返回的生成器可以交给其他代码（或在其他 span 内）消费。流式响应不含 usage，
+        按 prompt 与输出长度估算后记账。
+
+        Args:
+            messages: OpenAI 格式消息列表
+            **kwargs: 覆盖 config 中的生成参数
+
+        Yields:
+            str: 文本片段
+        """
+        merged = get_usage_ledger().admit(self._merge_kwargs(kwargs))
+        return self._stream_with_retry(messages, merged, contextvars.copy_context())
+
+    def _stream_with_retry(
+        self,
+        messages: List[Dict[str, str]],
+        merged: Dict[str, Any],
+        ctx: contextvars.Context,
+    ) -> Generator[str, None, None]:
+        """
+        generate_stream 的实现：已输出部分内容后再失败无法安全重放，此时直接抛出异常。
+        记账放在 finally 中，消费方提前停止读取（GeneratorExit）时同样记账并校正 TPM 额度。
+        """
+        delay = self.config.retry_delay
+        t0 = time.perf_counter()
+        output: List[str] = []
+        attempt, estimated, completed = 1, 0, False
+        try:
+            for attempt in range(1, self.config.max_retries + 1):
+                try:
+                    estimated = self._rate_limit_acquire(messages, merged)
+                    for text in self._call_api_stream(messages, **merged):
+                        output.append(text)
+                        yield text
+                    if attempt > 1:
+                        logger.info(f"LLM stream succeeded on attempt {attempt}")
+                    completed = True
+                    break
+                except GeneratorExit:
+                    logger.warning(f"LLM stream closed by consumer after {len(output)} chunks")
+                    raise
+                except Exception as e:
+                    if output or attempt >= self.config.max_retries:
+                        logger.error(
+                            f"LLM stream failed (attempt {attempt}/{self.config.max_retries}): "
+                            f"{type(e).__name__}: {e}"
+                        )
+                        raise
+                    wait = self._retry_wait(e, delay)
+                    logger.warning(
+                        f"LLM stream failed (attempt {attempt}/{self.config.max_retries}): "
+                        f"{type(e).__name__}: {e}. Retrying in {wait:.1f}s..."
+                    )
+                    time.sleep(wait)
+                    delay *= self.config.retry_backoff
+        finally:
+            ctx.run(self._finish_stream, messages, output, estimated, t0, attempt, completed)
+
+    def _finish_stream(
+        self,
+        messages: List[Dict[str, str]],
+        output: List[str],
+        estimated: int,
+        started: float,
+        attempt: int,
+        completed: bool,
+    ) -> None:
+        """
+        流式调用结束时记账（正常完成、最终失败或消费方提前停止读取）。
+        流式响应不含 usage：已完成或已有输出时按长度估算 usage，计入 span 并校正 TPM 额度；
+        未完整完成的调用记为失败（已输出部分的 token 仍计入）。
+        """
+        usage = None
+        if completed or output:
+            usage = _estimate_stream_usage(messages, output)
+            self._rate_limit_settle(estimated, LLMResponse(content="", usage=usage))
+            tracing.record_usage(usage)
+        get_usage_ledger().record(
+            usage, time.perf_counter() - started, retries=attempt - 1,
+            failed=not completed, model=self.config.model,
+        )
+
     def stream(
         self,
         message: str,
@@ -218,7 +351,7 @@ class BaseLLM(ABC):
         **kwargs,
     ) -> Generator[str, None, None]:
         """
-        流式发送消息，逐 chunk 返回文本。
+        流式发送消息，逐 chunk 返回文本（预算、限流、重试与记账同 generate_stream）。
         
         Args:
             message: 用户消息
@@ -230,9 +363,7 @@ class BaseLLM(ABC):
         """
         messages = self._build_messages(message)
         full_content = []
-        for chunk in self._call_api_stream(
-            messages, **self._merge_kwargs(kwargs)
-        ):
+        for chunk in self.generate_stream(messages, **kwargs):
             full_content.append(chunk)
             yield chunk
 
@@ -247,24 +378,61 @@ class BaseLLM(ABC):
         *,
         keep_history: bool = False,
         **kwargs,
-    ) -> List[LLMResponse]:
+    ) -> List[Union[LLMResponse, Exception]]:
         """
-        批量调用（串行），每条消息独立处理。
+        批量调用（并发），每条消息独立处理。
+
+        最大并发数由 config.max_concurrency 控制，并受 RPM / TPM 限流约束；
+        每条消息基于调用时的对话历史独立组装，结果顺序与输入一致。
         
         Args:
             messages_list: 多条用户消息
-            keep_history: 是否保存到历史
+            keep_history: 是否将成功的结果按输入顺序保存到历史
             **kwargs: 覆盖 config 中的生成参数
             
         Returns:
-            List[LLMResponse]
+            List[LLMResponse | Exception]: 与输入一一对应，失败项为对应的异常对象
         """
-        results = []
-        for msg in messages_list:
-            resp = self.chat(msg, keep_history=keep_history, **kwargs)
-            results.append(resp)
+        results = self.generate_batch(
+            [self._build_messages(msg) for msg in messages_list], **kwargs
+        )
+        if keep_history:
+            self._append_batch_history(messages_list, results)
         return results
 
+    def generate_batch(
+        self,
+        messages_lists: List[List[Dict[str, str]]],
+        **kwargs,
+    ) -> List[Union[LLMResponse, Exception]]:
+        """
+        无状态并发批量调用：每项为完整的 OpenAI 格式消息列表。
+
+        Args:
+            messages_lists: 多组消息列表
+            **kwargs: 覆盖 config 中的生成参数
+
+        Returns:
+            List[LLMResponse | Exception]: 与输入一一对应，失败项为对应的异常对象
+        """
+        if not messages_lists:
+            return []
+
+        def _run(messages: List[Dict[str, str]]) -> Union[LLMResponse, Exception]:
+            try:
+                return self._call_with_retry(messages, **kwargs)
+            except Exception as e:
+                return e
+
+        max_workers = max(1, min(self.config.max_concurrency, len(messages_lists)))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-batch") as executor:
+            # 每个任务复制一份当前上下文，使 LLM span 挂在调用方的 span 下
+            futures = [
+                executor.submit(contextvars.copy_context().run, _run, messages)
+                for messages in messages_lists
+            ]
+            return [future.result() for future in futures]
+
     # ---- 内部方法 ----
 
     def _build_messages(self, user_message: str) -> List[Dict[str, str]]:
@@ -277,6 +445,17 @@ class BaseLLM(ABC):
         messages.append({"role": "user", "content": user_message})
         return messages
 
+    def _append_batch_history(
+        self,
+        messages_list: List[str],
+        results: List[Union[LLMResponse, Exception]],
+    ) -> None:
+        """将批量调用中成功的结果按输入顺序追加到历史"""
+        for msg, resp in zip(messages_list, results):
+            if isinstance(resp, LLMResponse):
+                self._history.append(Message(role="user", content=msg))
+                self._history.append(Message(role="assistant", content=resp.content))
+
     def _merge_kwargs(self, overrides: Dict[str, Any]) -> Dict[str, Any]:
         """将 config 参数与调用时覆盖参数合并"""
         base = {
@@ -297,25 +476,129 @@ class BaseLLM(ABC):
         messages: List[Dict[str, str]],
         **kwargs,
     ) -> LLMResponse:
-        """带重试的调用包装"""
+        """带缓存 + 预算 + 重试的调用包装（在当前 trace 中记录 "llm" span 与 token 用量）"""
         merged = self._merge_kwargs(kwargs)
+
+        with tracing.span("llm", model=self.config.model) as sp:
+            cache_key, cached = self._cache_lookup(messages, merged)
+            if cached is not None:
+                sp.set(cached=True)
+                get_usage_ledger().record(cached=True, model=self.config.model)
+                return cached
+
+            merged, cache_key = self._budget_admit(merged, cache_key)
+            response = self._call_api_with_retry(messages, merged)
+            sp.add_usage(response.usage)
+            self._cache_store(cache_key, response)
+            return response
+
+    def _budget_admit(
+        self,
+        merged: Dict[str, Any],
+        cache_key: Optional[str],
+    ) -> Tuple[Dict[str, Any], Optional[str]]:
+        """按运行预算检查本次请求（超出时 abort 抛出 BudgetExceededError，degrade 压低 max_tokens）；
+        被降级的请求不写入缓存，避免以原参数的 key 缓存截断的结果"""
+        admitted = get_usage_ledger().admit(merged)
+        if admitted is not merged:
+            sp = tracing.current_span()
+            if sp is not None:
+                sp.set(degraded=True)
+            return admitted, None
+        return merged, cache_key
+
+    def _cache_lookup(
+        self,
+        messages: List[Dict[str, str]],
+        merged: Dict[str, Any],
+    ) -> Tuple[Optional[str], Optional[LLMResponse]]:
+        """查询响应缓存，返回 (cache_key, 命中的响应)；不走缓存时 cache_key 为 None"""
+        if self.cache is None or not self.cache.should_cache(merged):
+            return None, None
+        cache_key = make_cache_key(self.config.model, messages, merged, self.config.api_base)
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            return cache_key, None
+        logger.info(f"LLM cache hit: model={self.config.model}")
+        return cache_key, LLMResponse(**cached, cached=True)
+
+    def _cache_store(self, cache_key: Optional[str], response: LLMResponse) -> None:
+        """将成功的响应写入缓存（被截断或内容为空的响应不缓存，下次仍重新请求）"""
+        if cache_key is None:
+            return
+        if response.finish_reason == "length" or not response.content:
+            return
+        self.cache.set(cache_key, {
+            "content": response.content,
+            "model": response.model,
+            "usage": response.usage,
+            "finish_reason": response.finish_reason,
+        })
+
+    def _rate_limit_acquire(
+        self,
+        messages: List[Dict[str, str]],
+        merged: Dict[str, Any],
+    ) -> int:
+        """按 RPM / TPM 限流等待额度（同步），返回预估 token 数"""
+        if self._rate_limiter is None:
+            return 0
+        estimated = estimate_tokens(messages, merged.get("max_tokens"))
+        self._rate_limiter.acquire(estimated)
+        return estimated
+
+    async def _arate_limit_acquire(
+        self,
+        messages: List[Dict[str, str]],
+        merged: Dict[str, Any],
+    ) -> int:
+        """按 RPM / TPM 限流等待额度（异步），返回预估 token 数"""
+        if self._rate_limiter is None:
+            return 0
+        estimated = estimate_tokens(messages, merged.get("max_tokens"))
+        await self._rate_limiter.aacquire(estimated)
+        return estimated
+
+    def _rate_limit_settle(self, estimated: int, response: LLMResponse) -> None:
+        """请求完成后按实际 usage 校正 TPM 额度"""
+        if self._rate_limiter is None or not response.usage:
+            return
+        actual = response.usage.get("total_tokens") or 0
+        if actual:
+            self._rate_limiter.adjust(actual - estimated)
+
+    def _call_api_with_retry(
+        self,
+        messages: List[Dict[str, str]],
+        merged: Dict[str, Any],
+    ) -> LLMResponse:
+        """按 config 中的重试策略调用 _call_api（指数退避）"""
         last_error = None
         delay = self.config.retry_delay
+        t0 = time.perf_counter()
 
         for attempt in range(1, self.config.max_retries + 1):
             try:
+                estimated = self._rate_limit_acquire(messages, merged)
                 response = self._call_api(messages, **merged)
+                self._rate_limit_settle(estimated, response)
                 if attempt > 1:
                     logger.info(f"LLM call succeeded on attempt {attempt}")
+                    tracing.set_attributes(attempts=attempt)
+                get_usage_ledger().record(
+                    response.usage, time.perf_counter() - t0,
+                    retries=attempt - 1, model=self.config.model,
+                )
                 return response
             except Exception as e:
                 last_error = e
                 if attempt < self.config.max_retries:
+                    wait = self._retry_wait(e, delay)
                     logger.warning(
                         f"LLM call failed (attempt {attempt}/{self.config.max_retries}): "
-                        f"{type(e).__name__}: {e}. Retrying in {delay:.1f}s..."
+                        f"{type(e).__name__}: {e}. Retrying in {wait:.1f}s..."
                     )
-                    time.sleep(delay)
+                    time.sleep(wait)
                     delay *= self.config.retry_backoff
                 else:
                     logger.error(
@@ -323,8 +606,52 @@ class BaseLLM(ABC):
                         f"{type(e).__name__}: {e}"
                     )
 
+        get_usage_ledger().record(
+            latency=time.perf_counter() - t0, retries=self.config.max_retries - 1,
+            failed=True, model=self.config.model,
+        )
         raise last_error  # type: ignore[misc]
 
+    def _retry_wait(self, error: Exception, delay: float) -> float:
+        """
+        计算下一次重试前的等待秒数：
+        - 429 且响应带 Retry-After / retry-after-ms 头时，采纳服务端给出的时间（不超过 retry_after_max）
+        - 否则为指数退避的 delay 加上随机抖动，避免并发请求同时重试
+        """
+        retry_after = _parse_retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.config.retry_after_max)
+        return delay * (1 + random.uniform(0, self.config.retry_jitter))
+
+
+def _parse_retry_after(error: Exception) -> Optional[float]:
+    """从 429 错误的响应头中解析 Retry-After（秒）；无法解析时返回 None"""
+    if getattr(error, "status_code", None) != 429:
+        return None
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
 
 # ============================================================
 # OpenAI-compatible 实现
@@ -364,44 +691,37 @@ class OpenAILikeLLM(BaseLLM):
             print(chunk, end="", flush=True)
     """
 
-    def __init__(self, config: Optional[LLMConfig] = None, **kwargs):
-        super().__init__(config, **kwargs)
+    def __init__(
+        self,
+        config: Optional[LLMConfig] = None,
+        cache: Optional[LLMResponseCache] = None,
+        **kwargs,
+    ):
+        super().__init__(config, cache, **kwargs)
         self._client = None
         self._async_client = None
 
     @property
     def client(self):
-        """延迟初始化 OpenAI client"""
+        """延迟获取 OpenAI client（同配置的实例共享同一个 client 与连接池）"""
         if self._client is None:
-            from openai import OpenAI
-            client_kwargs: Dict[str, Any] = {
-                "api_key": self.config.api_key,
-            }
-            if self.config.api_base:
-                client_kwargs["base_url"] = self.config.api_base
-            if self.config.timeout:
-                client_kwargs["timeout"] = self.config.timeout
-            self._client = OpenAI(**client_kwargs)
+            self._client = get_sync_client(
+                self.config.api_base, self.config.api_key, self.config.timeout
+            )
             logger.info(
-                f"OpenAI client initialized: model={self.config.model}, "
+                f"OpenAI client ready: model={self.config.model}, "
                 f"base_url={self.config.api_base or 'default'}"
             )
         return self._client
 
     @property
     def async_client(self):
-        """延迟初始化 AsyncOpenAI client"""
-        if self._async_client is None:
-            from openai import AsyncOpenAI
-            client_kwargs: Dict[str, Any] = {
-                "api_key": self.config.api_key,
-            }
-            if self.config.api_base:
-                client_kwargs["base_url"] = self.config.api_base
-            if self.config.timeout:
-                client_kwargs["timeout"] = self.config.timeout
-            self._async_client = AsyncOpenAI(**client_kwargs)
-        return self._async_client
+        """获取当前事件循环下共享的 AsyncOpenAI client（手动指定 _async_client 时优先使用）"""
+        if self._async_client is not None:
+            return self._async_client
+        return get_async_client(
+            self.config.api_base, self.config.api_key, self.config.timeout
+        )
 
     def _call_api(
         self,
@@ -462,10 +782,9 @@ class OpenAILikeLLM(BaseLLM):
         keep_history: bool = True,
         **kwargs,
     ) -> LLMResponse:
-        """异步版 chat"""
+        """异步版 chat（带缓存 + 限流 + 重试）"""
         messages = self._build_messages(message)
-        merged = self._merge_kwargs(kwargs)
-        response = await self._acall_api(messages, **merged)
+        response = await self.agenerate(messages, **kwargs)
 
         if keep_history:
             self._history.append(Message(role="user", content=message))
@@ -473,6 +792,112 @@ class OpenAILikeLLM(BaseLLM):
 
         return response
 
+    async def agenerate(
+        self,
+        messages: List[Dict[str, str]],
+        **kwargs,
+    ) -> LLMResponse:
+        """异步版 generate：无状态调用（带缓存 + 预算 + 限流 + 重试）"""
+        merged = self._merge_kwargs(kwargs)
+        with tracing.span("llm", model=self.config.model) as sp:
+            cache_key, cached = self._cache_lookup(messages, merged)
+            if cached is not None:
+                sp.set(cached=True)
+                get_usage_ledger().record(cached=True, model=self.config.model)
+                return cached
+            merged, cache_key = self._budget_admit(merged, cache_key)
+            response = await self._acall_with_retry(messages, merged)
+            sp.add_usage(response.usage)
+            self._cache_store(cache_key, response)
+            return response
+
+    async def abatch(
+        self,
+        messages_list: List[str],
+        *,
+        keep_history: bool = False,
+        **kwargs,
+    ) -> List[Union[LLMResponse, Exception]]:
+        """
+        异步并发批量调用，语义同 batch()。
+
+        Returns:
+            List[LLMResponse | Exception]: 与输入一一对应，失败项为对应的异常对象
+        """
+        results = await self.agenerate_batch(
+            [self._build_messages(msg) for msg in messages_list], **kwargs
+        )
+        if keep_history:
+            self._append_batch_history(messages_list, results)
+        return results
+
+    async def agenerate_batch(
+        self,
+        messages_lists: List[List[Dict[str, str]]],
+        **kwargs,
+    ) -> List[Union[LLMResponse, Exception]]:
+        """
+        异步并发的无状态批量调用，并发数由 config.max_concurrency 控制。
+
+        Returns:
+            List[LLMResponse | Exception]: 与输入一一对应，失败项为对应的异常对象
+        """
+        semaphore = asyncio.Semaphore(max(1, self.config.max_concurrency))
+
+        async def _run(messages: List[Dict[str, str]]) -> LLMResponse:
+            async with semaphore:
+                return await self.agenerate(messages, **kwargs)
+
+        return await asyncio.gather(
+            *(_run(messages) for messages in messages_lists),
+            return_exceptions=True,
+        )
+
+    async def _acall_with_retry(
+        self,
+        messages: List[Dict[str, str]],
+        merged: Dict[str, Any],
+    ) -> LLMResponse:
+        """异步版重试包装：与 _call_api_with_retry 相同的指数退避 + 抖动 + Retry-After 策略"""
+        last_error = None
+        delay = self.config.retry_delay
+        t0 = time.perf_counter()
+
+        for attempt in range(1, self.config.max_retries + 1):
+            try:
+                estimated = await self._arate_limit_acquire(messages, merged)
+                response = await self._acall_api(messages, **merged)
+                self._rate_limit_settle(estimated, response)
+                if attempt > 1:
+                    logger.info(f"Async LLM call succeeded on attempt {attempt}")
+                    tracing.set_attributes(attempts=attempt)
+                get_usage_ledger().record(
+                    response.usage, time.perf_counter() - t0,
+                    retries=attempt - 1, model=self.config.model,
+                )
+                return response
+            except Exception as e:
+                last_error = e
+                if attempt < self.config.max_retries:
+                    wait = self._retry_wait(e, delay)
+                    logger.warning(
+                        f"Async LLM call failed (attempt {attempt}/{self.config.max_retries}): "
+                        f"{type(e).__name__}: {e}. Retrying in {wait:.1f}s..."
+                    )
+                    await asyncio.sleep(wait)
+                    delay *= self.config.retry_backoff
+                else:
+                    logger.error(
+                        f"Async LLM call failed after {self.config.max_retries} attempts: "
+                        f"{type(e).__name__}: {e}"
+                    )
+
+        get_usage_ledger().record(
+            latency=time.perf_counter() - t0, retries=self.config.max_retries - 1,
+            failed=True, model=self.config.model,
+        )
+        raise last_error  # type: ignore[misc]
+
     async def _acall_api(
         self,
         messages: List[Dict[str, str]],
@@ -512,31 +937,90 @@ class OpenAILikeLLM(BaseLLM):
         keep_history: bool = True,
         **kwargs,
     ) -> AsyncGenerator[str, None]:
-        """异步流式调用"""
+        """异步流式调用（带预算 + 限流 + 记账；仅在尚未收到任何 chunk 时重试）"""
         messages = self._build_messages(message)
-        merged = self._merge_kwargs(kwargs)
-
-        request_params = {
-            "model": self.config.model,
-            "messages": messages,
-            "stream": True,
-            **merged,
-        }
-        request_params = {k: v for k, v in request_params.items() if v is not None}
+        merged = get_usage_ledger().admit(self._merge_kwargs(kwargs))
 
         full_content = []
-        stream = await self.async_client.chat.completions.create(**request_params)
-        async for chunk in stream:
-            if chunk.choices and chunk.choices[0].delta.content:
-                text = chunk.choices[0].delta.content
+        chunks = self._astream_with_retry(messages, merged)
+        try:
+            async for text in chunks:
                 full_content.append(text)
                 yield text
+        finally:
+            # 消费方提前停止读取时立即关闭内层生成器（触发其中的记账），不等待垃圾回收
+            await chunks.aclose()
 
         if keep_history:
             complete_text = "".join(full_content)
             self._history.append(Message(role="user", content=message))
             self._history.append(Message(role="assistant", content=complete_text))
 
+    async def _astream_with_retry(
+        self,
+        messages: List[Dict[str, str]],
+        merged: Dict[str, Any],
+    ) -> AsyncGenerator[str, None]:
+        """
+        异步流式调用的重试包装。
+        已输出部分内容后再失败无法安全重放，此时直接抛出异常；记账同 _stream_with_retry（finally 中进行）。
+        """
+        request_params = {
+            "model": self.config.model,
+            "messages": messages,
+            "stream": True,
+            **merged,
+        }
+        request_params = {k: v for k, v in request_params.items() if v is not None}
+
+        delay = self.config.retry_delay
+        t0 = time.perf_counter()
+        output: List[str] = []
+        attempt, estimated, completed = 1, 0, False
+        try:
+            for attempt in range(1, self.config.max_retries + 1):
+                try:
+                    estimated = await self._arate_limit_acquire(messages, merged)
+                    stream = await self.async_client.chat.completions.create(**request_params)
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            output.append(chunk.choices[0].delta.content)
+                            yield chunk.choices[0].delta.content
+                    if attempt > 1:
+                        logger.info(f"Async LLM stream succeeded on attempt {attempt}")
+                    completed = True
+                    break
+                except GeneratorExit:
+                    logger.warning(f"Async LLM stream closed by consumer after {len(output)} chunks")
+                    raise
+                except Exception as e:
+                    if output or attempt >= self.config.max_retries:
+                        logger.error(
+                            f"Async LLM stream failed (attempt {attempt}/{self.config.max_retries}): "
+                            f"{type(e).__name__}: {e}"
+                        )
+                        raise
+                    wait = self._retry_wait(e, delay)
+                    logger.warning(
+                        f"Async LLM stream failed (attempt {attempt}/{self.config.max_retries}): "
+                        f"{type(e).__name__}: {e}. Retrying in {wait:.1f}s..."
+                    )
+                    await asyncio.sleep(wait)
+                    delay *= self.config.retry_backoff
+        finally:
+            self._finish_stream(messages, output, estimated, t0, attempt, completed)
+
+
+def _estimate_stream_usage(messages: List[Dict[str, str]], output: List[str]) -> Dict[str, int]:
+    """流式响应不含 usage：按 prompt 与输出长度估算"""
+    prompt_tokens = estimate_tokens(messages)
+    completion_tokens = estimate_tokens([{"content": "".join(output)}])
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
 
 # ============================================================
 # 便捷工厂函数
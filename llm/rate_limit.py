@@ -0,0 +1,108 @@
+"""
+LLM 请求限流模块
+基于令牌桶实现「每分钟请求数 (RPM)」与「每分钟 token 数 (TPM)」双重限流，
+同时支持线程（同步）与 asyncio（异步）调用方，二者共享同一份额度。
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+def estimate_tokens(
+    messages: List[Dict[str, str]],
+    max_tokens: Optional[int] = None,
+) -> int:
+    """
+    粗略估计一次请求消耗的 token 数（请求前用于 TPM 限流，返回后按实际 usage 校正）。
+    中英文混排按约 2 字符 / token 估算，再加上 max_tokens 作为输出上限。
+    """
+    chars = sum(len(str(m.get("content", ""))) for m in messages)
+    return chars // 2 + 1 + (max_tokens or 0)
+
+
+def estimate_text_tokens(text: str) -> int:
+    """粗略估计一段文本的 token 数（同 estimate_tokens，用于切分片段、渲染预算等）"""
+    return estimate_tokens([{"content": text}])
+
+
+class _TokenBucket:
+    """单个令牌桶：容量为每分钟额度，按秒匀速补充。"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """获取 amount 个令牌还需等待的秒数（0 表示可立即获取）"""
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    RPM + TPM 双令牌桶限流器（线程安全，可同时用于同步与异步调用）。
+
+    Args:
+        requests_per_minute: 每分钟最大请求数，None 表示不限制
+        tokens_per_minute: 每分钟最大 token 数，None 表示不限制
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+    ):
+        self._requests = _TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = _TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, tokens: int) -> float:
+        """尝试同时获取 1 个请求额度和 tokens 个 token 额度；返回需等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+                if bucket is not None:
+                    bucket.refill(now)
+                    wait = max(wait, bucket.wait_time(amount))
+            if wait > 0:
+                return wait
+            if self._requests is not None:
+                self._requests.tokens -= 1
+            if self._tokens is not None:
+                self._tokens.tokens -= min(tokens, self._tokens.capacity)
+            return 0.0
+
+    def acquire(self, tokens: int = 0) -> None:
+        """阻塞直到获得额度（同步调用方使用）"""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int = 0) -> None:
+        """等待直到获得额度（异步调用方使用）"""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def adjust(self, delta: int) -> None:
+        """请求完成后按实际 token 用量校正：delta = 实际用量 - 预估用量"""
+        if self._tokens is None or delta == 0:
+            return
+        with self._lock:
+            self._tokens.refill(time.monotonic())
+            self._tokens.tokens = min(self._tokens.capacity, self._tokens.tokens - delta)
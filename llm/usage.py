@@ -0,0 +1,332 @@
+"""
+LLM 用量台账（token / 调用次数 / 重试 / 延迟）
+进程级、线程安全地累计每次 LLM 调用的用量，按标签（stage / region / dataset 等）聚合，
+并支持整次运行的 token 预算：超出后按配置直接中止（abort）或降级（degrade）。
+
+特性:
+  - 标签通过 contextvars 传递，与 tracing 一样在线程池中需用 contextvars.copy_context().run 提交
+  - BaseLLM 的每次调用（含缓存命中、失败；流式调用按长度估算 token）自动记账；
+    unified_scorer 的打分调用同样记账
+  - 延迟为调用方感知的端到端耗时（含限流等待与重试），汇总输出 p50 / p90 / p99
+  - 预算只在发起新请求前检查（缓存命中不受限）：
+      abort   超出后抛出 BudgetExceededError
+      degrade 超出后将后续请求的 max_tokens 压到 LLM_BUDGET_DEGRADE_MAX_TOKENS
+  - 预算是软上限：检查时不预留 token，用量在请求完成后才记入，因此已放行的并发请求
+    （批量 / 线程池）都会完成，实际用量可能超出预算最多约 并发数 × 单次请求用量
+
+用法:
+    from llm.usage import get_usage_ledger, usage_tags
+
+    with usage_tags(region="渝北区"):
+        with usage_tags(stage="writing"):
+            llm.generate(messages)                     # 记到 {region: 渝北区, stage: writing}
+
+    print(get_usage_ledger().format_summary(group_by=("stage",), region="渝北区"))
+"""
+
+import contextvars
+import math
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from utils import logger
+
+
+# 默认配置（可通过环境变量覆盖）
+_DEFAULT_TOKEN_BUDGET = int(os.getenv("LLM_RUN_TOKEN_BUDGET", "0"))
+_DEFAULT_BUDGET_MODE = os.getenv("LLM_BUDGET_MODE", "abort")
+_DEFAULT_DEGRADE_MAX_TOKENS = int(os.getenv("LLM_BUDGET_DEGRADE_MAX_TOKENS", "1024"))
+
+_BUDGET_MODES = ("abort", "degrade")
+_USAGE_KEYS = ("prompt_tokens", "completion_tokens", "total_tokens")
+
+_TagKey = Tuple[Tuple[str, str], ...]
+
+
+class BudgetExceededError(RuntimeError):
+    """本次运行的 LLM token 用量已超出预算（abort 模式）"""
+
+
+@dataclass
+class UsageStats:
+    """一组调用的累计用量"""
+    calls: int = 0
+    cached: int = 0
+    failures: int = 0
+    retries: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    latencies: List[float] = field(default_factory=list)
+
+    def merge(self, other: "UsageStats") -> None:
+        self.calls += other.calls
+        self.cached += other.cached
+        self.failures += other.failures
+        self.retries += other.retries
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.total_tokens += other.total_tokens
+        self.latencies.extend(other.latencies)
+
+    def percentile(self, q: float) -> float:
+        """延迟的 q 分位数（最近秩法，秒）；无数据时为 0"""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        rank = max(1, math.ceil(q / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "cached": self.cached,
+            "failures": self.failures,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "latency_p50": round(self.percentile(50), 3),
+            "latency_p90": round(self.percentile(90), 3),
+            "latency_p99": round(self.percentile(99), 3),
+        }
+
+
+class UsageLedger:
+    """
+    线程安全的 LLM 用量台账。
+
+    Args:
+        token_budget: 整次运行的 total_tokens 预算，<=0 表示不限制；None 时读取 LLM_RUN_TOKEN_BUDGET
+        mode: 超出预算后的处理方式 "abort" | "degrade"；None 时读取 LLM_BUDGET_MODE
+        degrade_max_tokens: degrade 模式下后续请求的 max_tokens 上限
+    """
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        mode: Optional[str] = None,
+        degrade_max_tokens: int = _DEFAULT_DEGRADE_MAX_TOKENS,
+    ):
+        self._lock = threading.Lock()
+        self._stats: Dict[_TagKey, UsageStats] = {}
+        self._total_tokens = 0
+        self._degrade_warned = False
+        self.set_budget(token_budget, mode, degrade_max_tokens)
+
+    # ---- 预算 ----
+
+    def set_budget(
+        self,
+        token_budget: Optional[int] = None,
+        mode: Optional[str] = None,
+        degrade_max_tokens: Optional[int] = None,
+    ) -> None:
+        """更新预算配置（参数为 None 时使用环境变量默认值）"""
+        mode = mode or _DEFAULT_BUDGET_MODE
+        if mode not in _BUDGET_MODES:
+            raise ValueError(f"LLM_BUDGET_MODE 必须为 {_BUDGET_MODES} 之一，当前为 {mode!r}")
+        self.token_budget = _DEFAULT_TOKEN_BUDGET if token_budget is None else token_budget
+        self.mode = mode
+        if degrade_max_tokens is not None:
+            self.degrade_max_tokens = degrade_max_tokens
+
+    @property
+    def total_tokens(self) -> int:
+        return self._total_tokens
+
+    @property
+    def exceeded(self) -> bool:
+        return self.token_budget > 0 and self._total_tokens >= self.token_budget
+
+    def admit(self, merged: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        发起新请求前检查预算。
+
+        只比较已记入的用量，不为本次请求预留 token：多个并发调用可能同时通过检查，
+        预算因此是软上限（见模块说明）。
+
+        Args:
+            merged: 本次请求的生成参数
+
+        Returns:
+            Dict: 实际使用的生成参数（degrade 模式下可能压低 max_tokens）
+
+        Raises:
+            BudgetExceededError: abort 模式下已超出预算
+        """
+        if not self.exceeded:
+            return merged
+        used, budget = self._total_tokens, self.token_budget
+        if self.mode == "abort":
+            raise BudgetExceededError(f"LLM token 用量 {used} 已超出本次运行预算 {budget}")
+        if not self._degrade_warned:
+            self._degrade_warned = True
+            logger.warning(
+                f"[Usage] LLM token 用量 {used} 已超出预算 {budget}，"
+                f"后续请求 max_tokens 限制为 {self.degrade_max_tokens}"
+            )
+        max_tokens = merged.get("max_tokens")
+        if max_tokens is not None and max_tokens <= self.degrade_max_tokens:
+            return merged
+        return {**merged, "max_tokens": self.degrade_max_tokens}
+
+    # ---- 记账 ----
+
+    def record(
+        self,
+        usage: Optional[Dict[str, Any]] = None,
+        latency: Optional[float] = None,
+        retries: int = 0,
+        cached: bool = False,
+        failed: bool = False,
+        **tags: Any,
+    ) -> None:
+        """
+        记录一次调用。
+
+        Args:
+            usage: LLMResponse.usage 形式的 token 用量（缓存命中时不计入 token）
+            latency: 端到端耗时（秒），缓存命中时不计入延迟分位数
+            retries: 重试次数（成功或最终失败前的失败次数）
+            cached: 是否来自响应缓存
+            failed: 是否最终失败
+            **tags: 额外标签，覆盖当前上下文中的同名标签
+        """
+        key = _tag_key({**_current_tags.get(), **tags})
+        with self._lock:
+            stats = self._stats.setdefault(key, UsageStats())
+            stats.calls += 1
+            stats.retries += retries
+            if cached:
+                stats.cached += 1
+                return
+            if failed:
+                stats.failures += 1
+            if latency is not None:
+                stats.latencies.append(latency)
+            if usage:
+                for name in _USAGE_KEYS:
+                    value = int(usage.get(name) or 0)
+                    setattr(stats, name, getattr(stats, name) + value)
+                self._total_tokens += int(usage.get("total_tokens") or 0)
+
+    def reset(self) -> None:
+        """清空全部记录（预算配置保留）"""
+        with self._lock:
+            self._stats.clear()
+            self._total_tokens = 0
+            self._degrade_warned = False
+
+    # ---- 汇总 ----
+
+    def summary(
+        self,
+        group_by: Sequence[str] = ("stage",),
+        **where: Any,
+    ) -> Dict[Tuple[str, ...], UsageStats]:
+        """
+        按标签聚合。
+
+        Args:
+            group_by: 分组标签名，缺少该标签的记录归入 "-"
+            **where: 只统计标签取值匹配的记录（如 region="渝北区"）
+
+        Returns:
+            Dict[Tuple[str, ...], UsageStats]: {分组取值: 累计用量}，按 total_tokens 降序
+        """
+        where = {k: str(v) for k, v in where.items()}
+        groups: Dict[Tuple[str, ...], UsageStats] = {}
+        with self._lock:
+            for key, stats in self._stats.items():
+                tags = dict(key)
+                if any(tags.get(k) != v for k, v in where.items()):
+                    continue
+                group = tuple(tags.get(name, "-") for name in group_by)
+                groups.setdefault(group, UsageStats()).merge(stats)
+        return dict(sorted(groups.items(), key=lambda item: -item[1].total_tokens))
+
+    def format_summary(
+        self,
+        group_by: Sequence[str] = ("stage",),
+        title: str = "LLM 用量汇总",
+        **where: Any,
+    ) -> str:
+        """summary() 的表格文本（末行为合计）"""
+        groups = self.summary(group_by, **where)
+        total = UsageStats()
+        for stats in groups.values():
+            total.merge(stats)
+        budget = f", 预算 {self.token_budget} ({self.mode})" if self.token_budget > 0 else ""
+        lines = [
+            f"{title}: {total.calls} 次调用, {total.total_tokens} tokens{budget}",
+            f"{'/'.join(group_by):<24}{'调用':>6}{'缓存':>6}{'失败':>6}{'重试':>6}"
+            f"{'prompt':>10}{'completion':>12}{'total':>10}{'p50':>8}{'p90':>8}{'p99':>8}",
+        ]
+        rows = list(groups.items()) + ([(("合计",), total)] if len(groups) > 1 else [])
+        for group, stats in rows:
+            lines.append(
+                f"{'/'.join(group):<24}{stats.calls:>6}{stats.cached:>6}{stats.failures:>6}"
+                f"{stats.retries:>6}{stats.prompt_tokens:>10}{stats.completion_tokens:>12}"
+                f"{stats.total_tokens:>10}{stats.percentile(50):>7.2f}s"
+                f"{stats.percentile(90):>7.2f}s{stats.percentile(99):>7.2f}s"
+            )
+        return "\n".join(lines)
+
+    def to_dict(self, group_by: Sequence[str] = ("stage",), **where: Any) -> Dict[str, Any]:
+        """summary() 的 JSON 友好形式"""
+        return {
+            "token_budget": self.token_budget,
+            "budget_mode": self.mode,
+            "total_tokens": self._total_tokens,
+            "groups": {
+                "/".join(group): stats.to_dict()
+                for group, stats in self.summary(group_by, **where).items()
+            },
+        }
+
+
+def _tag_key(tags: Dict[str, Any]) -> _TagKey:
+    return tuple(sorted((k, str(v)) for k, v in tags.items() if v is not None))
+
+
+# ============================================================
+# 上下文标签与单例
+# ============================================================
+
+_current_tags: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar(
+    "usage_tags", default={}
+)
+
+
+@contextmanager
+def usage_tags(**tags: Any) -> Iterator[Dict[str, Any]]:
+    """
+    在当前上下文中追加用量标签（与外层标签合并，同名时内层覆盖）。
+
+    Args:
+        **tags: 标签，如 stage="writing"、region="渝北区"、dataset="flag-1"
+    """
+    merged = {**_current_tags.get(), **tags}
+    token = _current_tags.set(merged)
+    try:
+        yield merged
+    finally:
+        _current_tags.reset(token)
+
+
+_ledger: Optional[UsageLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_usage_ledger() -> UsageLedger:
+    """获取全局用量台账（单例）"""
+    global _ledger
+    if _ledger is None:
+        with _ledger_lock:
+            if _ledger is None:
+                _ledger = UsageLedger()
+    return _ledger
@@ -2,21 +2,34 @@
 主入口
 从终端接收地区名，依次执行 数据分析 → 报告撰写 → 文本改写，
 最终将报告保存到 output/ 目录。
+
+用法:
+    python main.py 渝北区                      # 单个地区
+    python main.py --regions 渝北区,江北区      # 多个地区（考核表只读取一次，并发生成）
+    python main.py --all-regions --workers 4   # 考核表中的全部地区
+    python main.py --all-regions --region-column 区县/名称/名称   # 指定地区名称列（多级表头各层用 / 分隔）
+    python main.py 渝北区 --stream             # 流式：初稿按章节边生成边改写，报告增量写入 output/
 """
 
+import argparse
+import contextvars
 import sys
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Union, List
+from typing import Dict, Optional, Union, List
 
 import pandas as pd
 
-from llm import OpenAILikeLLM, LLMConfig
+from llm import OpenAILikeLLM, LLMConfig, get_usage_ledger, usage_tags
 from data_analysis import analyze_region
 from doc_writing import DocWriter
 from rewriting import Rewriter
-from utils import logger
-from utils.file_io import read_all_excel, data_save
+from utils import logger, tracing
+from utils.file_io import read_all_excel, data_save, resolve_save_path
+from utils.prompt_renderer import precompile_prompts
+from utils.ranking import add_ranking_columns
 import dotenv
 
 dotenv.load_dotenv()
@@ -30,48 +43,20 @@ ASSESSMENT_FILE = Path("data/overview_data/考核评估总表.xlsx")
 ASSESSMENT_HEADER = [0, 1, 2]  # 表头配置，按实际情况修改
 # 读取时忽略的列索引（int 或 List[int]），这些列不参与排名
 ASSESSMENT_IGNORE_COLUMNS: Union[int, List[int]] = [0, 1]
+# 地区名称所在列（--all-regions 时从该列读取地区列表），多级表头各层用 "/" 分隔；
+# 可通过环境变量 ASSESSMENT_REGION_COLUMN 或 --region-column 覆盖
+ASSESSMENT_REGION_COLUMN = tuple(os.getenv("ASSESSMENT_REGION_COLUMN", "区县/名称/名称").split("/"))
+# 补充材料表头配置（按 sheet 顺序对应）
+SUPPLEMENTARY_HEADER = [[2,3,4],[3,4],[0,1],[0,1],[0,1,2],[0,1],[0,1],[0,1],[0,1],[0,1],[0,1],[0,1],[0,1]]
+# 多地区批量模式的默认并发数
+DEFAULT_BATCH_WORKERS = 2
+# 是否默认使用流式撰写 + 逐章节改写（可通过环境变量 REPORT_STREAMING=1 或 --stream 开启）
+DEFAULT_STREAMING = os.getenv("REPORT_STREAMING", "0") != "0"
 
 # 输出目录
 OUTPUT_DIR = Path("output")
 
 
-def _add_ranking_columns(
-    df: pd.DataFrame,
-    ignore_columns: Union[int, List[int]],
-) -> pd.DataFrame:
-    """
-    为数值列添加排名列（从高到低，1 为最高），插入在原列右侧。
-    支持 MultiIndex 列名：上层保持不变，最后一级列名后加「排名」。
-
-    Args:
-        df: 原始 DataFrame
-        ignore_columns: 要忽略的列索引（int 或 List[int]），这些列不参与排名
-
-    Returns:
-        添加了排名列的新 DataFrame
-    """
-    if isinstance(ignore_columns, int):
-        ignore_set = {ignore_columns}
-    else:
-        ignore_set = set(ignore_columns)
-
-    new_data = {}
-    for col_idx, col in enumerate(df.columns):
-        series = df.iloc[:, col_idx]
-        new_data[col] = series
-        if col_idx in ignore_set:
-            continue
-        if pd.api.types.is_numeric_dtype(series):
-            rank_series = series.rank(ascending=False, method="min").astype("Int64")
-            if isinstance(df.columns, pd.MultiIndex):
-                new_name = (*col[:-1], str(col[-1]) + "排名")
-            else:
-                new_name = str(col) + "排名"
-            new_data[new_name] = rank_series
-
-    return pd.DataFrame(new_data)
-
-
 def _create_planning_llm() -> OpenAILikeLLM:
     """
     创建用于"数据分析规划"阶段的 LLM 客户端。
@@ -115,61 +100,157 @@ def _create_rewriting_llm() -> OpenAILikeLLM:
 # 主流程
 # ============================================================
 
-def run(region_name: str) -> Path:
+def load_assessment() -> pd.DataFrame:
+    """
+    读取考核评估总表并添加排名列。多地区批量模式下只调用一次，各地区共享结果。
+
+    Returns:
+        pd.DataFrame: 添加了排名列的考核数据
+    """
+    logger.info(f"读取考核评估数据: {ASSESSMENT_FILE}")
+    with tracing.span("excel.load", file=str(ASSESSMENT_FILE)):
+        dfs = read_all_excel(ASSESSMENT_FILE, header=ASSESSMENT_HEADER)
+    # 取第一个 sheet（或按需调整）
+    assessment_df = list(dfs.values())[0]
+    # 为数值列添加排名（从高到低），忽略 ignore_columns 指定的列
+    with tracing.span("ranking", shape=list(assessment_df.shape)):
+        assessment_df = add_ranking_columns(
+            assessment_df,
+            ignore_columns=ASSESSMENT_IGNORE_COLUMNS,
+        )
+    logger.info(f"考核数据 shape: {assessment_df.shape}")
+    logger.info(f"考核数据 columns: {assessment_df.head(3)}")
+    return assessment_df
+
+
+def list_regions(
+    assessment_df: pd.DataFrame,
+    region_column: Optional[tuple] = None,
+) -> List[str]:
+    """
+    从考核数据的地区名称列中读取全部地区（去重、保持原顺序）。
+
+    Args:
+        assessment_df: 考核数据
+        region_column: 地区名称列（多级表头为各层名称组成的元组），默认 ASSESSMENT_REGION_COLUMN
+
+    Raises:
+        ValueError: 考核数据中不存在该列（或只匹配到多级表头的一部分）
+    """
+    column = region_column or ASSESSMENT_REGION_COLUMN
+    if len(column) == 1:
+        column = column[0]
+    try:
+        values = assessment_df[column]
+    except KeyError:
+        values = None
+    if not isinstance(values, pd.Series):
+        sample = [_column_label(c) for c in assessment_df.columns[:5]]
+        raise ValueError(
+            f"考核表中找不到地区名称列 {_column_label(column)}，"
+            f"请通过 --region-column 或环境变量 ASSESSMENT_REGION_COLUMN 指定（多级表头各层用 / 分隔）。"
+            f"考核表前 {len(sample)} 列: {sample}"
+        )
+    regions = values.dropna().astype(str).str.strip()
+    return [r for r in dict.fromkeys(regions) if r]
+
+
+def _column_label(column) -> str:
+    """列名的可读形式：多级表头各层用 / 连接"""
+    return "/".join(map(str, column)) if isinstance(column, tuple) else str(column)
+
+
+def run(
+    region_name: str,
+    assessment_df: Optional[pd.DataFrame] = None,
+    timings: Optional[Dict[str, float]] = None,
+    stream: Optional[bool] = None,
+) -> Path:
     """
     对指定地区执行完整的报告生成流程。
 
     Args:
         region_name: 地区名称（如 "渝北区"）
+        assessment_df: 已加载并添加排名列的考核数据；None 时自动读取
+        timings: 可选，传入 dict 时记录各阶段耗时（秒）
+        stream: 是否流式撰写并逐章节改写（撰写与改写并行，报告增量写入）；None 时读取 REPORT_STREAMING
 
     Returns:
         Path: 最终报告保存路径
     """
+    timings = timings if timings is not None else {}
+    stream = DEFAULT_STREAMING if stream is None else stream
+    try:
+        with tracing.trace("report", region=region_name), usage_tags(region=region_name):
+            return _run_stages(region_name, assessment_df, timings, stream)
+    finally:
+        logger.info(
+            get_usage_ledger().format_summary(
+                group_by=("stage",), title=f"[Usage] {region_name} LLM 用量", region=region_name,
+            )
+        )
+
+
+def _run_stages(
+    region_name: str,
+    assessment_df: Optional[pd.DataFrame],
+    timings: Dict[str, float],
+    stream: bool = False,
+) -> Path:
+    """run() 的各阶段（在 report trace 内执行，每个阶段记录一个 span）"""
     logger.info(f"===== 开始处理: {region_name} =====")
 
     # ---- 1. 读取考核评估总表 ----
-    logger.info(f"[1/4] 读取考核评估数据: {ASSESSMENT_FILE}")
-    dfs = read_all_excel(ASSESSMENT_FILE, header=ASSESSMENT_HEADER)
-    # 取第一个 sheet（或按需调整）
-    assessment_df = list(dfs.values())[0]
-    # 为数值列添加排名（从高到低），忽略 ignore_columns 指定的列
-    assessment_df = _add_ranking_columns(
-        assessment_df,
-        ignore_columns=ASSESSMENT_IGNORE_COLUMNS,
-    )
-    logger.info(f"考核数据 shape: {assessment_df.shape}")
-    logger.info(f"考核数据 columns: {assessment_df.head(3)}")
+    t0 = time.perf_counter()
+    if assessment_df is None:
+        logger.info(f"[1/4] 读取考核评估数据: {ASSESSMENT_FILE}")
+        assessment_df = load_assessment()
+    else:
+        logger.info(f"[1/4] 使用已加载的考核评估数据: shape={assessment_df.shape}")
+    timings["load"] = time.perf_counter() - t0
 
     # ---- 2. 数据分析 ----
     logger.info(f"[2/4] 数据分析: {region_name}")
-    planning_llm = _create_planning_llm()
-    analysis_result = analyze_region(
-        assessment_df=assessment_df,
-        region_name=region_name,
-        supplementary_header=[[2,3,4],[3,4],[0,1],[0,1],[0,1,2],[0,1],[0,1],[0,1],[0,1],[0,1],[0,1],[0,1],[0,1]],
-        llm=planning_llm,
-        code_agent_kwargs={"max_steps": 3},
-    )
+    t0 = time.perf_counter()
+    with tracing.span("analysis"), usage_tags(stage="analysis"):
+        planning_llm = _create_planning_llm()
+        analysis_result = analyze_region(
+            assessment_df=assessment_df,
+            region_name=region_name,
+            supplementary_header=SUPPLEMENTARY_HEADER,
+            llm=planning_llm,
+            code_agent_kwargs={"max_steps": 3},
+        )
+    timings["analysis"] = time.perf_counter() - t0
     logger.info(f"分析结果长度: {len(analysis_result)} 字符")
     logger.info(f"分析结果：{analysis_result}")
 
+    if stream:
+        return _write_report_streaming(region_name, analysis_result, assessment_df, timings)
+
     # ---- 3. 报告撰写 ----
     logger.info(f"[3/4] 生成报告初稿: {region_name}")
-    writing_llm = _create_writing_llm()
-    writer = DocWriter(llm=writing_llm)
-    draft = writer.write(
-        analysis_result=analysis_result,
-        assessment_df=assessment_df,
-        region_name=region_name,
-    )
+    t0 = time.perf_counter()
+    with tracing.span("writing"), usage_tags(stage="writing"):
+        writing_llm = _create_writing_llm()
+        writer = DocWriter(llm=writing_llm)
+        draft = writer.write_document(
+            analysis_result=analysis_result,
+            assessment_df=assessment_df,
+            region_name=region_name,
+        )
+    timings["writing"] = time.perf_counter() - t0
     logger.info(f"初稿长度: {len(draft)} 字符")
     logger.info(f"初稿: {draft}")
 
     # ---- 4. 文本改写/润色 ----
     logger.info(f"[4/4] 改写润色: {region_name}")
-    rewriting_llm = _create_rewriting_llm()
-    rewriter = Rewriter(llm=rewriting_llm)
-    final_report = rewriter.rewrite(draft)
+    t0 = time.perf_counter()
+    with tracing.span("rewriting"), usage_tags(stage="rewriting"):
+        rewriting_llm = _create_rewriting_llm()
+        rewriter = Rewriter(llm=rewriting_llm)
+        final_report = rewriter.rewrite_document(draft)
+    timings["rewriting"] = time.perf_counter() - t0
     logger.info(f"最终报告长度: {len(final_report)} 字符")
 
     # ---- 5. 保存 ----
@@ -184,17 +265,206 @@ def run(region_name: str) -> Path:
     return output_path
 
 
+def _write_report_streaming(
+    region_name: str,
+    analysis_result: str,
+    assessment_df: pd.DataFrame,
+    timings: Dict[str, float],
+) -> Path:
+    """
+    流式撰写 + 逐章节改写：初稿的每个章节一完成即提交改写，改写结果按章节顺序增量写入 output/。
+    timings 中 first_section 为首个章节写入的耗时，writing 为初稿完成耗时，rewriting 为之后剩余的改写耗时。
+    """
+    logger.info(f"[3/4] 流式生成初稿并逐章节改写: {region_name}")
+    output_path = resolve_save_path(OUTPUT_DIR / f"{region_name}_报告", file_type="md")
+    t0 = time.perf_counter()
+    draft_parts: List[str] = []
+
+    def _draft_sections(sections):
+        # 记录初稿章节与初稿完成时间（改写在各章节完成时已开始）
+        for section in sections:
+            draft_parts.append(section)
+            yield section
+        timings["writing"] = time.perf_counter() - t0
+        logger.info(f"初稿生成完成: {len(draft_parts)} 个章节, 耗时 {timings['writing']:.1f}s")
+
+    n_chars = 0
+    with tracing.span("streaming") as sp:
+        with usage_tags(stage="writing"):
+            writer = DocWriter(llm=_create_writing_llm())
+            sections = writer.write_sections(
+                analysis_result=analysis_result,
+                assessment_df=assessment_df,
+                region_name=region_name,
+            )
+        with usage_tags(stage="rewriting"):
+            rewriter = Rewriter(llm=_create_rewriting_llm())
+            with open(output_path, "w", encoding="utf-8") as f:
+                for index, part in enumerate(rewriter.rewrite_stream(_draft_sections(sections))):
+                    if index == 0:
+                        timings["first_section"] = time.perf_counter() - t0
+                        logger.info(f"首个章节已写入 {output_path}: {timings['first_section']:.1f}s")
+                    f.write(part.rstrip("\n") + "\n\n")
+                    f.flush()
+                    n_chars += len(part)
+        sp.set(sections=len(draft_parts), first_section=round(timings.get("first_section", 0.0), 3))
+
+    total = time.perf_counter() - t0
+    timings["rewriting"] = total - timings.get("writing", total)
+    logger.info(f"初稿: {''.join(draft_parts)}")
+    logger.info(f"最终报告长度: {n_chars} 字符, 总耗时 {total:.1f}s")
+    logger.info(f"报告已保存至: {output_path}")
+    logger.info(f"===== 完成: {region_name} =====\n")
+    return output_path
+
+
+def run_batch(
+    region_names: Optional[List[str]] = None,
+    max_workers: int = DEFAULT_BATCH_WORKERS,
+    stream: Optional[bool] = None,
+    region_column: Optional[tuple] = None,
+) -> Dict[str, Dict]:
+    """
+    多地区批量生成：考核表只读取、排名一次，各地区报告并发生成。
+
+    Args:
+        region_names: 地区名称列表；None 表示考核表中的全部地区
+        max_workers: 同时处理的地区数
+        stream: 是否流式撰写并逐章节改写（同 run()）
+        region_column: region_names 为 None 时读取地区列表的列，默认 ASSESSMENT_REGION_COLUMN
+
+    Returns:
+        Dict[str, Dict]: {地区名: {"output_path", "error", "timings", "elapsed"}}，顺序与输入一致
+    """
+    # 整个批次记为一个 trace，各地区的 report 作为其子 span 并行展示
+    with tracing.trace("batch", workers=max_workers):
+        return _run_batch(region_names, max_workers, stream, region_column)
+
+
+def _run_batch(
+    region_names: Optional[List[str]],
+    max_workers: int,
+    stream: Optional[bool] = None,
+    region_column: Optional[tuple] = None,
+) -> Dict[str, Dict]:
+    """run_batch() 的实现（在 batch trace 内执行）"""
+    t0 = time.perf_counter()
+    assessment_df = load_assessment()
+    load_elapsed = time.perf_counter() - t0
+
+    if region_names is None:
+        region_names = list_regions(assessment_df, region_column)
+    logger.info(
+        f"===== 批量处理 {len(region_names)} 个地区，并发数 {max_workers}: {region_names} ====="
+    )
+
+    summary: Dict[str, Dict] = {
+        name: {"output_path": None, "error": None, "timings": {}, "elapsed": 0.0}
+        for name in region_names
+    }
+
+    def _run_one(name: str) -> None:
+        item = summary[name]
+        start = time.perf_counter()
+        try:
+            item["output_path"] = run(
+                name, assessment_df=assessment_df, timings=item["timings"], stream=stream
+            )
+        finally:
+            item["elapsed"] = time.perf_counter() - start
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, max_workers), thread_name_prefix="region"
+    ) as executor:
+        futures = {
+            executor.submit(contextvars.copy_context().run, _run_one, name): name
+            for name in region_names
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"[{name}] 报告生成失败: {type(e).__name__}: {e}")
+                summary[name]["error"] = f"{type(e).__name__}: {e}"
+
+    _print_batch_summary(summary, load_elapsed, time.perf_counter() - t0)
+    print(get_usage_ledger().format_summary(group_by=("region",), title="LLM 用量（按地区）"))
+    return summary
+
+
+def _print_batch_summary(
+    summary: Dict[str, Dict],
+    load_elapsed: float,
+    total_elapsed: float,
+) -> None:
+    """打印各地区耗时汇总"""
+    lines = [
+        "",
+        "=" * 80,
+        f"批量处理完成: {len(summary)} 个地区, 总耗时 {total_elapsed:.1f}s "
+        f"(考核表读取+排名 {load_elapsed:.1f}s)",
+        f"{'地区':<10}{'状态':<6}{'总耗时':>9}{'分析':>9}{'撰写':>9}{'改写':>9}  输出",
+        "-" * 80,
+    ]
+    for name, item in summary.items():
+        t = item["timings"]
+        status = "失败" if item["error"] else "成功"
+        detail = item["error"] if item["error"] else item["output_path"]
+        lines.append(
+            f"{name:<10}{status:<6}{item['elapsed']:>8.1f}s"
+            f"{t.get('analysis', 0):>8.1f}s{t.get('writing', 0):>8.1f}s"
+            f"{t.get('rewriting', 0):>8.1f}s  {detail}"
+        )
+    lines.append("=" * 80)
+    print("\n".join(lines))
+
+
 def main():
-    if len(sys.argv) > 1:
-        region_name = sys.argv[1]
-    else:
-        region_name = input("请输入地区名称: ").strip()
+    parser = argparse.ArgumentParser(description="产业分析报告生成")
+    parser.add_argument("region", nargs="?", default="", help="单个地区名称（如 渝北区）")
+    parser.add_argument("--regions", default="", help="多个地区，逗号分隔（如 渝北区,江北区）")
+    parser.add_argument("--all-regions", action="store_true", help="处理考核表中的全部地区")
+    parser.add_argument(
+        "--workers", type=int, default=DEFAULT_BATCH_WORKERS,
+        help=f"多地区模式下同时处理的地区数（默认 {DEFAULT_BATCH_WORKERS}）",
+    )
+    parser.add_argument(
+        "--stream", action="store_true", default=DEFAULT_STREAMING,
+        help="流式撰写并逐章节改写，报告增量写入 output/（默认读取 REPORT_STREAMING）",
+    )
+    parser.add_argument(
+        "--region-column", default="",
+        help="--all-regions 时读取地区列表的列，多级表头各层用 / 分隔（默认 "
+             f"{'/'.join(ASSESSMENT_REGION_COLUMN)}）",
+    )
+    args = parser.parse_args()
+    precompile_prompts()
+
+    if args.all_regions or args.regions:
+        region_names = None
+        if not args.all_regions:
+            region_names = [r.strip() for r in args.regions.split(",") if r.strip()]
+        region_column = tuple(args.region_column.split("/")) if args.region_column else None
+        try:
+            summary = run_batch(
+                region_names, max_workers=args.workers, stream=args.stream,
+                region_column=region_column,
+            )
+        except ValueError as e:
+            print(f"错误: {e}")
+            sys.exit(1)
+        if any(item["error"] for item in summary.values()):
+            sys.exit(1)
+        return
+
+    region_name = args.region.strip() or input("请输入地区名称: ").strip()
 
     if not region_name:
         print("错误: 地区名称不能为空")
         sys.exit(1)
 
-    output_path = run(region_name)
+    output_path = run(region_name, stream=args.stream)
     print(f"\n报告已生成: {output_path}")
 
 
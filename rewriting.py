@@ -15,15 +15,34 @@ Rewriting 模块
     rewriter = Rewriter(llm=llm)
     result = rewriter.rewrite("需要改写的文本")
     print(result)
+
+    # 流式：章节到达后合并为 token 受限的片段改写（与 DocWriter.write_sections 串联，初稿生成与改写并行）
+    for part in rewriter.rewrite_stream(writer.write_sections(...)):
+        print(part)
+
+    # 长文档：按标题切成 token 受限的片段并发改写，再按原顺序拼接
+    report = rewriter.rewrite_document(draft, max_chunk_tokens=2000, max_workers=4)
 """
 
-from typing import Optional
+import contextvars
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
 
 from llm import BaseLLM
+from llm.rate_limit import estimate_text_tokens
 from utils import logger
+from utils.markdown_sections import chunk_markdown, heading_level, pack_chunks, split_sections
 from utils.prompt_renderer import render_prompt
 
 
+# 默认配置（可通过环境变量覆盖）
+_DEFAULT_CHUNK_TOKENS = int(os.getenv("REWRITE_CHUNK_TOKENS", "2000"))
+_DEFAULT_MIN_SPLIT_TOKENS = int(os.getenv("REWRITE_MIN_SPLIT_TOKENS", "3000"))
+_DEFAULT_MAX_WORKERS = int(os.getenv("REWRITE_MAX_WORKERS", "4"))
+
+
 class Rewriter:
     """
     文本改写器。
@@ -68,10 +87,7 @@ class Rewriter:
         Returns:
             str: 改写后的文本
         """
-        messages = []
-        if self._system_prompt:
-            messages.append({"role": "system", "content": self._system_prompt})
-        messages.append({"role": "user", "content": text})
+        messages = self._build_messages(text)
 
         response = self.llm.generate(messages, **kwargs)
         logger.info(
@@ -85,18 +101,245 @@ class Rewriter:
         **kwargs,
     ) -> list[str]:
         """
-        批量改写多段文本。
+        批量改写多段文本（并发请求，并发数与限流由 llm.config 控制）。
         
         Args:
             texts: 需要改写的文本列表
             **kwargs: 覆盖 LLM 生成参数
             
         Returns:
-            list[str]: 改写后的文本列表
+            list[str]: 改写后的文本列表（顺序与输入一致）
+
+        Raises:
+            Exception: 任意一段改写失败时，抛出第一个失败项的异常
         """
+        logger.info(f"Rewriting batch of {len(texts)} texts...")
+        responses = self.llm.generate_batch(
+            [self._build_messages(text) for text in texts], **kwargs
+        )
+
         results = []
-        for i, text in enumerate(texts):
-            logger.info(f"Rewriting [{i+1}/{len(texts)}]...")
-            result = self.rewrite(text, **kwargs)
-            results.append(result)
+        for i, (text, resp) in enumerate(zip(texts, responses)):
+            if isinstance(resp, Exception):
+                logger.error(f"Rewriting [{i+1}/{len(texts)}] failed: {type(resp).__name__}: {resp}")
+                raise resp
+            logger.info(
+                f"Rewrite [{i+1}/{len(texts)}] done: "
+                f"input_len={len(text)}, output_len={len(resp.content)}"
+            )
+            results.append(resp.content)
         return results
+
+    def rewrite_stream(
+        self,
+        sections: Iterable[str],
+        max_chunk_tokens: Optional[int] = None,
+        min_split_tokens: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        **kwargs,
+    ) -> Iterator[str]:
+        """
+        rewrite_document 的流式版本：章节到达后按与 rewrite_document 相同的规则合并为
+        不超过 max_chunk_tokens 的片段（单个章节过长时按段落切分），片段一凑满即附带
+        共享上下文提交到线程池改写，按原顺序产出结果。
+        sections 可以是 DocWriter.write_sections 返回的流式迭代器，此时初稿生成与已完成片段的改写并行进行。
+
+        共享上下文取自已到达的章节：报告标题为第一个一级标题（没有时取第一个标题），
+        大纲为截至提交时已出现的标题。累计不超过 min_split_tokens 时不提前提交，
+        初稿结束后仍未超过或只有一个片段时整篇改写（同 rewrite()）。只有标题的片段原样输出。
+
+        Args:
+            sections: 章节文本（按顺序）
+            max_chunk_tokens: 单个片段的 token 上限，默认读取 REWRITE_CHUNK_TOKENS
+            min_split_tokens: 超过该 token 数才分段改写，默认读取 REWRITE_MIN_SPLIT_TOKENS
+            max_workers: 同时改写的片段数，默认为 llm.config.max_concurrency
+            **kwargs: 覆盖 LLM 生成参数
+
+        Yields:
+            str: 改写后的片段（顺序与输入一致）
+
+        Raises:
+            Exception: 任意片段改写失败时抛出该异常
+        """
+        max_chunk_tokens = max_chunk_tokens or _DEFAULT_CHUNK_TOKENS
+        min_split_tokens = _DEFAULT_MIN_SPLIT_TOKENS if min_split_tokens is None else min_split_tokens
+        workers = max(1, max_workers or self.llm.config.max_concurrency)
+
+        received: List[str] = []
+        headings: List[Tuple[int, str]] = []
+        chunks: List[str] = []        # 已凑满、尚未提交的片段
+        buffer = ""                    # 正在合并的片段
+        submitted = 0
+        pending: Deque[Future] = deque()
+
+        def submit(chunk: str) -> None:
+            nonlocal submitted
+            submitted += 1
+            if _is_heading_only(chunk):
+                future: Future = Future()
+                future.set_result(chunk)
+            else:
+                title, outline = _outline_context(headings)
+                logger.info(f"Rewriting chunk {submitted}: input_len={len(chunk)}")
+                future = executor.submit(
+                    contextvars.copy_context().run, self._rewrite_chunk,
+                    chunk, submitted, 0, title, outline, **kwargs,
+                )
+            pending.append(future)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rewrite") as executor:
+            for section in sections:
+                received.append(section)
+                headings.extend(_section_headings(section))
+                if estimate_text_tokens(section) <= max_chunk_tokens:
+                    units = [section]
+                else:
+                    units = chunk_markdown(section, max_chunk_tokens)
+                for unit in units:
+                    packed = pack_chunks([buffer, unit], max_chunk_tokens) if buffer else [unit]
+                    chunks.extend(packed[:-1])
+                    buffer = packed[-1]
+                # 累计超过 min_split_tokens 后才开始提交（否则可能整篇改写）
+                if submitted or estimate_text_tokens("".join(received)) > min_split_tokens:
+                    for chunk in chunks:
+                        submit(chunk)
+                    chunks = []
+                # 已完成的前缀片段立即产出，不等待初稿结束
+                while pending and pending[0].done():
+                    yield pending.popleft().result()
+
+            if buffer:
+                chunks.append(buffer)
+            text = "".join(received)
+            if not submitted and (len(chunks) <= 1 or estimate_text_tokens(text) <= min_split_tokens):
+                if text.strip():
+                    logger.info(f"rewrite_stream: {estimate_text_tokens(text)} tokens, 整篇改写")
+                    yield self.rewrite(text, **kwargs)
+                return
+            for chunk in chunks:
+                submit(chunk)
+            while pending:
+                yield pending.popleft().result()
+
+    def rewrite_document(
+        self,
+        text: str,
+        max_chunk_tokens: Optional[int] = None,
+        min_split_tokens: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        **kwargs,
+    ) -> str:
+        """
+        分段并发改写整篇 Markdown 文档。
+
+        在标题边界把文档切成不超过 max_chunk_tokens 的片段（单个章节过长时再按段落切分），
+        各片段附带共享上下文（报告标题 + 大纲）并发改写，再按原顺序拼接；只有标题的片段原样保留。
+        文档不超过 min_split_tokens 或只能切出一个片段时，回退为整篇改写（同 rewrite()）。
+
+        Args:
+            text: Markdown 文档
+            max_chunk_tokens: 单个片段的 token 上限，默认读取 REWRITE_CHUNK_TOKENS
+            min_split_tokens: 超过该 token 数才分段改写，默认读取 REWRITE_MIN_SPLIT_TOKENS
+            max_workers: 同时改写的片段数上限，默认读取 REWRITE_MAX_WORKERS
+            **kwargs: 覆盖 LLM 生成参数
+
+        Returns:
+            str: 改写后的文档
+
+        Raises:
+            Exception: 任意片段改写失败时抛出该异常
+        """
+        max_chunk_tokens = max_chunk_tokens or _DEFAULT_CHUNK_TOKENS
+        min_split_tokens = _DEFAULT_MIN_SPLIT_TOKENS if min_split_tokens is None else min_split_tokens
+        max_workers = max_workers or _DEFAULT_MAX_WORKERS
+
+        tokens = estimate_text_tokens(text)
+        chunks = chunk_markdown(text, max_chunk_tokens) if tokens > min_split_tokens else [text]
+        if len(chunks) <= 1:
+            logger.info(f"rewrite_document: {tokens} tokens, 整篇改写")
+            return self.rewrite(text, **kwargs)
+
+        title, outline = _outline_context(_section_headings(text))
+        workers = max(1, min(max_workers, len(chunks)))
+        logger.info(
+            f"rewrite_document: {tokens} tokens → {len(chunks)} 个片段, 并发 {workers}"
+        )
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rewrite") as executor:
+            futures: List[Future] = []
+            for index, chunk in enumerate(chunks, 1):
+                if _is_heading_only(chunk):
+                    # 只有标题的片段（如长章节前的报告标题）原样保留，不交给 LLM
+                    future: Future = Future()
+                    future.set_result(chunk)
+                else:
+                    future = executor.submit(
+                        contextvars.copy_context().run, self._rewrite_chunk,
+                        chunk, index, len(chunks), title, outline, **kwargs,
+                    )
+                futures.append(future)
+            results = [future.result() for future in futures]
+        return "\n\n".join(result.strip() for result in results)
+
+    def _rewrite_chunk(
+        self,
+        chunk: str,
+        index: int,
+        count: int,
+        title: str,
+        outline: str,
+        **kwargs,
+    ) -> str:
+        """改写单个片段（user prompt 附带报告标题与大纲；count 为 0 表示片段总数未知）"""
+        user_prompt = render_prompt(
+            "rewriting_chunk_user.j2",
+            chunk=chunk,
+            chunk_index=index,
+            chunk_count=count,
+            title=title,
+            outline=outline,
+        )
+        response = self.llm.generate(self._build_messages(user_prompt), **kwargs)
+        logger.info(
+            f"Rewrite chunk [{index}/{count or '?'}] done: "
+            f"input_len={len(chunk)}, output_len={len(response.content)}"
+        )
+        return response.content
+
+    def _build_messages(self, text: str) -> list[dict]:
+        """组装 system + user 消息"""
+        messages = []
+        if self._system_prompt:
+            messages.append({"role": "system", "content": self._system_prompt})
+        messages.append({"role": "user", "content": text})
+        return messages
+
+
+def _is_heading_only(section: str) -> bool:
+    """章节是否只有标题行（无正文，不需要改写）"""
+    lines = [line for line in section.splitlines() if line.strip()]
+    return all(heading_level(line) is not None for line in lines)
+
+
+# ============================================================
+# 文档切分
+# ============================================================
+
+def _section_headings(text: str) -> List[Tuple[int, str]]:
+    """按顺序提取文本中的标题 (级别, 标题文字)（代码块内的 # 行不算）"""
+    headings: List[Tuple[int, str]] = []
+    for section in split_sections(text, max_level=6):
+        first_line = section.split("\n", 1)[0]
+        level = heading_level(first_line)
+        if level is not None:
+            headings.append((level, first_line.strip().lstrip("#").strip()))
+    return headings
+
+
+def _outline_context(headings: List[Tuple[int, str]]) -> Tuple[str, str]:
+    """报告标题（第一个一级标题，没有时取第一个标题）与按级别缩进的标题大纲"""
+    if not headings:
+        return "", ""
+    title = next((name for level, name in headings if level == 1), headings[0][1])
+    top = min(level for level, _ in headings)
+    outline = "\n".join(f"{'  ' * (level - top)}- {name}" for level, name in headings)
+    return title, outline
@@ -15,6 +15,7 @@ _PROJECT_ROOT = Path(__file__).resolve().parent.parent
 if str(_PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(_PROJECT_ROOT))
 
+from llm.usage import usage_tags
 from utils import logger
 
 
@@ -81,8 +82,9 @@ def evaluate_insightbench(
             g if isinstance(g, str) else str(g) for g in gt_insights
         ]
 
-        avg_insight = _score_insights(pred_insights, gt_insight_strs)
-        summary_score = _score_summary(pred_summary, gt_summary) if (gt_summary and pred_summary) else 0.0
+        with usage_tags(dataset=ds_name):
+            avg_insight = _score_insights(pred_insights, gt_insight_strs)
+            summary_score = _score_summary(pred_summary, gt_summary) if (gt_summary and pred_summary) else 0.0
 
         per_dataset[ds_name] = {
             "insight_score": round(avg_insight, 4),
@@ -148,7 +150,8 @@ def evaluate_daco(
         pred_text = json.dumps(prediction, ensure_ascii=False)
         gt_text = json.dumps(gt_match, ensure_ascii=False)
 
-        score = _score_summary(pred_text, gt_text)
+        with usage_tags(dataset=db_id):
+            score = _score_summary(pred_text, gt_text)
         scores.append(score)
 
     avg_helpfulness = sum(scores) / len(scores) * 100 if scores else 0.0
@@ -81,6 +81,10 @@ def main():
 
     args = parser.parse_args()
     output_dir = Path(args.output_dir)
+
+    if not args.eval_only:
+        from utils.prompt_renderer import precompile_prompts
+        precompile_prompts()
     output_dir.mkdir(parents=True, exist_ok=True)
 
     if args.benchmark == "insightbench":
@@ -88,6 +92,23 @@ def main():
     elif args.benchmark == "daco":
         _run_daco(args, output_dir)
 
+    _write_usage_summary(args.benchmark, output_dir)
+
+
+def _write_usage_summary(benchmark: str, output_dir: Path):
+    """打印本次运行的 LLM 用量（Agent + 打分），并按 stage / dataset 明细保存为 JSON"""
+    from llm.usage import get_usage_ledger
+
+    ledger = get_usage_ledger()
+    print(f"\n{ledger.format_summary(group_by=('stage',), title=f'[{benchmark}] LLM 用量')}")
+    usage_file = output_dir / f"{benchmark}_usage.json"
+    with open(usage_file, "w", encoding="utf-8") as f:
+        json.dump({
+            "by_stage": ledger.to_dict(group_by=("stage",)),
+            "by_dataset": ledger.to_dict(group_by=("stage", "dataset")),
+        }, f, indent=2, ensure_ascii=False)
+    print(f"  用量明细保存到: {usage_file}")
+
 
 def _run_insightbench(args, output_dir: Path):
     from run_on_benchmark.adapter_insightbench import (
@@ -95,6 +116,7 @@ def _run_insightbench(args, output_dir: Path):
         load_ground_truth,
     )
     from run_on_benchmark.evaluator import evaluate_insightbench
+    from llm.usage import usage_tags
 
     data_dir = Path(args.data_dir)
     predictions_file = output_dir / "insightbench_predictions.json"
@@ -128,10 +150,11 @@ def _run_insightbench(args, output_dir: Path):
             print(f"  [{i}/{len(dataset_items)}] {ds_name} ...", end=" ", flush=True)
             t0 = time.time()
             try:
-                result = run_agent_on_dataset(
-                    dataset_dir=str(ds_item),
-                    max_queries=args.max_queries,
-                )
+                with usage_tags(stage="agent", dataset=ds_name):
+                    result = run_agent_on_dataset(
+                        dataset_dir=str(ds_item),
+                        max_queries=args.max_queries,
+                    )
                 all_results[ds_name] = result
                 print(f"OK ({time.time() - t0:.1f}s, {len(result.get('insights', []))} insights)")
             except Exception as e:
@@ -166,6 +189,7 @@ def _run_insightbench(args, output_dir: Path):
 def _run_daco(args, output_dir: Path):
     from run_on_benchmark.adapter_daco import run_agent_on_instance
     from run_on_benchmark.evaluator import evaluate_daco
+    from llm.usage import usage_tags
 
     data_dir = Path(args.data_dir)
     predictions_file = output_dir / "daco_predictions.json"
@@ -204,11 +228,12 @@ def _run_daco(args, output_dir: Path):
             print(f"  [{i}/{len(test_items)}] {db_id}: {query[:60]}...", end=" ", flush=True)
             t0 = time.time()
             try:
-                pred = run_agent_on_instance(
-                    db_path=str(db_path),
-                    query=query,
-                    max_queries=args.max_queries,
-                )
+                with usage_tags(stage="agent", dataset=db_id):
+                    pred = run_agent_on_instance(
+                        db_path=str(db_path),
+                        query=query,
+                        max_queries=args.max_queries,
+                    )
                 all_results.append({
                     "db_id": db_id,
                     "query": query,
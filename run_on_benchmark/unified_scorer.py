@@ -2,6 +2,7 @@
 
 使用 G-Eval (LLM-as-Judge) 方法对 insight / summary 进行语义评分。
 优先使用 logprobs 加权，API 不支持时自动回退到 Monte Carlo 采样。
+每次打分调用的 token 用量与延迟记入 llm.usage 的全局用量台账（stage=scoring）。
 
 配置来源：MyDataStorm/datastorm/llm_config.json
 """
@@ -12,12 +13,22 @@ import json
 import logging
 import os
 import re
+import sys
+import time
 from pathlib import Path
 from typing import Any
 
 import numpy as np
 from openai import OpenAI
 
+# 确保项目根目录在 sys.path 中（datastorm_adapter 以顶层模块方式导入本文件）
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+from llm.client_pool import get_sync_client
+from llm.usage import get_usage_ledger
+
 logger = logging.getLogger(__name__)
 
 # ============================================================
@@ -53,10 +64,22 @@ _logprobs_supported: bool | None = None
 
 
 def _create_client() -> OpenAI:
-    kwargs: dict[str, str] = {"api_key": _SCORER_API_KEY}
-    if _SCORER_API_BASE:
-        kwargs["base_url"] = _SCORER_API_BASE
-    return OpenAI(**kwargs)
+    """返回进程内共享的打分 client（复用 HTTP 连接池）。"""
+    return get_sync_client(_SCORER_API_BASE, _SCORER_API_KEY)
+
+
+def _record_usage(response: Any, t0: float, failed: bool = False) -> None:
+    """将一次打分调用记入全局用量台账（dataset 等标签取自调用方的 usage_tags 上下文）。"""
+    usage = None
+    if response is not None and getattr(response, "usage", None):
+        usage = {
+            "prompt_tokens": response.usage.prompt_tokens,
+            "completion_tokens": response.usage.completion_tokens,
+            "total_tokens": response.usage.total_tokens,
+        }
+    get_usage_ledger().record(
+        usage, time.perf_counter() - t0, failed=failed, stage="scoring", model=_SCORER_MODEL,
+    )
 
 
 # ============================================================
@@ -98,8 +121,9 @@ _SYSTEM_MESSAGE = (
 def _detect_logprobs(client: OpenAI, model: str) -> bool:
     """发送一次最小化 G-Eval 调用，检测 API 是否支持 logprobs 参数。"""
     prompt = _G_EVAL_TEMPLATE.format(answer="test", gt_answer="test")
+    t0 = time.perf_counter()
     try:
-        client.chat.completions.create(
+        response = client.chat.completions.create(
             model=model,
             messages=[
                 {"role": "system", "content": _SYSTEM_MESSAGE},
@@ -110,9 +134,11 @@ def _detect_logprobs(client: OpenAI, model: str) -> bool:
             logprobs=True,
             top_logprobs=3,
         )
+        _record_usage(response, t0)
         logger.info("Scorer: logprobs supported by %s", model)
         return True
     except Exception as e:
+        _record_usage(None, t0, failed=True)
         msg = str(e)
         if any(kw in msg.lower() for kw in ("logprobs", "log_probs", "top_logprobs", "unsupported parameter")):
             logger.info("Scorer: logprobs NOT supported by %s, will use Monte Carlo", model)
@@ -129,17 +155,23 @@ def _detect_logprobs(client: OpenAI, model: str) -> bool:
 def _score_pair_logprobs(client: OpenAI, model: str, answer: str, gt_answer: str) -> float:
     """使用 logprobs 加权的 G-Eval 评分。"""
     prompt = _G_EVAL_TEMPLATE.format(answer=answer, gt_answer=gt_answer)
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": _SYSTEM_MESSAGE},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0,
-        max_completion_tokens=50,
-        logprobs=True,
-        top_logprobs=5,
-    )
+    t0 = time.perf_counter()
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": _SYSTEM_MESSAGE},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0,
+            max_completion_tokens=50,
+            logprobs=True,
+            top_logprobs=5,
+        )
+    except Exception:
+        _record_usage(None, t0, failed=True)
+        raise
+    _record_usage(response, t0)
     raw = response.choices[0].message.content or ""
     rating_match = re.findall(r"<rating>(\d+)</rating>", raw)
     if not rating_match:
@@ -171,6 +203,7 @@ def _score_pair_monte_carlo(client: OpenAI, model: str, answer: str, gt_answer:
     prompt = _G_EVAL_TEMPLATE.format(answer=answer, gt_answer=gt_answer)
     ratings: list[float] = []
     for _ in range(_MC_SAMPLES):
+        t0 = time.perf_counter()
         try:
             response = client.chat.completions.create(
                 model=model,
@@ -181,11 +214,13 @@ def _score_pair_monte_carlo(client: OpenAI, model: str, answer: str, gt_answer:
                 temperature=0.3,
                 max_completion_tokens=50,
             )
+            _record_usage(response, t0)
             raw = response.choices[0].message.content or ""
             rating_match = re.findall(r"<rating>(\d+)</rating>", raw)
             if rating_match:
                 ratings.append(float(rating_match[0]))
         except Exception:
+            _record_usage(None, t0, failed=True)
             continue
     if not ratings:
         return 0.0
@@ -6,11 +6,18 @@ Data Inspector 模块
 """
 
 import os
-from typing import Union, Dict, Any, List, Optional
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Union, Dict, Any, List, Optional, Tuple
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
 from utils import logger
+from utils.lazy_workbook import LazySheet
+from utils.temp_file import dataframe_fingerprint
 
 
 # ============================================================
@@ -18,9 +25,10 @@ from utils import logger
 # ============================================================
 
 def describe_dataframes_schema(
-    dfs: Dict[str, pd.DataFrame],
+    dfs: Dict[str, Union[pd.DataFrame, LazySheet]],
     max_sample_rows: int = 0,
     max_unique_values: int = 0,
+    use_cache: bool = True,
 ) -> str:
     """
     将 read_all_excel 返回的 {sheet_name: DataFrame} 字典，转化为一段结构化的
@@ -28,8 +36,11 @@ def describe_dataframes_schema(
 
     Args:
         dfs: read_all_excel 返回的字典，key=sheet名，value=DataFrame
+             （也可以是未加载的 LazySheet，此时列类型 / 示例值基于预览行，行数来自工作簿元数据）
         max_sample_rows: 每列展示的示例值行数，默认 0（不展示）
         max_unique_values: 展示 unique 值的最大数量，默认 0（不展示）
+        use_cache: 是否使用单 sheet 描述缓存（按 DataFrame 内容指纹 + 参数缓存，
+                   任意 sheet 子集都可复用），默认 True
 
     Returns:
         str: 结构化描述字符串
@@ -40,43 +51,16 @@ def describe_dataframes_schema(
     lines.append(f"共包含 {len(dfs)} 个 Sheet\n")
 
     for sheet_idx, (sheet_name, df) in enumerate(dfs.items(), 1):
-        lines.append(f"【Sheet {sheet_idx}】 \"{sheet_name}\"  行数: {len(df)}  列数: {len(df.columns)}")
-
-        if isinstance(df.columns, pd.MultiIndex):
-            n_levels = df.columns.nlevels
-            lines.append(f"  表头: MultiIndex({n_levels}层)")
-            for col_idx, col in enumerate(df.columns):
-                # 转义列名中的换行符，让模型能看到\n并在代码中正确使用
-                col_path = " > ".join(str(c).replace('\n', '\\n') for c in col) if isinstance(col, tuple) else str(col).replace('\n', '\\n')
-                dtype = str(df.iloc[:, col_idx].dtype)
-                col_line = f"    [{col_idx}] {col_path}  ({dtype})"
-                if max_sample_rows > 0:
-                    sample_vals = _get_sample_values(df.iloc[:, col_idx], max_sample_rows)
-                    col_line += f"  示例: {sample_vals}"
-                if max_unique_values > 0:
-                    nunique = df.iloc[:, col_idx].nunique()
-                    if 0 < nunique <= max_unique_values:
-                        uniques = df.iloc[:, col_idx].dropna().unique().tolist()
-                        uniques = [_truncate_str(v) for v in uniques]
-                        col_line += f"  唯一值: {uniques}"
-                lines.append(col_line)
+        n_rows, note = df.shape[0], ""
+        if isinstance(df, LazySheet):
+            note = df.schema_note()
+            df = df.schema_frame()
+        lines.append(f"【Sheet {sheet_idx}】 \"{sheet_name}\"  行数: {n_rows}  列数: {len(df.columns)}{note}")
+        # 不展示示例值 / 唯一值时只涉及列名与类型，直接生成比计算指纹更快
+        if use_cache and (max_sample_rows > 0 or max_unique_values > 0):
+            lines.extend(_schema_cache.get_lines(df, max_sample_rows, max_unique_values))
         else:
-            lines.append("  表头: 单层")
-            for col_idx, col_name in enumerate(df.columns):
-                dtype = str(df.iloc[:, col_idx].dtype)
-                col_name_escaped = str(col_name).replace('\n', '\\n')
-                col_line = f"    [{col_idx}] \"{col_name_escaped}\"  ({dtype})"
-                if max_sample_rows > 0:
-                    sample_vals = _get_sample_values(df.iloc[:, col_idx], max_sample_rows)
-                    col_line += f"  示例: {sample_vals}"
-                if max_unique_values > 0:
-                    nunique = df.iloc[:, col_idx].nunique()
-                    if 0 < nunique <= max_unique_values:
-                        uniques = df.iloc[:, col_idx].dropna().unique().tolist()
-                        uniques = [_truncate_str(v) for v in uniques]
-                        col_line += f"  唯一值: {uniques}"
-                lines.append(col_line)
-
+            lines.extend(_describe_sheet_columns(df, max_sample_rows, max_unique_values))
         lines.append("")
 
     # 生成 DataFrame 变量引用指南
@@ -88,6 +72,221 @@ def describe_dataframes_schema(
     return "\n".join(lines)
 
 
+# 判断 unique 数量是否超过上限时先检查的前缀行数（前缀已超过上限即可提前结束）
+_UNIQUE_PROBE_ROWS = 1024
+
+
+@dataclass
+class ColumnProfile:
+    """单列画像：类型、空值数、前 N 个非空示例值、唯一值（数量不超过上限时）"""
+    dtype: str
+    null_count: int
+    samples: Optional[List[Any]] = None
+    uniques: Optional[List[Any]] = None
+
+
+def profile_columns(
+    df: pd.DataFrame,
+    max_sample_rows: int = 0,
+    max_unique_values: int = 0,
+) -> List[ColumnProfile]:
+    """
+    一次性计算所有列的画像。
+
+    - 空值：整表一次 isna()，同时得到各列空值数与非空位置
+    - 示例值：按非空位置直接取前 max_sample_rows 个
+    - 唯一值：先对前 _UNIQUE_PROBE_ROWS 个非空值去重，已超过 max_unique_values 则提前结束，
+      否则对整列非空值去重（保持首次出现顺序）
+    """
+    n_cols = df.shape[1]
+    dtypes = [str(t) for t in df.dtypes]
+    if max_sample_rows <= 0 and max_unique_values <= 0:
+        return [ColumnProfile(dtype=dtypes[i], null_count=0) for i in range(n_cols)]
+
+    # 转置为每列连续存放，后续按列取非空位置
+    not_null = np.ascontiguousarray(df.notna().to_numpy(dtype=bool).T)
+    null_counts = len(df) - not_null.sum(axis=1)
+
+    profiles = []
+    for col_idx in range(n_cols):
+        series = df.iloc[:, col_idx]
+        mask = not_null[col_idx]
+        profile = ColumnProfile(dtype=dtypes[col_idx], null_count=int(null_counts[col_idx]))
+
+        if max_sample_rows > 0:
+            positions = np.flatnonzero(mask)[:max_sample_rows]
+            profile.samples = series.iloc[positions].tolist()
+
+        if max_unique_values > 0:
+            non_null = series[mask]
+            if len(non_null) > _UNIQUE_PROBE_ROWS:
+                if len(non_null.iloc[:_UNIQUE_PROBE_ROWS].unique()) > max_unique_values:
+                    profiles.append(profile)
+                    continue
+            uniques = non_null.unique()
+            if 0 < len(uniques) <= max_unique_values:
+                profile.uniques = uniques.tolist()
+
+        profiles.append(profile)
+    return profiles
+
+
+def _format_column_extras(profile: ColumnProfile, max_str_len: int = 30) -> str:
+    """按原格式拼接示例值 / 唯一值部分"""
+    text = ""
+    if profile.samples is not None:
+        if not profile.samples:
+            sample_vals = "[全部为空]"
+        else:
+            formatted = [repr(_truncate_str(v, max_str_len)) for v in profile.samples]
+            suffix = f"  (空值数: {profile.null_count})" if profile.null_count > 0 else ""
+            sample_vals = f"[{', '.join(formatted)}]{suffix}"
+        text += f"  示例: {sample_vals}"
+    if profile.uniques is not None:
+        text += f"  唯一值: {[_truncate_str(v) for v in profile.uniques]}"
+    return text
+
+
+def _describe_sheet_columns(
+    df: pd.DataFrame,
+    max_sample_rows: int = 0,
+    max_unique_values: int = 0,
+) -> List[str]:
+    """生成单个 sheet 的表头类型行与逐列描述行（与 sheet 名、位置无关，可缓存）"""
+    profiles = profile_columns(df, max_sample_rows, max_unique_values)
+    lines: List[str] = []
+    if isinstance(df.columns, pd.MultiIndex):
+        n_levels = df.columns.nlevels
+        lines.append(f"  表头: MultiIndex({n_levels}层)")
+        for col_idx, col in enumerate(df.columns):
+            # 转义列名中的换行符，让模型能看到\n并在代码中正确使用
+            col_path = " > ".join(str(c).replace('\n', '\\n') for c in col) if isinstance(col, tuple) else str(col).replace('\n', '\\n')
+            profile = profiles[col_idx]
+            lines.append(f"    [{col_idx}] {col_path}  ({profile.dtype})" + _format_column_extras(profile))
+    else:
+        lines.append("  表头: 单层")
+        for col_idx, col_name in enumerate(df.columns):
+            col_name_escaped = str(col_name).replace('\n', '\\n')
+            profile = profiles[col_idx]
+            lines.append(f"    [{col_idx}] \"{col_name_escaped}\"  ({profile.dtype})" + _format_column_extras(profile))
+    return lines
+
+
+class SchemaProfileCache:
+    """
+    单 sheet 结构描述缓存（线程安全）。
+
+    键为 (类别, DataFrame 内容指纹, max_sample_rows, max_unique_values)，值为该 sheet 的描述行
+    （get_lines）或列画像（get_profiles，供 schema_renderer 使用），
+    因此同一 sheet 出现在不同的 sheet 子集、不同位置时都能复用。
+    指纹按对象身份记忆（对象被回收时自动失效），同一 DataFrame 重复描述时无需重新哈希；
+    若 DataFrame 在描述后被原地修改，需调用 clear()。
+
+    Args:
+        max_entries: 最多缓存的描述条数（LRU 淘汰）
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, int, int], Tuple[Any, ...]]" = OrderedDict()
+        self._fingerprints: Dict[int, Tuple[weakref.ref, Tuple[int, int], str]] = {}
+        # 弱引用回调可能在持锁期间由 GC 触发，使用可重入锁
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_lines(
+        self,
+        df: pd.DataFrame,
+        max_sample_rows: int,
+        max_unique_values: int,
+    ) -> List[str]:
+        """返回 sheet 描述行，未命中时计算并缓存"""
+        return self._get("lines", _describe_sheet_columns, df, max_sample_rows, max_unique_values)
+
+    def get_profiles(
+        self,
+        df: pd.DataFrame,
+        max_sample_rows: int,
+        max_unique_values: int,
+    ) -> List[ColumnProfile]:
+        """返回 profile_columns 的结果，未命中时计算并缓存（返回的 ColumnProfile 为共享对象，不应修改）"""
+        return self._get("profiles", profile_columns, df, max_sample_rows, max_unique_values)
+
+    def _get(self, kind, compute, df, max_sample_rows, max_unique_values) -> list:
+        key = (kind, self._fingerprint(df), max_sample_rows, max_unique_values)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(value)
+            self.misses += 1
+
+        value = tuple(compute(df, max_sample_rows, max_unique_values))
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return list(value)
+
+    def _fingerprint(self, df: pd.DataFrame) -> str:
+        obj_id = id(df)
+        with self._lock:
+            memo = self._fingerprints.get(obj_id)
+            if memo is not None and memo[0]() is df and memo[1] == df.shape:
+                return memo[2]
+
+        fingerprint = dataframe_fingerprint(df)
+        ref = weakref.ref(df, lambda _, obj_id=obj_id: self._forget(obj_id))
+        with self._lock:
+            self._fingerprints[obj_id] = (ref, df.shape, fingerprint)
+        return fingerprint
+
+    def _forget(self, obj_id: int) -> None:
+        with self._lock:
+            memo = self._fingerprints.get(obj_id)
+            if memo is not None and memo[0]() is None:
+                del self._fingerprints[obj_id]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._fingerprints.clear()
+
+
+_schema_cache = SchemaProfileCache(
+    max_entries=int(os.getenv("SCHEMA_CACHE_MAX_ENTRIES", "512"))
+)
+
+
+def clear_schema_cache() -> None:
+    """清空结构描述缓存（DataFrame 被原地修改后调用）"""
+    _schema_cache.clear()
+
+
+def schema_cache_stats() -> Dict[str, int]:
+    """返回结构描述缓存的命中 / 未命中计数"""
+    return _schema_cache.stats()
+
+
+def get_column_profiles(
+    df: pd.DataFrame,
+    max_sample_rows: int = 0,
+    max_unique_values: int = 0,
+    use_cache: bool = True,
+) -> List[ColumnProfile]:
+    """profile_columns 的缓存版本（与 describe_dataframes_schema 共用 SchemaProfileCache）"""
+    if use_cache and (max_sample_rows > 0 or max_unique_values > 0):
+        return _schema_cache.get_profiles(df, max_sample_rows, max_unique_values)
+    return profile_columns(df, max_sample_rows, max_unique_values)
+
+
 def _truncate_str(v, max_len: int = 30):
     """如果是字符串且超长则截断，保留原始类型"""
     if isinstance(v, str) and len(v) > max_len:
@@ -95,20 +294,6 @@ def _truncate_str(v, max_len: int = 30):
     return v
 
 
-def _get_sample_values(series: pd.Series, n: int = 3, max_str_len: int = 30) -> str:
-    """获取一列的前 n 个非空示例值，格式化为字符串，长文本截断"""
-    non_null = series.dropna()
-    if len(non_null) == 0:
-        return "[全部为空]"
-    samples = non_null.head(n).tolist()
-    formatted = [repr(_truncate_str(v, max_str_len)) for v in samples]
-    null_count = series.isna().sum()
-    suffix = ""
-    if null_count > 0:
-        suffix = f"  (空值数: {null_count})"
-    return f"[{', '.join(formatted)}]{suffix}"
-
-
 # ============================================================
 # 2. AI 查询
 # ============================================================
@@ -121,6 +306,7 @@ def query_dataframes(
     api_base: str = None,
     api_key: str = None,
     max_steps: int = 3,
+    schema_token_budget: Optional[int] = None,
     **agent_kwargs,
 ) -> str:
     """
@@ -140,6 +326,8 @@ def query_dataframes(
         api_base: API base URL，默认从环境变量读取
         api_key: API key，默认从环境变量读取
         max_steps: Agent 最大执行步数
+        schema_token_budget: 自动生成 schema 时的 token 预算（None 时读取 SCHEMA_TOKEN_BUDGET，
+                             >0 时使用 utils.schema_renderer 的紧凑格式）
         **agent_kwargs: 传递给 CodeAgent 的额外参数（如 temperature, top_p 等）
 
     Returns:
@@ -149,9 +337,18 @@ def query_dataframes(
 
     # 1. 生成或使用已有的 schema 描述
     if schema_str is None:
-        schema_str = describe_dataframes_schema(
-            dfs, max_sample_rows=3, max_unique_values=8
-        )
+        from utils.schema_renderer import default_token_budget, render_compact_schema
+
+        if schema_token_budget is None:
+            schema_token_budget = default_token_budget()
+        if schema_token_budget > 0:
+            schema_str = render_compact_schema(
+                dfs, schema_token_budget, max_sample_rows=3, max_unique_values=8
+            ).text
+        else:
+            schema_str = describe_dataframes_schema(
+                dfs, max_sample_rows=3, max_unique_values=8
+            )
     
     # 2. 构建完整的 prompt（不包含文件读取指令，读取指令由 Agent 自动生成）
     prompt = _build_query_prompt(schema_str, instruction, dfs)
@@ -177,7 +374,7 @@ def query_dataframes(
     # 4. 将所有 DataFrame 作为 additional_args 传入
     #    key 格式: sheet_<idx> 以避免特殊字符问题
     #    注意: CodeAgent.run() 内部会自动根据 DataFrame 列类型
-    #    选择正确的序列化方式（parquet 或 pickle），并生成对应的读取指令
+    #    选择正确的序列化方式（parquet / Arrow IPC / pickle），并生成对应的读取指令
     additional_args = {}
     for idx, (sheet_name, df) in enumerate(dfs.items()):
         var_name = f"sheet_{idx}"
@@ -207,7 +404,7 @@ def _build_query_prompt(
     
     注意: 此 prompt 只包含数据结构描述 + 变量映射 + 用户指令 + 编码要求。
     文件读取指令由 CodeAgent.run() 内部通过 get_simple_agent_var_instruction() 自动生成，
-    会根据 DataFrame 列类型（普通列用 parquet，MultiIndex 列用 pickle）
+    会根据 DataFrame 列类型（普通列用 parquet，MultiIndex 列用 Arrow IPC，无法无损序列化时用 pickle）
     生成正确的读取代码示例，不在此处重复指定，以避免指令冲突。
     """
     # 构建变量映射说明
@@ -360,6 +557,7 @@ class DataInspectorMCPTool:
             api_base=params.get("api_base"),
             api_key=params.get("api_key"),
             max_steps=params.get("max_steps", 3),
+            schema_token_budget=params.get("schema_token_budget"),
             **params.get("agent_kwargs", {}),
         )
         return {"result": result}
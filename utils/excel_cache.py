@@ -0,0 +1,281 @@
+"""
+Excel 解析结果磁盘缓存
+为 read_all_excel 提供透明的磁盘缓存：同一文件、同一 sheet / header 配置再次读取时，
+直接加载已规范化（前向填充 + 表头清理）的 DataFrame，跳过 openpyxl 解析。
+
+特性:
+  - 缓存键：文件绝对路径 + mtime + 大小 + sheet 选择 + header 配置 + 格式版本
+  - 每个 sheet 单独存为 Arrow IPC 文件（无法无损往返时回退为 pickle），命中时与重新解析的结果完全一致（含 dtype）
+  - 源文件修改后旧条目自动失效并删除；总大小超过上限时按最近访问时间淘汰
+  - 写入先落到临时目录再原子重命名，多线程 / 多进程并发读取同一文件时安全
+  - 默认缓存目录为项目根目录下的 .cache/excel（与当前工作目录无关）
+
+用法:
+    from utils.excel_cache import get_excel_cache
+
+    cache = get_excel_cache()
+    dfs = cache.load(path, sheet_name, header)      # 未命中返回 None
+    cache.store(path, sheet_name, header, dfs)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from utils import logger
+from utils.temp_file import is_arrow_lossless, read_arrow_dataframe, write_arrow
+
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# 默认配置（可通过环境变量覆盖；相对路径相对于项目根目录）
+_DEFAULT_CACHE_DIR = _PROJECT_ROOT / os.getenv("EXCEL_CACHE_DIR", ".cache/excel")
+_DEFAULT_MAX_MB = float(os.getenv("EXCEL_CACHE_MAX_MB", "1024"))
+_CACHE_ENABLED = os.getenv("EXCEL_CACHE", "1") != "0"
+
+# 规范化逻辑变化时递增，使旧缓存全部失效
+CACHE_FORMAT_VERSION = 2
+
+_MANIFEST_NAME = "manifest.json"
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for f in path.iterdir():
+        try:
+            total += f.stat().st_size
+        except OSError:
+            pass
+    return total
+
+
+class ExcelSheetCache:
+    """
+    Excel 解析结果磁盘缓存（线程安全）。
+
+    目录结构::
+
+        <root_dir>/<cache_key>/manifest.json   # 源文件信息 + sheet 顺序与文件名
+        <root_dir>/<cache_key>/0.arrow         # 各 sheet 数据
+        <root_dir>/<cache_key>/1.pkl
+
+    Args:
+        root_dir: 缓存目录
+        max_bytes: 缓存总大小上限（字节），<=0 表示不限制
+    """
+
+    def __init__(
+        self,
+        root_dir: Union[str, Path] = _DEFAULT_CACHE_DIR,
+        max_bytes: int = int(_DEFAULT_MAX_MB * 1024 ** 2),
+    ):
+        self.root_dir = Path(root_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    # ---- 公开接口 ----
+
+    def make_key(
+        self,
+        file_path: Union[str, Path],
+        sheet_name: Any,
+        header: Any,
+        extra: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """根据源文件状态与读取参数计算缓存键，返回 (key, 源文件信息)"""
+        file_path = Path(file_path).resolve()
+        stat = file_path.stat()
+        source = {
+            "path": str(file_path),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+        }
+        payload = json.dumps(
+            {
+                "version": CACHE_FORMAT_VERSION,
+                "source": source,
+                "sheet_name": sheet_name,
+                "header": header,
+                "extra": extra or {},
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest(), source
+
+    def load(
+        self,
+        file_path: Union[str, Path],
+        sheet_name: Any,
+        header: Any,
+        extra: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, pd.DataFrame]]:
+        """读取缓存，未命中（或缓存损坏）返回 None"""
+        key, _ = self.make_key(file_path, sheet_name, header, extra)
+        entry_dir = self.root_dir / key
+        manifest_path = entry_dir / _MANIFEST_NAME
+        if not manifest_path.exists():
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+            dfs = {}
+            for sheet in manifest["sheets"]:
+                path = entry_dir / sheet["file"]
+                if sheet["format"] == "arrow":
+                    dfs[sheet["name"]] = read_arrow_dataframe(str(path))
+                else:
+                    dfs[sheet["name"]] = pd.read_pickle(path)
+            # 更新访问时间，供 LRU 淘汰使用
+            os.utime(manifest_path)
+        except Exception as e:
+            logger.warning(f"[ExcelCache] 缓存读取失败，重新解析: {file_path}: {e}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+
+        with self._lock:
+            self._counters["hits"] += 1
+        logger.info(f"[ExcelCache] 命中缓存: {file_path} ({len(dfs)} 个 sheet)")
+        return dfs
+
+    def store(
+        self,
+        file_path: Union[str, Path],
+        sheet_name: Any,
+        header: Any,
+        dfs: Dict[str, pd.DataFrame],
+        extra: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """写入缓存；写入失败只记录警告，不影响调用方"""
+        try:
+            key, source = self.make_key(file_path, sheet_name, header, extra)
+            entry_dir = self.root_dir / key
+            if (entry_dir / _MANIFEST_NAME).exists():
+                return
+            self.root_dir.mkdir(parents=True, exist_ok=True)
+
+            tmp_dir = Path(tempfile.mkdtemp(prefix=".tmp_", dir=self.root_dir))
+            try:
+                sheets: List[Dict[str, Any]] = []
+                for idx, (name, df) in enumerate(dfs.items()):
+                    # 只有能无损往返的 sheet 才存 Arrow，保证命中时 dtype 与冷解析一致
+                    if is_arrow_lossless(df):
+                        file_name, fmt = f"{idx}.arrow", "arrow"
+                        write_arrow(str(tmp_dir / file_name), df)
+                    else:
+                        file_name, fmt = f"{idx}.pkl", "pickle"
+                        df.to_pickle(tmp_dir / file_name)
+                    sheets.append({"name": name, "file": file_name, "format": fmt})
+                manifest = {"source": source, "created": time.time(), "sheets": sheets}
+                (tmp_dir / _MANIFEST_NAME).write_text(
+                    json.dumps(manifest, ensure_ascii=False), encoding="utf-8"
+                )
+                os.rename(tmp_dir, entry_dir)
+            except OSError:
+                # 其他线程 / 进程已写入同一条目
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                if not (entry_dir / _MANIFEST_NAME).exists():
+                    raise
+                return
+            except BaseException:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise
+
+            with self._lock:
+                self._counters["stores"] += 1
+            logger.info(f"[ExcelCache] 已缓存: {file_path} ({len(sheets)} 个 sheet)")
+            self._remove_stale(source, keep=key)
+            self._evict()
+        except Exception as e:
+            logger.warning(f"[ExcelCache] 写入缓存失败: {file_path}: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中 / 未命中计数及当前缓存条数、总大小"""
+        entries = self._entries()
+        with self._lock:
+            result = dict(self._counters)
+        result["entries"] = len(entries)
+        result["bytes"] = sum(size for _, _, size, _ in entries)
+        return result
+
+    def clear(self) -> None:
+        """删除全部缓存"""
+        with self._lock:
+            shutil.rmtree(self.root_dir, ignore_errors=True)
+
+    # ---- 内部方法 ----
+
+    def _entries(self) -> List[Tuple[Path, float, int, Dict[str, Any]]]:
+        """列出全部完整条目：(目录, 最近访问时间, 大小, 源文件信息)"""
+        if not self.root_dir.exists():
+            return []
+        entries = []
+        for entry_dir in self.root_dir.iterdir():
+            manifest_path = entry_dir / _MANIFEST_NAME
+            try:
+                accessed = manifest_path.stat().st_mtime
+                source = json.loads(manifest_path.read_text(encoding="utf-8"))["source"]
+            except (OSError, ValueError, KeyError):
+                continue
+            entries.append((entry_dir, accessed, _dir_size(entry_dir), source))
+        return entries
+
+    def _remove_stale(self, source: Dict[str, Any], keep: str) -> None:
+        """删除同一源文件旧版本（mtime / 大小不同）的条目"""
+        for entry_dir, _, _, other in self._entries():
+            if entry_dir.name == keep or other.get("path") != source["path"]:
+                continue
+            if (other.get("mtime_ns"), other.get("size")) != (source["mtime_ns"], source["size"]):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                logger.info(f"[ExcelCache] 源文件已修改，删除旧缓存: {entry_dir.name}")
+
+    def _evict(self) -> None:
+        """按最近访问时间淘汰，直到总大小不超过上限"""
+        if self.max_bytes <= 0:
+            return
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        total = sum(size for _, _, size, _ in entries)
+        for entry_dir, _, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            with self._lock:
+                self._counters["evictions"] += 1
+            logger.info(f"[ExcelCache] 超过大小上限，淘汰: {entry_dir.name}")
+
+
+# ============================================================
+# 模块级单例
+# ============================================================
+
+_default_cache: Optional[ExcelSheetCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def excel_cache_enabled() -> bool:
+    """是否默认启用缓存（环境变量 EXCEL_CACHE=0 关闭）"""
+    return _CACHE_ENABLED
+
+
+def get_excel_cache() -> ExcelSheetCache:
+    """获取（或创建）进程级共享的默认 Excel 缓存"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ExcelSheetCache()
+        return _default_cache
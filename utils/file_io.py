@@ -1,12 +1,228 @@
 import json
+import multiprocessing
+import os
+import re
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Union, Dict, Any, List
+from typing import Union, Dict, Any, List, Optional, Tuple
 from utils import logger
+from utils.excel_cache import excel_cache_enabled, get_excel_cache
+
+# 并行解析 sheet 的默认进程数（<=1 表示逐个解析），可通过环境变量覆盖
+_DEFAULT_PARSE_WORKERS = int(os.getenv("EXCEL_PARSE_WORKERS", "1"))
+# Excel 解析引擎："auto" 优先使用 python-calamine（Rust 实现），未安装时回退 pandas 默认引擎（xlsx 为 openpyxl）
+_DEFAULT_EXCEL_ENGINE = os.getenv("EXCEL_ENGINE", "auto")
+
+
+def _calamine_available() -> bool:
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def resolve_excel_engine(engine: Optional[str] = None) -> Optional[str]:
+    """
+    确定实际使用的 Excel 解析引擎。
+
+    Args:
+        engine: "auto" / "calamine" / "openpyxl" / 其他 pandas 支持的引擎名；None 表示按环境变量 EXCEL_ENGINE 决定
+
+    Returns:
+        传给 pd.ExcelFile 的 engine 参数（None 表示由 pandas 按文件类型选择）
+    """
+    engine = engine or _DEFAULT_EXCEL_ENGINE
+    if engine != "auto":
+        return engine
+    return "calamine" if _calamine_available() else None
+
+
+def load_cached_excel(
+    file_path: Union[str, Path],
+    sheet_name: Union[str, int, list, None] = None,
+    header=0,
+    engine: Optional[str] = None,
+) -> Optional[Dict[str, pd.DataFrame]]:
+    """只查询磁盘缓存（参数含义同 read_all_excel），未命中或缓存关闭时返回 None，不解析文件"""
+    if not excel_cache_enabled():
+        return None
+    return get_excel_cache().load(
+        file_path, sheet_name, header, {"engine": resolve_excel_engine(engine)}
+    )
+
+
+# pandas 为空表头单元格生成的占位列名（如 "Unnamed: 3_level_1"）
+_UNNAMED_PATTERN = re.compile(r'^Unnamed:.*')
+
+
+def _is_missing_label(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def _normalize_multi_header_frame(columns: pd.MultiIndex) -> pd.MultiIndex:
+    """通用实现：借助 DataFrame 清理 Unnamed 并沿层级前向填充（适用于含非字符串列名的表头）"""
+    cols = columns.to_frame(index=False)
+    cols = cols.replace(_UNNAMED_PATTERN, None, regex=True)
+    cols = cols.ffill(axis=1)
+    return pd.MultiIndex.from_frame(cols)
+
+
+@lru_cache(maxsize=256)
+def _normalize_multi_header(
+    labels: Tuple[Tuple[Any, ...], ...],
+    names: Tuple[Any, ...],
+) -> pd.MultiIndex:
+    """
+    多行表头规范化：Unnamed 占位名置空，再用上一层的值填充（同一列内从左到右）。
+    按 (列名元组, 层级名) 缓存；纯字符串表头逐元组处理，避免构造中间 DataFrame。
+    """
+    columns = pd.MultiIndex.from_tuples(labels, names=names)
+    if not all(isinstance(v, str) or _is_missing_label(v) for label in labels for v in label):
+        return _normalize_multi_header_frame(columns)
+
+    normalized = []
+    for label in labels:
+        filled = []
+        prev = None
+        for value in label:
+            if isinstance(value, str) and _UNNAMED_PATTERN.match(value):
+                value = None
+            if _is_missing_label(value):
+                value = prev
+            else:
+                prev = value
+            filled.append(value)
+        normalized.append(tuple(filled))
+    # 与 to_frame / from_frame 一致：未命名的层级以层号命名
+    level_names = [i if name is None else name for i, name in enumerate(names)]
+    return pd.MultiIndex.from_tuples(normalized, names=level_names)
+
+
+@lru_cache(maxsize=256)
+def _normalize_single_header(labels: Tuple[Any, ...], name: Any) -> pd.Index:
+    """单行表头规范化：包含 Unnamed 的列名置空后前向填充"""
+    header_df = pd.Index(labels, name=name).to_series()
+    header_df[header_df.str.contains('Unnamed', na=False)] = None
+    header_df = header_df.ffill()
+    return pd.Index(header_df)
+
+
+def _normalize_header(columns: pd.Index) -> pd.Index:
+    """返回规范化后的列索引（缓存结果的副本，调用方修改 names 不影响缓存）"""
+    if isinstance(columns, pd.MultiIndex):
+        # Multirow header case.
+        return _normalize_multi_header(tuple(columns), tuple(columns.names)).copy()
+    # Single row of header, means type=Index
+    return _normalize_single_header(tuple(columns), columns.name).copy()
+
+
+def _is_list_of_lists(obj) -> bool:
+    """判断 header 是否为 list of list（每个 sheet 分别配置）"""
+    if isinstance(obj, list) and len(obj) > 0 and isinstance(obj[0], list):
+        return True
+    return False
+
+
+def resolve_sheet_header(header, sheet_idx: int, sheet_nm: str) -> Union[int, List[int]]:
+    """
+    按 read_all_excel 的 header 参数规则，确定第 sheet_idx 个待读取 sheet 的表头配置。
+
+    Args:
+        header: read_all_excel 的 header 参数
+        sheet_idx: sheet 在待读取列表中的序号（0-based）
+        sheet_nm: sheet 名称
+
+    Returns:
+        int 或 List[int]
+    """
+    if isinstance(header, int):
+        # 单个 int，所有 sheet 用同一行
+        return header
+    elif isinstance(header, dict):
+        # dict 映射，找不到则默认 0
+        return header.get(sheet_nm, 0)
+    elif isinstance(header, list):
+        if _is_list_of_lists(header):
+            # list of list，按顺序对应每个 sheet
+            return header[sheet_idx] if sheet_idx < len(header) else 0
+        else:
+            # 普通 list（如 [0, 1]），所有 sheet 用相同的多行表头
+            return header
+    return 0
+
+
+def _parse_sheet(
+    xlsx: pd.ExcelFile,
+    sn: Union[str, int],
+    hdr: Union[int, List[int]],
+    nrows: Optional[int] = None,
+) -> pd.DataFrame:
+    """读取单个 sheet（nrows 不为 None 时只读取前 nrows 行数据），并做前向填充与表头规范化"""
+    logger.info(f"Reading sheet: {sn}" + (f" (前 {nrows} 行)" if nrows is not None else ""))
+    df = pd.read_excel(
+        xlsx,
+        sheet_name=sn,
+        header=hdr,
+        nrows=nrows,
+    )
+    # 整表一次前向填充（按列向下，等价于逐列 ffill）
+    df = df.ffill()
+    try:
+        df.columns = _normalize_header(df.columns)
+    except Exception as e:
+        logger.info(f"Error normalizing header for sheet '{sn}': {e}")
+    return df
+
+
+def _parse_sheets_in_worker(
+    file_path: str,
+    tasks: List[Tuple[Union[str, int], Union[int, List[int]]]],
+    engine: Optional[str] = None,
+) -> List[Tuple[Union[str, int], pd.DataFrame]]:
+    """
+    子进程入口：打开工作簿，解析分配到的 sheet。
+    DataFrame 由进程池以 pickle 传回父进程，dtype 与逐个解析完全一致。
+
+    Returns:
+        [(sheet_name, DataFrame), ...]
+    """
+    with pd.ExcelFile(file_path, engine=engine) as xlsx:
+        return [(sn, _parse_sheet(xlsx, sn, hdr)) for sn, hdr in tasks]
+
+
+def _parse_sheets_parallel(
+    file_path: Path,
+    tasks: List[Tuple[Union[str, int], Union[int, List[int]]]],
+    max_workers: int,
+    engine: Optional[str] = None,
+) -> Dict[Union[str, int], pd.DataFrame]:
+    """将 sheet 轮询分配到多个子进程并行解析，返回 {sheet_name: DataFrame}"""
+    n_workers = min(max_workers, len(tasks))
+    chunks = [tasks[i::n_workers] for i in range(n_workers)]
+    logger.info(f"Parsing {len(tasks)} sheets in {n_workers} processes")
+    parsed = {}
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=ctx) as executor:
+        futures = [
+            executor.submit(_parse_sheets_in_worker, str(file_path), chunk, engine)
+            for chunk in chunks
+        ]
+        for future in futures:
+            for sn, df in future.result():
+                parsed[sn] = df
+    return parsed
+
+
 def read_all_excel(
     file_path: Union[str, Path],
     sheet_name: Union[str, int, list, None] = None,
-    header: Union[int, List[int], List[List[int]], Dict[str, Union[int, List[int]]]] = 0
+    header: Union[int, List[int], List[List[int]], Dict[str, Union[int, List[int]]]] = 0,
+    use_cache: Optional[bool] = None,
+    max_workers: Optional[int] = None,
+    engine: Optional[str] = None,
 ) -> Dict[str, pd.DataFrame]:
     """
     读取Excel文件的指定或所有sheet。
@@ -25,6 +241,13 @@ def read_all_excel(
                   如 header=[[0], [0,1], [1]] 表示第1个sheet用第1行，第2个sheet用前两行，第3个sheet用第2行
                 - Dict[str, int|List[int]]: 按sheet名称映射表头配置
                   如 header={"Sheet1": 0, "Sheet2": [0,1]}
+        use_cache: 是否使用磁盘缓存（见 utils/excel_cache.py），None 表示按环境变量 EXCEL_CACHE 决定（默认开启）。
+                   缓存键包含文件路径、mtime、大小、sheet 与 header 配置，文件修改后自动失效
+        max_workers: 并行解析 sheet 的进程数，None 表示按环境变量 EXCEL_PARSE_WORKERS 决定（默认 1，逐个解析）。
+                     >1 时各子进程分别打开工作簿解析分配到的 sheet，结果顺序与逐个解析一致
+        engine: Excel 解析引擎，"auto"（默认，安装了 python-calamine 时使用 calamine，否则回退 openpyxl）
+                或显式指定 "calamine" / "openpyxl"；None 表示按环境变量 EXCEL_ENGINE 决定。
+                不同引擎使用相同的表头 / MultiIndex 构造与 Unnamed 清理逻辑
                    
     Returns:
         Dict[str, pd.DataFrame]: 以sheet名为key，DataFrame为value的字典
@@ -35,10 +258,19 @@ def read_all_excel(
         logger.error(f"File not found: {file_path}")
         raise FileNotFoundError(f"文件不存在: {file_path}")
     
+    engine = resolve_excel_engine(engine)
+    cache_extra = {"engine": engine}
+    if use_cache is None:
+        use_cache = excel_cache_enabled()
+    if use_cache:
+        cached = get_excel_cache().load(file_path, sheet_name, header, cache_extra)
+        if cached is not None:
+            return cached
+    
     # 先获取所有sheet名称
-    xlsx = pd.ExcelFile(file_path)
+    xlsx = pd.ExcelFile(file_path, engine=engine)
     all_sheet_names = xlsx.sheet_names
-    logger.info(f"Reading excel file: {file_path}")
+    logger.info(f"Reading excel file: {file_path} (engine={xlsx.engine})")
     # 确定要读取的sheet列表
     if sheet_name is None:
         sheets_to_read = all_sheet_names
@@ -48,79 +280,41 @@ def read_all_excel(
         # list 类型
         sheets_to_read = [all_sheet_names[s] if isinstance(s, int) else s for s in sheet_name]
     
-    # 判断 header 是否为 list of list（每个 sheet 分别配置）
-    def is_list_of_lists(obj) -> bool:
-        if isinstance(obj, list) and len(obj) > 0 and isinstance(obj[0], list):
-            return True
-        return False
-    
-    # 构建每个 sheet 的 header 配置
-    def get_header(sheet_idx: int, sheet_nm: str) -> Union[int, List[int]]:
-        if isinstance(header, int):
-            # 单个 int，所有 sheet 用同一行
-            return header
-        elif isinstance(header, dict):
-            # dict 映射，找不到则默认 0
-            return header.get(sheet_nm, 0)
-        elif isinstance(header, list):
-            if is_list_of_lists(header):
-                # list of list，按顺序对应每个 sheet
-                return header[sheet_idx] if sheet_idx < len(header) else 0
-            else:
-                # 普通 list（如 [0, 1]），所有 sheet 用相同的多行表头
-                return header
-        return 0
-    
-    # 逐个读取 sheet
+    # 每个 sheet 的 header 在主进程中按原顺序确定
+    tasks = [(sn, resolve_sheet_header(header, idx, sn)) for idx, sn in enumerate(sheets_to_read)]
+    if max_workers is None:
+        max_workers = _DEFAULT_PARSE_WORKERS
+
     dfs = {}
-    for idx, sn in enumerate(sheets_to_read):
-        logger.info(f"Reading sheet: {sn}")
-        hdr = get_header(idx, sn)
-        df = pd.read_excel(
-            xlsx,
-            sheet_name=sn,
-            header=hdr
-        )
-        # 对每一列做前向填充
-        for col in df.columns:
-            df[col] = df[col].ffill()
-        try:
-            if isinstance(df.columns, pd.MultiIndex):
-                # Multirow header case.
-                cols = df.columns.to_frame(index=False)
-                cols = cols.replace(r'^Unnamed:.*', None, regex=True)
-                cols = cols.ffill(axis=1)
-                df.columns = pd.MultiIndex.from_frame(cols)
-            else:
-                # Single row of header, means type=Index
-                header_df = df.columns.to_series()
-                header_df[header_df.str.contains('Unnamed', na=False)] = None
-                header_df = header_df.ffill()
-                df.columns = header_df
-        except Exception as e:
-            logger.info(f"Error normalizing header for sheet '{sn}': {e}")
-
-        dfs[sn] = df
-    
-    xlsx.close()
+    if max_workers > 1 and len(tasks) > 1:
+        xlsx.close()
+        parsed = _parse_sheets_parallel(file_path, tasks, max_workers, engine)
+        for sn, _ in tasks:
+            dfs[sn] = parsed[sn]
+    else:
+        # 逐个读取 sheet
+        for sn, hdr in tasks:
+            dfs[sn] = _parse_sheet(xlsx, sn, hdr)
+        xlsx.close()
+    if use_cache:
+        get_excel_cache().store(file_path, sheet_name, header, dfs, cache_extra)
     return dfs
 
 
-def data_save(
-    data: Any,
+def resolve_save_path(
     file_path: Union[str, Path],
     file_type: str = "xlsx"
 ) -> Path:
     """
-    保存数据到文件。如果文件已存在，自动添加数字后缀。
-    
+    计算 data_save 的实际保存路径：补全扩展名，文件已存在时自动添加数字后缀，并创建父目录。
+    供需要自行（如增量）写入文件、但沿用 data_save 命名规则的调用方使用。
+
     Args:
-        data: 要保存的数据，支持 DataFrame, str, dict, list 等类型
         file_path: 目标文件路径（可以带或不带扩展名）
-        file_type: 文件类型，支持 "xlsx", "csv", "json", "txt", "md", "html" 等
-        
+        file_type: 路径不带扩展名时使用的文件类型
+
     Returns:
-        Path: 实际保存的文件路径
+        Path: 实际保存路径
     """
     file_path = Path(file_path)
     
@@ -147,9 +341,29 @@ def data_save(
     while target_path.exists():
         target_path = parent / f"{stem}_{counter}{suffix}"
         counter += 1
+    return target_path
+
+
+def data_save(
+    data: Any,
+    file_path: Union[str, Path],
+    file_type: str = "xlsx"
+) -> Path:
+    """
+    保存数据到文件。如果文件已存在，自动添加数字后缀。
     
+    Args:
+        data: 要保存的数据，支持 DataFrame, str, dict, list 等类型
+        file_path: 目标文件路径（可以带或不带扩展名）
+        file_type: 文件类型，支持 "xlsx", "csv", "json", "txt", "md", "html" 等
+        
+    Returns:
+        Path: 实际保存的文件路径
+    """
+    target_path = resolve_save_path(file_path, file_type)
+
     # 根据文件类型保存
-    suffix_lower = suffix.lower()
+    suffix_lower = target_path.suffix.lower()
     
     # DataFrame 专用格式
     if suffix_lower in [".xlsx", ".xls"]:
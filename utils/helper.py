@@ -16,9 +16,18 @@ def extract_code_from_response(response_text: str) -> Optional[str]:
     return "\n\n".join(match.strip() for match in matches)
 
 
-def build_variable_preamble(var_paths: Dict[str, str]) -> str:
-    """生成变量路径赋值的前置代码行，注入到脚本顶部。"""
+def build_variable_preamble(
+    var_paths: Dict[str, str], var_type_info: Optional[Dict[str, str]] = None
+) -> str:
+    """生成变量路径赋值的前置代码行，注入到脚本顶部。
+
+    存在 Arrow IPC 变量（type_name 为 'dataframe_arrow'）时，一并注入 read_arrow_dataframe()，
+    由它恢复原始列索引，而不依赖 LLM 生成的代码自行处理 schema metadata。
+    """
     lines = []
+    if var_type_info and 'dataframe_arrow' in var_type_info.values():
+        from utils.temp_file import ARROW_READER_SHIM
+        lines.append(ARROW_READER_SHIM)
     for var_name, path in var_paths.items():
         # 使用 repr 安全地转义路径中的反斜杠等特殊字符
         lines.append(f'{var_name} = {repr(path)}')
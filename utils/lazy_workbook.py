@@ -0,0 +1,216 @@
+"""
+按需加载的工作簿句柄
+打开工作簿时只读取每个 sheet 的前 N 行（规范化表头 + 列类型）与行数，
+完整 DataFrame 仅在第一次 load() 时解析（走 read_all_excel，复用磁盘缓存与解析引擎）。
+
+用于 analyze_region(lazy_load=True)：规划阶段只需要各 sheet 的结构，查询阶段只加载被路由到的 sheet，
+未被任何查询使用的 sheet 不会被完整解析。代价是规划用 schema 中未加载 sheet 的列类型 / 示例值 / 唯一值
+只反映预览行，行数可能来自工作簿元数据（openpyxl 的 max_row 会把带格式的空行计入）；
+这些信息在 schema 中以 schema_note() 标注。
+
+用法:
+    from utils.lazy_workbook import open_lazy_workbook, materialize_sheets
+
+    sheets = open_lazy_workbook("data/detailed_data/渝北区-25-06.xlsx", header=[[2, 3, 4], [3, 4]])
+    sheets["Sheet1"].columns          # 表头（来自预览）
+    sheets["Sheet1"].shape            # (行数, 列数)
+    df = sheets["Sheet1"].load()      # 完整 DataFrame（线程安全，只解析一次）
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from utils import logger, tracing
+from utils.file_io import (
+    _parse_sheet,
+    load_cached_excel,
+    read_all_excel,
+    resolve_excel_engine,
+    resolve_sheet_header,
+)
+
+
+# 预览读取的数据行数（用于推断列类型），可通过环境变量覆盖
+_DEFAULT_PREVIEW_ROWS = int(os.getenv("LAZY_SHEET_PREVIEW_ROWS", "100"))
+
+
+def _sheet_total_rows(xlsx: pd.ExcelFile, sheet_name: str) -> Optional[int]:
+    """从工作簿元数据读取 sheet 的总行数（含表头），无法获取时返回 None"""
+    try:
+        if xlsx.engine == "openpyxl":
+            return xlsx.book[sheet_name].max_row
+        if xlsx.engine == "calamine":
+            return xlsx.book.get_sheet_by_name(sheet_name).height
+    except Exception:
+        pass
+    return None
+
+
+def _header_row_count(hdr: Union[int, List[int]]) -> int:
+    return (max(hdr) if isinstance(hdr, list) else hdr) + 1
+
+
+class LazySheet:
+    """
+    单个 sheet 的按需加载句柄。
+
+    Args:
+        file_path: 工作簿路径
+        sheet_name: sheet 名称
+        header: 该 sheet 的表头配置（int 或 List[int]）
+        preview: 前 N 行数据（已做前向填充与表头规范化）
+        n_rows: 数据行数（不含表头）；None 表示未知，加载后以实际值为准
+        engine: Excel 解析引擎
+        n_rows_exact: n_rows 是否为实际行数（预览已读完全部数据时为 True；来自工作簿元数据时为 False）
+    """
+
+    def __init__(
+        self,
+        file_path: Union[str, Path],
+        sheet_name: str,
+        header: Union[int, List[int]],
+        preview: pd.DataFrame,
+        n_rows: Optional[int] = None,
+        engine: Optional[str] = None,
+        n_rows_exact: bool = False,
+    ):
+        self.file_path = Path(file_path)
+        self.sheet_name = sheet_name
+        self.header = header
+        self.preview = preview
+        self.engine = engine
+        self._n_rows = n_rows
+        self._n_rows_exact = n_rows_exact and n_rows is not None
+        self._df: Optional[pd.DataFrame] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dataframe(
+        cls,
+        file_path: Union[str, Path],
+        sheet_name: str,
+        header: Union[int, List[int]],
+        df: pd.DataFrame,
+        engine: Optional[str] = None,
+    ) -> "LazySheet":
+        """由已解析的完整 DataFrame 构造（已加载状态）"""
+        sheet = cls(file_path, sheet_name, header, df, n_rows=len(df), engine=engine, n_rows_exact=True)
+        sheet._df = df
+        return sheet
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._df is not None
+
+    @property
+    def columns(self) -> pd.Index:
+        return self._df.columns if self._df is not None else self.preview.columns
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        if self._df is not None:
+            return self._df.shape
+        n_rows = self._n_rows if self._n_rows is not None else len(self.preview)
+        return n_rows, self.preview.shape[1]
+
+    def schema_frame(self) -> pd.DataFrame:
+        """用于生成结构描述的 DataFrame：已加载时为完整数据，否则为预览"""
+        return self._df if self._df is not None else self.preview
+
+    def schema_note(self) -> str:
+        """结构描述中 sheet 标题后的说明：未加载时注明统计信息来自预览、行数是否为估计值；已加载时为空"""
+        if self._df is not None:
+            return ""
+        note = f"列类型 / 示例值 / 唯一值基于前 {len(self.preview)} 行预览"
+        if not self._n_rows_exact:
+            note += "，行数为工作簿元数据估计值、可能包含空行"
+        return f"  （{note}）"
+
+    def load(self) -> pd.DataFrame:
+        """解析并返回完整 DataFrame（多线程同时调用时只解析一次）"""
+        if self._df is not None:
+            return self._df
+        with self._lock:
+            if self._df is None:
+                logger.info(f"[LazySheet] 加载完整数据: {self.file_path.name} / {self.sheet_name}")
+                with tracing.span("excel.load", file=self.file_path.name, sheet=self.sheet_name):
+                    dfs = read_all_excel(
+                        self.file_path,
+                        sheet_name=self.sheet_name,
+                        header=self.header,
+                        engine=self.engine,
+                    )
+                self._df = dfs[self.sheet_name]
+        return self._df
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.is_loaded else "lazy"
+        return f"LazySheet({self.file_path.name!r}, {self.sheet_name!r}, shape={self.shape}, {state})"
+
+
+def open_lazy_workbook(
+    file_path: Union[str, Path],
+    header=0,
+    preview_rows: int = _DEFAULT_PREVIEW_ROWS,
+    engine: Optional[str] = None,
+) -> Dict[str, LazySheet]:
+    """
+    打开工作簿，返回 {sheet_name: LazySheet}（顺序与工作簿一致）。
+    每个 sheet 只解析前 preview_rows 行；header 规则与 read_all_excel 完全相同。
+    若 read_all_excel 的磁盘缓存中已有整个工作簿，直接返回已加载的句柄。
+
+    Args:
+        file_path: Excel 文件路径
+        header: 表头配置（同 read_all_excel 的 header 参数）
+        preview_rows: 预览读取的数据行数
+        engine: Excel 解析引擎（同 read_all_excel 的 engine 参数）
+
+    Returns:
+        Dict[str, LazySheet]
+    """
+    file_path = Path(file_path)
+    if not file_path.exists():
+        logger.error(f"File not found: {file_path}")
+        raise FileNotFoundError(f"文件不存在: {file_path}")
+
+    engine = resolve_excel_engine(engine)
+    cached = load_cached_excel(file_path, header=header, engine=engine)
+    if cached is not None:
+        return {
+            sn: LazySheet.from_dataframe(
+                file_path, sn, resolve_sheet_header(header, idx, sn), df, engine=engine
+            )
+            for idx, (sn, df) in enumerate(cached.items())
+        }
+
+    sheets: Dict[str, LazySheet] = {}
+    with pd.ExcelFile(file_path, engine=engine) as xlsx:
+        logger.info(f"Opening excel file lazily: {file_path} (engine={xlsx.engine})")
+        for idx, sn in enumerate(xlsx.sheet_names):
+            hdr = resolve_sheet_header(header, idx, sn)
+            preview = _parse_sheet(xlsx, sn, hdr, nrows=preview_rows)
+            # 预览未读满，说明已读到全部数据；否则行数只能从工作簿元数据估计
+            n_rows_exact = len(preview) < preview_rows
+            if n_rows_exact:
+                n_rows = len(preview)
+            else:
+                total = _sheet_total_rows(xlsx, sn)
+                n_rows = total - _header_row_count(hdr) if total is not None else None
+            sheets[sn] = LazySheet(
+                file_path, sn, hdr, preview, n_rows=n_rows, engine=engine, n_rows_exact=n_rows_exact
+            )
+    return sheets
+
+
+def materialize_sheets(
+    dfs: Dict[str, Union[pd.DataFrame, LazySheet]],
+) -> Dict[str, pd.DataFrame]:
+    """将字典中的 LazySheet 加载为完整 DataFrame，普通 DataFrame 原样保留"""
+    return {
+        name: value.load() if isinstance(value, LazySheet) else value
+        for name, value in dfs.items()
+    }
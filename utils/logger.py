@@ -1,12 +1,35 @@
 """
 Logger Module - 提供全局日志功能
 支持终端输出和文件日志记录
+
+文件日志默认异步写入：业务线程只把日志记录放入有界队列（QueueHandler），
+格式化与磁盘写入由后台线程（QueueListener）完成，log_to_file 写入的大段 prompt / 代码
+不再让并发线程在文件 handler 的锁上排队。
+  - 队列满时调用方阻塞等待（背压），超时仍未腾出空间则在当前线程同步写入，不丢日志
+  - 进程退出时（atexit / multiprocessing 子进程退出）自动排空队列并刷新文件
+  - 日志文件按日期命名（logs/YYYY-MM-DD.log），单个文件超过 LOG_MAX_MB 时滚动为 .1 / .2 ...
+  - multiprocessing 子进程（代码执行 worker、Sheet 解析进程池）不启动后台线程、也不滚动文件：
+    同步追加写入当天的日志文件，父进程滚动后自动重新打开，避免多个进程同时滚动同一文件丢失记录
 """
 
+import atexit
 import logging
+import logging.handlers
+import multiprocessing.util
 import os
+import queue
+import threading
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
+
+
+# 默认配置（可通过环境变量覆盖）
+_ASYNC_ENABLED = os.getenv("LOG_ASYNC", "1") != "0"
+_DEFAULT_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+_DEFAULT_QUEUE_TIMEOUT = float(os.getenv("LOG_QUEUE_TIMEOUT", "5"))
+_DEFAULT_MAX_MB = float(os.getenv("LOG_MAX_MB", "100"))
+_DEFAULT_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "20"))
 
 
 def _get_project_root() -> Path:
@@ -21,6 +44,70 @@ def _ensure_logs_dir() -> Path:
     return logs_dir
 
 
+class _DailyRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    按日期命名的文件 handler：跨天后切换到新日期的文件，
+    同一天内文件超过 max_bytes 时按 RotatingFileHandler 规则滚动（YYYY-MM-DD.log.1 ...）。
+    """
+
+    def __init__(self, logs_dir: Path, max_bytes: int, backup_count: int):
+        self.logs_dir = logs_dir
+        self._date = datetime.now().strftime("%Y-%m-%d")
+        super().__init__(
+            logs_dir / f"{self._date}.log",
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding="utf-8",
+        )
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if datetime.now().strftime("%Y-%m-%d") != self._date:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        today = datetime.now().strftime("%Y-%m-%d")
+        if today == self._date:
+            super().doRollover()
+            return
+        # 跨天：切换到新日期的文件，不做滚动
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        self._date = today
+        self.baseFilename = os.path.abspath(self.logs_dir / f"{today}.log")
+        self.stream = self._open()
+
+
+class _BlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    有界队列 handler：队列满时阻塞等待（背压），超时后交给 fallback handler 同步写入。
+    """
+
+    def __init__(self, log_queue: queue.Queue, fallback: logging.Handler, timeout: float):
+        super().__init__(log_queue)
+        self.fallback = fallback
+        self.timeout = timeout
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put(record, block=True, timeout=self.timeout)
+        except queue.Full:
+            self.fallback.handle(record)
+
+
+# 异步写入状态（_setup_logger 中初始化）
+_file_handler: Optional[logging.Handler] = None
+_log_queue: Optional[queue.Queue] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_shutdown_lock = threading.Lock()
+
+
+def _is_child_process() -> bool:
+    """当前是否为 multiprocessing 启动的子进程"""
+    return multiprocessing.parent_process() is not None
+
+
 def _setup_logger() -> logging.Logger:
     """配置并返回 logger 实例"""
     logger = logging.getLogger("report_generation")
@@ -46,18 +133,41 @@ def _setup_logger() -> logging.Logger:
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(console_format)
     
-    # 文件 Handler - 按日期生成日志文件
+    # 文件 Handler - 按日期生成日志文件，超过大小上限时滚动
+    global _file_handler, _log_queue, _listener
     logs_dir = _ensure_logs_dir()
-    log_filename = datetime.now().strftime("%Y-%m-%d") + ".log"
-    file_handler = logging.FileHandler(
-        logs_dir / log_filename,
-        encoding="utf-8"
-    )
+    child = _is_child_process()
+    if child:
+        # 子进程只追加写入，滚动由主进程负责；文件被滚动（改名）后重新打开，
+        # delay=True 使从不写文件日志的子进程不占用文件句柄
+        file_handler = logging.handlers.WatchedFileHandler(
+            logs_dir / f"{datetime.now().strftime('%Y-%m-%d')}.log",
+            encoding="utf-8",
+            delay=True,
+        )
+    else:
+        file_handler = _DailyRotatingFileHandler(
+            logs_dir,
+            max_bytes=int(_DEFAULT_MAX_MB * 1024 ** 2),
+            backup_count=_DEFAULT_BACKUP_COUNT,
+        )
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(file_format)
+    _file_handler = file_handler
     
     logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    if _ASYNC_ENABLED and not child:
+        # 文件写入交给后台线程；终端输出保持同步，与 print 的先后顺序一致
+        _log_queue = queue.Queue(maxsize=_DEFAULT_QUEUE_SIZE)
+        queue_handler = _BlockingQueueHandler(_log_queue, file_handler, _DEFAULT_QUEUE_TIMEOUT)
+        queue_handler.setLevel(logging.DEBUG)
+        logger.addHandler(queue_handler)
+        _listener = logging.handlers.QueueListener(
+            _log_queue, file_handler, respect_handler_level=True
+        )
+        _listener.start()
+    else:
+        logger.addHandler(file_handler)
     
     return logger
 
@@ -96,6 +206,36 @@ def get_logger() -> logging.Logger:
     return _logger
 
 
+def flush() -> None:
+    """等待队列中已提交的日志全部写入文件"""
+    if _listener is not None:
+        _log_queue.join()
+    if _file_handler is not None:
+        _file_handler.flush()
+
+
+def shutdown() -> None:
+    """停止后台写入线程：排空队列、关闭文件（进程退出时自动调用，可重复调用）"""
+    global _listener
+    with _shutdown_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+            # 停止后的日志直接同步写入文件
+            for handler in list(_logger.handlers):
+                if isinstance(handler, _BlockingQueueHandler):
+                    _logger.removeHandler(handler)
+                    _logger.addHandler(_file_handler)
+        if _file_handler is not None:
+            _file_handler.flush()
+
+
+if _listener is not None:
+    atexit.register(shutdown)
+    # multiprocessing 子进程退出时不执行 atexit，需单独注册
+    multiprocessing.util.Finalize(None, shutdown, exitpriority=0)
+
+
 import uuid as _uuid
 
 def log_to_file(content: str, label: str = "RECORD") -> str:
@@ -0,0 +1,169 @@
+"""
+Markdown 报告按标题切分
+报告初稿以 Markdown 标题组织章节。本模块在标题边界把文本切成章节，
+既可切分完整文本，也可增量消费流式输出：某一章节之后的下一个标题行完整到达时，
+该章节即视为完成并立即产出，供下游（如 Rewriter）提前处理。
+
+  - 只在 level <= max_level 的 ATX 标题（"# " ~ "###### "）处切分，更深的标题留在章节内
+  - 代码块（``` / ~~~）内以 # 开头的行不视为标题
+  - 第一个标题之前的内容（如无标题的导语）单独作为一个章节
+  - 切分不增删任何字符："".join(sections) 与原文完全一致
+
+chunk_markdown / pack_chunks 在此基础上把文本合并为 token 受限的片段，供分段改写、分段摘要使用。
+
+用法:
+    from utils.markdown_sections import split_sections, iter_sections, chunk_markdown
+
+    sections = split_sections(draft, max_level=2)
+    for section in iter_sections(llm.generate_stream(messages)):
+        ...
+    chunks = chunk_markdown(draft, max_tokens=2000)
+"""
+
+import re
+from typing import Iterable, Iterator, List, Optional
+
+from llm.rate_limit import estimate_text_tokens
+
+_HEADING_RE = re.compile(r"^ {0,3}(#{1,6})(?:[ \t]|$)")
+_FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+
+
+def heading_level(line: str) -> Optional[int]:
+    """ATX 标题行的级别（1-6），不是标题时返回 None"""
+    match = _HEADING_RE.match(line)
+    return len(match.group(1)) if match else None
+
+
+class _SectionSplitter:
+    """逐行判断章节边界（记录是否处于代码块内）"""
+
+    def __init__(self, max_level: int):
+        self.max_level = max_level
+        self._fence: Optional[str] = None
+
+    def is_boundary(self, line: str) -> bool:
+        fence = _FENCE_RE.match(line)
+        if fence:
+            marker = fence.group(1)
+            if self._fence is None:
+                self._fence = marker[0] * 3
+            elif marker.startswith(self._fence):
+                self._fence = None
+            return False
+        if self._fence is not None:
+            return False
+        level = heading_level(line)
+        return level is not None and level <= self.max_level
+
+
+def split_sections(text: str, max_level: int = 2) -> List[str]:
+    """
+    在标题边界把 Markdown 文本切成章节。
+
+    Args:
+        text: Markdown 文本
+        max_level: 参与切分的最深标题级别（2 表示按 # 与 ## 切分）
+
+    Returns:
+        List[str]: 章节列表（每个章节以其标题行开头，保留原有换行）
+    """
+    return list(iter_sections([text], max_level=max_level))
+
+
+def iter_sections(chunks: Iterable[str], max_level: int = 2) -> Iterator[str]:
+    """
+    增量版 split_sections：消费流式文本片段，章节一完成即产出。
+
+    Args:
+        chunks: 文本片段（如 BaseLLM.generate_stream 的输出）
+        max_level: 参与切分的最深标题级别
+
+    Yields:
+        str: 完整的章节文本；流结束时产出最后一个章节
+    """
+    splitter = _SectionSplitter(max_level)
+    section: List[str] = []
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            if splitter.is_boundary(line) and any(s.strip() for s in section):
+                yield "".join(section)
+                section = []
+            section.append(line + "\n")
+    if pending:
+        if splitter.is_boundary(pending) and any(s.strip() for s in section):
+            yield "".join(section)
+            section = []
+        section.append(pending)
+    if section:
+        yield "".join(section)
+
+
+# ============================================================
+# token 受限的片段
+# ============================================================
+
+def pack_chunks(units: Iterable[str], max_tokens: int) -> List[str]:
+    """
+    按顺序把相邻文本单元合并为不超过 max_tokens 的片段（单个单元超限时独立成段）。
+
+    Args:
+        units: 文本单元（如章节、段落）
+        max_tokens: 单个片段的 token 上限
+
+    Returns:
+        List[str]: 片段列表，"".join 与 "".join(units) 一致
+    """
+    chunks: List[str] = []
+    current = ""
+    for unit in units:
+        if current and estimate_text_tokens(current + unit) > max_tokens:
+            chunks.append(current)
+            current = ""
+        current += unit
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_markdown(text: str, max_tokens: int) -> List[str]:
+    """
+    把 Markdown 文档切成 token 受限的片段：先在各级标题边界切成章节，
+    再将相邻章节合并到不超过 max_tokens；单个章节超限时按空行分隔的段落继续切分
+    （单个段落仍超限时独立成段）。"".join 所有片段与原文一致。
+
+    Args:
+        text: Markdown 文档
+        max_tokens: 单个片段的 token 上限
+
+    Returns:
+        List[str]: 按原顺序排列的片段
+    """
+    units: List[str] = []
+    for section in split_sections(text, max_level=6):
+        if estimate_text_tokens(section) <= max_tokens:
+            units.append(section)
+        else:
+            units.extend(_split_paragraphs(section))
+    return pack_chunks(units, max_tokens)
+
+
+def _split_paragraphs(section: str) -> List[str]:
+    """按空行切分段落，空行保留在上一段末尾；只有标题行的段落并入下一段，避免标题与正文分离"""
+    parts = section.split("\n\n")
+    paragraphs = [part + "\n\n" for part in parts[:-1]] + ([parts[-1]] if parts[-1] else [])
+    merged: List[str] = []
+    carry = ""
+    for paragraph in paragraphs:
+        lines = [line for line in paragraph.splitlines() if line.strip()]
+        if lines and all(heading_level(line) is not None for line in lines):
+            carry += paragraph
+            continue
+        merged.append(carry + paragraph)
+        carry = ""
+    if carry:
+        merged.append(carry)
+    return merged
@@ -6,6 +6,9 @@ Prompt 模板渲染器
   - 模板中引用但调用方未传入的变量 → 警告 + 替换为空字符串（不报错）
   - 调用方传入但模板中未使用的多余变量 → 警告（不报错）
   - 支持 Jinja2 完整语法（条件判断 {% if %}、循环 {% for %}、过滤器等）
+  - 每个模板编译结果与其引用变量集合只计算一次，模板文件 mtime 变化时自动重新编译
+  - 可选 Jinja2 字节码磁盘缓存（PROMPT_BYTECODE_CACHE_DIR），进程重启后跳过模板编译
+  - precompile_prompts() 在启动时预编译全部模板，之后每次渲染只剩 render 本身
 
 用法:
     from utils.prompt_renderer import render_prompt, PromptRenderer
@@ -16,12 +19,18 @@ Prompt 模板渲染器
     # 或手动创建渲染器
     renderer = PromptRenderer(template_dir="prompts")
     text = renderer.render("doc_writing_user.j2", analysis_result="...", df_text="...")
+
+    # 启动时预编译
+    precompile_prompts()
 """
 
+import os
+import threading
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Optional, Union
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Union
 
-from jinja2 import Environment, FileSystemLoader, Undefined, meta
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template, Undefined, meta
 
 from utils import logger
 
@@ -29,6 +38,13 @@ from utils import logger
 # 默认模板目录
 _DEFAULT_TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "prompts"
 
+# Jinja2 字节码缓存目录（为空表示不启用）与模板热更新开关，可通过环境变量覆盖
+_DEFAULT_BYTECODE_CACHE_DIR = os.getenv("PROMPT_BYTECODE_CACHE_DIR", "")
+_DEFAULT_AUTO_RELOAD = os.getenv("PROMPT_AUTO_RELOAD", "1") != "0"
+
+# 预编译时匹配的模板后缀
+_TEMPLATE_SUFFIXES = (".j2",)
+
 
 # ============================================================
 # 自定义 Undefined：遇到缺失变量不报错，返回空字符串并警告
@@ -61,24 +77,106 @@ class _SilentUndefined(Undefined):
 # 渲染器
 # ============================================================
 
+@dataclass(frozen=True)
+class _CompiledTemplate:
+    """单个模板的编译结果：Template 对象 + 模板引用的变量名 + 编译时的文件 mtime"""
+    template: Template
+    variables: FrozenSet[str]
+    mtime_ns: Optional[int]
+
+
 class PromptRenderer:
     """
-    Prompt 模板渲染器。
+    Prompt 模板渲染器（线程安全）。
 
     Args:
         template_dir: 模板文件所在目录，默认为项目根目录下的 prompts/
+        bytecode_cache_dir: Jinja2 字节码缓存目录，None / 空字符串表示不启用
+        auto_reload: 每次渲染前检查模板文件 mtime，变化时重新编译；
+                     关闭后模板只编译一次（适合部署环境）
     """
 
-    def __init__(self, template_dir: Union[str, Path] = _DEFAULT_TEMPLATE_DIR):
+    def __init__(
+        self,
+        template_dir: Union[str, Path] = _DEFAULT_TEMPLATE_DIR,
+        bytecode_cache_dir: Optional[Union[str, Path]] = _DEFAULT_BYTECODE_CACHE_DIR,
+        auto_reload: bool = _DEFAULT_AUTO_RELOAD,
+    ):
         self.template_dir = Path(template_dir)
+        self.auto_reload = auto_reload
+        bytecode_cache = None
+        if bytecode_cache_dir:
+            Path(bytecode_cache_dir).mkdir(parents=True, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(str(bytecode_cache_dir))
         self.env = Environment(
             loader=FileSystemLoader(str(self.template_dir)),
             undefined=_SilentUndefined,
             keep_trailing_newline=False,
             trim_blocks=True,
             lstrip_blocks=True,
+            auto_reload=auto_reload,
+            bytecode_cache=bytecode_cache,
+        )
+        self._compiled: Dict[str, _CompiledTemplate] = {}
+        self._lock = threading.Lock()
+        logger.info(
+            f"PromptRenderer initialized: template_dir={self.template_dir}, "
+            f"bytecode_cache={bytecode_cache_dir or None}, auto_reload={auto_reload}"
         )
-        logger.info(f"PromptRenderer initialized: template_dir={self.template_dir}")
+
+    def _template_mtime(self, template_name: str) -> Optional[int]:
+        try:
+            return os.stat(self.template_dir / template_name).st_mtime_ns
+        except OSError:
+            return None
+
+    def _get_compiled(self, template_name: str) -> _CompiledTemplate:
+        """返回模板的编译结果；未编译或文件已修改时重新编译"""
+        cached = self._compiled.get(template_name)
+        if cached is not None and not self.auto_reload:
+            return cached
+        mtime_ns = self._template_mtime(template_name)
+        if cached is not None and cached.mtime_ns == mtime_ns:
+            return cached
+
+        with self._lock:
+            cached = self._compiled.get(template_name)
+            if cached is not None and cached.mtime_ns == mtime_ns:
+                return cached
+            # AST 静态分析：找出模板中引用的变量名
+            source = self.env.loader.get_source(self.env, template_name)[0]
+            variables = frozenset(meta.find_undeclared_variables(self.env.parse(source)))
+            compiled = _CompiledTemplate(
+                template=self.env.get_template(template_name),
+                variables=variables,
+                mtime_ns=mtime_ns,
+            )
+            self._compiled[template_name] = compiled
+        if cached is not None:
+            logger.info(f"[PromptRenderer] 模板已修改，重新编译: {template_name}")
+        return compiled
+
+    def precompile(self, template_names: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        预编译模板（默认为模板目录下全部 .j2 文件），之后的 render 不再读取 / 解析模板。
+
+        Args:
+            template_names: 要编译的模板名列表，None 表示全部
+
+        Returns:
+            List[str]: 已编译的模板名
+        """
+        if template_names is None:
+            template_names = [
+                name for name in self.env.list_templates()
+                if name.endswith(_TEMPLATE_SUFFIXES)
+            ]
+        compiled = []
+        for name in template_names:
+            self._get_compiled(name)
+            compiled.append(name)
+        logger.info(f"[PromptRenderer] 已预编译 {len(compiled)} 个模板")
+        return compiled
 
     def render(
         self,
@@ -95,17 +193,10 @@ class PromptRenderer:
         Returns:
             str: 渲染后的文本
         """
-        # 加载模板
-        template = self.env.get_template(template_name)
-
-        # AST 静态分析：找出模板中引用的变量名
-        source = self.env.loader.get_source(self.env, template_name)[0]
-        ast = self.env.parse(source)
-        template_vars = meta.find_undeclared_variables(ast)
+        compiled = self._get_compiled(template_name)
 
         # 检查多余变量（调用方提供了但模板中未引用）
-        provided_vars = set(kwargs.keys())
-        extra_vars = provided_vars - template_vars
+        extra_vars = kwargs.keys() - compiled.variables
         if extra_vars:
             logger.warning(
                 f"[PromptRenderer] 模板 '{template_name}' 未使用以下变量: "
@@ -113,7 +204,7 @@ class PromptRenderer:
             )
 
         # 渲染（缺失变量由 _SilentUndefined 在运行时处理并警告）
-        rendered = template.render(**kwargs)
+        rendered = compiled.template.render(**kwargs)
         return rendered.strip()
 
     def render_string(
@@ -144,6 +235,7 @@ class PromptRenderer:
 # ============================================================
 
 _default_renderer: Optional[PromptRenderer] = None
+_default_renderer_lock = threading.Lock()
 
 
 def get_renderer(
@@ -151,12 +243,18 @@ def get_renderer(
 ) -> PromptRenderer:
     """获取（或创建）默认渲染器单例"""
     global _default_renderer
-    if (
-        _default_renderer is None
-        or _default_renderer.template_dir != Path(template_dir)
-    ):
-        _default_renderer = PromptRenderer(template_dir)
-    return _default_renderer
+    with _default_renderer_lock:
+        if (
+            _default_renderer is None
+            or _default_renderer.template_dir != Path(template_dir)
+        ):
+            _default_renderer = PromptRenderer(template_dir)
+        return _default_renderer
+
+
+def precompile_prompts(template_dir: Union[str, Path] = _DEFAULT_TEMPLATE_DIR) -> List[str]:
+    """便捷函数：预编译默认渲染器的全部模板（建议在程序启动时调用）"""
+    return get_renderer(template_dir).precompile()
 
 
 def render_prompt(template_name: str, **kwargs: Any) -> str:
@@ -26,9 +26,13 @@ import numpy as np
 import pandas as pd
 {var_name}_data = pd.read_parquet({var_name})''',
 
-    'dataframe_pickle': '''# 读取Pandas DataFrame文件 (.pkl) - MultiIndex列
+    'dataframe_pickle': '''# 读取Pandas DataFrame文件 (.pkl)
 import pandas as pd
 {var_name}_data = pd.read_pickle({var_name})''',
+
+    'dataframe_arrow': '''# 读取Pandas DataFrame文件 (.arrow, Arrow IPC) - 支持MultiIndex列
+# read_arrow_dataframe 是内置函数，无需导入，会恢复原始列名（MultiIndex 列为元组）
+{var_name}_data = read_arrow_dataframe({var_name})''',
 }
 
 
@@ -0,0 +1,133 @@
+"""
+排名列工具
+为考核评估表的数值列添加「排名」列（从高到低，1 为最高），插入在原列右侧。
+main.py 与 human_validation/get_agent_result.py 共用此实现。
+
+实现要点:
+  - 同 dtype 的数值列合并为一个二维块，一次 DataFrame.rank 完成排名
+  - 排名结果整块转换为 Int64，避免逐列 astype
+  - 预先计算列位置索引，一次 iloc 完成原列与排名列的交错排列
+  - 输出与逐列实现完全一致（列顺序、列名、dtype、MultiIndex 命名）
+"""
+
+from typing import Hashable, List, Union
+
+import numpy as np
+import pandas as pd
+
+
+RANK_SUFFIX = "排名"
+
+
+def _rank_column_name(col: Hashable, is_multi: bool) -> Hashable:
+    """MultiIndex：上层保持不变，最后一级加后缀；普通列名：转字符串后加后缀"""
+    if is_multi:
+        return (*col[:-1], str(col[-1]) + RANK_SUFFIX)
+    return str(col) + RANK_SUFFIX
+
+
+def _add_ranking_columns_per_column(df: pd.DataFrame, ignore_set: set) -> pd.DataFrame:
+    """逐列实现，仅在列名重复等需要 dict 覆盖语义的边界情况下使用"""
+    is_multi = isinstance(df.columns, pd.MultiIndex)
+    new_data = {}
+    for col_idx, col in enumerate(df.columns):
+        series = df.iloc[:, col_idx]
+        new_data[col] = series
+        if col_idx in ignore_set:
+            continue
+        if pd.api.types.is_numeric_dtype(series):
+            rank_series = series.rank(ascending=False, method="min").astype("Int64")
+            new_data[_rank_column_name(col, is_multi)] = rank_series
+    return pd.DataFrame(new_data)
+
+
+def _rank_block(df: pd.DataFrame, positions: List[int]) -> pd.DataFrame:
+    """
+    对指定位置的数值列排名：numpy dtype 按 dtype 分组整体排名，扩展类型（Int64 等）逐列排名。
+    返回列顺序与 positions 一致、列名为 0..k-1 的 Int64 DataFrame。
+    """
+    by_dtype = {}
+    ext_positions = []
+    for pos in positions:
+        dtype = df.dtypes.iloc[pos]
+        if isinstance(dtype, np.dtype):
+            by_dtype.setdefault(dtype, []).append(pos)
+        else:
+            ext_positions.append(pos)
+
+    # 排名结果为 float64（缺失值为 NaN），按 positions 顺序写入同一个二维数组
+    column_of = {pos: j for j, pos in enumerate(positions)}
+    ranks = np.empty((len(df), len(positions)), dtype=np.float64)
+    for group in by_dtype.values():
+        block = df.iloc[:, group].rank(ascending=False, method="min")
+        ranks[:, [column_of[pos] for pos in group]] = block.to_numpy(dtype=np.float64)
+    for pos in ext_positions:
+        rank_series = df.iloc[:, pos].rank(ascending=False, method="min")
+        ranks[:, column_of[pos]] = rank_series.to_numpy(dtype=np.float64, na_value=np.nan)
+
+    # 整块转换为 Int64：排名均为整数，NaN 记入掩码（等价于逐列 astype("Int64")）
+    mask = np.isnan(ranks)
+    values = np.where(mask, 0, ranks).astype(np.int64)
+    return pd.DataFrame(
+        {
+            j: pd.arrays.IntegerArray(values[:, j].copy(), mask[:, j].copy())
+            for j in range(len(positions))
+        },
+        index=df.index,
+    )
+
+
+def add_ranking_columns(
+    df: pd.DataFrame,
+    ignore_columns: Union[int, List[int]],
+) -> pd.DataFrame:
+    """
+    为数值列添加排名列（从高到低，1 为最高），插入在原列右侧。
+    支持 MultiIndex 列名：上层保持不变，最后一级列名后加「排名」。
+
+    Args:
+        df: 原始 DataFrame
+        ignore_columns: 要忽略的列索引（int 或 List[int]），这些列不参与排名
+
+    Returns:
+        添加了排名列的新 DataFrame
+    """
+    if isinstance(ignore_columns, int):
+        ignore_set = {ignore_columns}
+    else:
+        ignore_set = set(ignore_columns)
+
+    n_cols = df.shape[1]
+    is_multi = isinstance(df.columns, pd.MultiIndex)
+    rank_positions = [
+        i for i, dtype in enumerate(df.dtypes)
+        if i not in ignore_set and pd.api.types.is_numeric_dtype(dtype)
+    ]
+
+    labels = list(df.columns)
+    rank_labels = [_rank_column_name(labels[i], is_multi) for i in rank_positions]
+    # 排名列在合并表中的位置为 n_cols..n_cols+k-1，插到各自原列之后
+    order = np.insert(
+        np.arange(n_cols),
+        np.asarray(rank_positions, dtype=np.intp) + 1,
+        np.arange(n_cols, n_cols + len(rank_positions)),
+    )
+    all_labels = labels + rank_labels
+    new_labels = [all_labels[i] for i in order]
+
+    # 列名重复时逐列实现的 dict 会相互覆盖，保持原语义
+    if n_cols == 0 or len(set(new_labels)) != len(new_labels):
+        return _add_ranking_columns_per_column(df, ignore_set)
+
+    base = df.set_axis(range(n_cols), axis=1)
+    if rank_positions:
+        ranks = _rank_block(df, rank_positions)
+        ranks = ranks.set_axis(range(n_cols, n_cols + len(rank_positions)), axis=1)
+        combined = pd.concat([base, ranks], axis=1)
+    else:
+        combined = base
+
+    result = combined.iloc[:, order]
+    # 与 pd.DataFrame(dict) 构造一致：由列名列表重新推断索引（MultiIndex 层名为 None）
+    result.columns = pd.Index(new_labels, tupleize_cols=True)
+    return result
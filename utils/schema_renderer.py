@@ -0,0 +1,242 @@
+"""
+按 token 预算渲染紧凑的表结构描述
+describe_dataframes_schema 的输出随列数线性增长，且原样进入规划 prompt（data_analysis_user.j2）
+与每条 CodeAgent 查询 prompt。本模块在给定 token 预算下生成更短的等价描述：
+
+  - 多层表头按层级缩进成树，相邻列共享的上层前缀只输出一次
+  - 列名与类型完全相同的 sheet 只展开一次，其余标注「列结构同【Sheet k】」
+  - 仍超出预算时按优先级逐步删减细节（每次选当前最长的 sheet）：
+    示例值 N 个 → 1 个 → 只保留唯一值 → 只保留列名与类型
+  - 列序号 [i] 与 Sheet 名称保持不变，生成的代码仍可按 iloc / dfs["..."] 引用
+
+用法:
+    from utils.schema_renderer import render_compact_schema
+
+    schema = render_compact_schema(dfs, token_budget=6000, max_sample_rows=3, max_unique_values=8)
+    schema.text            # 紧凑描述
+    schema.saved_tokens    # 相比 describe_dataframes_schema 节省的 token 数（首次访问时才渲染原格式）
+"""
+
+import dataclasses
+import functools
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from llm.rate_limit import estimate_text_tokens
+from utils import logger
+from utils.data_inspector import (
+    ColumnProfile,
+    _format_column_extras,
+    describe_dataframes_schema,
+    get_column_profiles,
+)
+from utils.lazy_workbook import LazySheet
+
+
+# 默认 token 预算（<=0 表示不启用紧凑渲染），可通过环境变量覆盖
+_DEFAULT_TOKEN_BUDGET = int(os.getenv("SCHEMA_TOKEN_BUDGET", "0"))
+
+# 细节级别：0 全部示例值 + 唯一值；1 示例值 1 个 + 唯一值；2 仅唯一值；3 仅列名与类型
+_DETAIL_LEVELS = 4
+
+
+def default_token_budget() -> int:
+    """默认的 schema token 预算（环境变量 SCHEMA_TOKEN_BUDGET，0 表示不启用）"""
+    return _DEFAULT_TOKEN_BUDGET
+
+
+@dataclass
+class CompactSchema:
+    """紧凑渲染结果"""
+    text: str
+    tokens: int
+    token_budget: int
+    within_budget: bool
+    detail_levels: Dict[str, int]  # {sheet_name: 最终细节级别}，结构重复的 sheet 不含在内
+    render_baseline: Optional[Callable[[], str]] = field(default=None, repr=False, compare=False)
+
+    @functools.cached_property
+    def baseline_tokens(self) -> int:
+        """describe_dataframes_schema 原格式的 token 数（首次访问时才渲染原格式）"""
+        return estimate_text_tokens(self.render_baseline()) if self.render_baseline else 0
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(0, self.baseline_tokens - self.tokens)
+
+
+def _escape(label) -> str:
+    return str(label).replace('\n', '\\n')
+
+
+def _reduce_profile(profile: ColumnProfile, level: int) -> ColumnProfile:
+    """按细节级别删减单列画像"""
+    if level == 0:
+        return profile
+    samples = profile.samples[:1] if level == 1 and profile.samples is not None else None
+    uniques = profile.uniques if level <= 2 else None
+    return dataclasses.replace(profile, samples=samples, uniques=uniques)
+
+
+def _render_columns(df: pd.DataFrame, profiles: List[ColumnProfile], level: int) -> List[str]:
+    """渲染单个 sheet 的列描述；多层表头相邻列的公共前缀只输出一次"""
+    lines: List[str] = []
+    if not isinstance(df.columns, pd.MultiIndex):
+        lines.append("  表头: 单层")
+        for col_idx, col_name in enumerate(df.columns):
+            profile = _reduce_profile(profiles[col_idx], level)
+            lines.append(
+                f"    [{col_idx}] \"{_escape(col_name)}\"  ({profile.dtype})"
+                + _format_column_extras(profile)
+            )
+        return lines
+
+    n_levels = df.columns.nlevels
+    columns = list(df.columns)
+    lines.append(f"  表头: MultiIndex({n_levels}层)，相邻列共享的上层表头缩进列出")
+    grouped = _grouped_depths(columns, n_levels)
+    for col_idx, col in enumerate(columns):
+        depth = grouped[col_idx]
+        prev = columns[col_idx - 1] if col_idx > 0 else None
+        for d in range(depth):
+            if prev is None or prev[:d + 1] != col[:d + 1]:
+                lines.append("    " + "  " * d + _escape(col[d]))
+        profile = _reduce_profile(profiles[col_idx], level)
+        col_path = " > ".join(_escape(c) for c in col[depth:])
+        lines.append(
+            "    " + "  " * depth + f"[{col_idx}] {col_path}  ({profile.dtype})"
+            + _format_column_extras(profile)
+        )
+    return lines
+
+
+def _grouped_depths(columns: List[Tuple], n_levels: int) -> List[int]:
+    """
+    每列可折叠的上层表头层数：前 d 层前缀与相邻列相同（连续至少 2 列共享）时折叠为公共标题行，
+    只被单列使用的前缀直接与列名拼接，避免树形输出比原格式更长。
+    """
+    depths = [0] * len(columns)
+    for d in range(n_levels - 1):
+        prefixes = [col[:d + 1] for col in columns]
+        for i, prefix in enumerate(prefixes):
+            if depths[i] < d:
+                continue
+            shared = (
+                (i > 0 and prefixes[i - 1] == prefix)
+                or (i + 1 < len(prefixes) and prefixes[i + 1] == prefix)
+            )
+            if shared:
+                depths[i] = d + 1
+    return depths
+
+
+def render_compact_schema(
+    dfs: Dict[str, Union[pd.DataFrame, LazySheet]],
+    token_budget: Optional[int] = None,
+    max_sample_rows: int = 3,
+    max_unique_values: int = 8,
+) -> CompactSchema:
+    """
+    在 token 预算内渲染表结构描述。
+
+    Args:
+        dfs: {sheet_name: DataFrame | LazySheet}（同 describe_dataframes_schema）
+        token_budget: token 预算；None 时使用 SCHEMA_TOKEN_BUDGET，<=0 表示不限制（仍做树形折叠与去重）
+        max_sample_rows: 细节最完整时每列展示的示例值个数
+        max_unique_values: 展示 unique 值的最大数量
+
+    Returns:
+        CompactSchema: 紧凑描述文本及 token 统计
+    """
+    if token_budget is None:
+        token_budget = _DEFAULT_TOKEN_BUDGET
+
+    header = [
+        "=" * 50,
+        "Excel 文件数据结构概览（紧凑格式：多层表头按层级缩进，列结构相同的 Sheet 只展开一次）",
+        f"共包含 {len(dfs)} 个 Sheet\n",
+    ]
+    footer = ["数据引用指南:"]
+    footer += [f'  dfs["{name}"]  → shape={df.shape}' for name, df in dfs.items()]
+    footer.append("")
+
+    # 每个 sheet：标题行 + （首次出现的列结构）各细节级别的列描述
+    titles: List[str] = []
+    owners: List[Optional[int]] = []  # 列结构首次出现的 sheet 序号；None 表示自身展开
+    frames: Dict[int, pd.DataFrame] = {}
+    seen: Dict[Tuple, int] = {}
+    for sheet_idx, (name, df) in enumerate(dfs.items(), 1):
+        n_rows, note = df.shape[0], ""
+        if isinstance(df, LazySheet):
+            note = df.schema_note()
+            df = df.schema_frame()
+        title = f"【Sheet {sheet_idx}】 \"{name}\"  行数: {n_rows}  列数: {len(df.columns)}{note}"
+        signature = (tuple(df.columns), tuple(str(t) for t in df.dtypes))
+        if signature in seen:
+            owners.append(seen[signature])
+            titles.append(f"{title}  列结构同【Sheet {seen[signature]}】")
+        else:
+            seen[signature] = sheet_idx
+            owners.append(None)
+            titles.append(title)
+            frames[sheet_idx] = df
+
+    profiles = {
+        idx: get_column_profiles(df, max_sample_rows, max_unique_values)
+        for idx, df in frames.items()
+    }
+    rendered: Dict[Tuple[int, int], str] = {}
+
+    def body(idx: int, level: int) -> str:
+        key = (idx, level)
+        if key not in rendered:
+            rendered[key] = "\n".join(_render_columns(frames[idx], profiles[idx], level))
+        return rendered[key]
+
+    levels = {idx: 0 for idx in frames}
+
+    def assemble() -> str:
+        parts = list(header)
+        for sheet_idx, title in enumerate(titles, 1):
+            parts.append(title)
+            if owners[sheet_idx - 1] is None:
+                parts.append(body(sheet_idx, levels[sheet_idx]))
+            parts.append("")
+        return "\n".join(parts + footer)
+
+    text = assemble()
+    tokens = estimate_text_tokens(text)
+    while token_budget > 0 and tokens > token_budget:
+        candidates = [idx for idx, lvl in levels.items() if lvl < _DETAIL_LEVELS - 1]
+        if not candidates:
+            break
+        # 优先删减当前最长的 sheet（同长度时先删减靠后的 sheet）
+        target = max(candidates, key=lambda i: (len(body(i, levels[i])), i))
+        levels[target] += 1
+        text = assemble()
+        tokens = estimate_text_tokens(text)
+
+    names = list(dfs)
+    result = CompactSchema(
+        text=text,
+        tokens=tokens,
+        token_budget=token_budget,
+        within_budget=token_budget <= 0 or tokens <= token_budget,
+        detail_levels={names[idx - 1]: lvl for idx, lvl in levels.items()},
+        render_baseline=functools.partial(
+            describe_dataframes_schema,
+            dfs, max_sample_rows=max_sample_rows, max_unique_values=max_unique_values,
+        ),
+    )
+    logger.info(
+        f"[Schema] 紧凑渲染: {result.tokens} tokens "
+        f"(预算 {token_budget or '不限'}, {len(dfs) - len(frames)} 个 Sheet 结构去重)"
+    )
+    if not result.within_budget:
+        logger.warning(
+            f"[Schema] 删减全部示例值后仍超出预算: {result.tokens} > {token_budget} tokens"
+        )
+    return result
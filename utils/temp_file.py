@@ -1,7 +1,21 @@
-from typing import Any, Tuple
+import atexit
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
 import pandas as pd
 import numpy as np
 
+from utils import logger
+
+
 def get_var_storage_info(value: Any) -> Tuple[str, str]:
 
     """
@@ -11,13 +25,20 @@ def get_var_storage_info(value: Any) -> Tuple[str, str]:
     - str/数值/bool → .txt
     - list/dict → .json
     - np.ndarray → .npy
-    - pd.DataFrame (MultiIndex columns) → .pkl (pickle)
+    - pd.DataFrame (MultiIndex columns，可无损转为 Arrow) → .arrow (Arrow IPC，子进程内存映射读取)
+    - pd.DataFrame (MultiIndex columns，其余情况) → .pkl (pickle)
     - pd.DataFrame (普通列) → .parquet
+    - pd.DataFrame (普通列，含混合类型对象列) → .pkl (pickle)
     """
     # 检查 pandas DataFrame
     if isinstance(value, pd.DataFrame):
-        # MultiIndex 列无法被 parquet 正确序列化，改用 pickle
+        # MultiIndex 列无法被 parquet 正确序列化：能无损往返时用 Arrow IPC，否则用 pickle
         if isinstance(value.columns, pd.MultiIndex):
+            if is_arrow_lossless(value):
+                return '.arrow', 'dataframe_arrow'
+            return '.pkl', 'dataframe_pickle'
+        # 含混合类型对象列时 parquet 无法序列化，改用 pickle
+        if not _is_arrow_compatible(value):
             return '.pkl', 'dataframe_pickle'
         return '.parquet', 'dataframe'
     
@@ -37,43 +58,407 @@ def get_var_storage_info(value: Any) -> Tuple[str, str]:
     return '.json', 'json'
 
 
+# Arrow 可无损转换的对象列推断类型
+_ARROW_SAFE_INFERRED_TYPES = {
+    "string", "empty", "integer", "floating", "mixed-integer-float",
+    "boolean", "decimal", "bytes", "datetime", "datetime64", "date",
+    "timedelta", "timedelta64",
+}
+
+# Arrow 文件中保存原始列索引 / 原为 object 的列位置的 schema metadata key
+ARROW_COLUMNS_METADATA_KEY = b"agent_columns"
+ARROW_OBJECT_COLUMNS_METADATA_KEY = b"agent_object_columns"
+
+
+def _is_arrow_compatible(df: pd.DataFrame) -> bool:
+    """判断 DataFrame 的所有列是否都能写入 Arrow / parquet（不保证读回的 dtype 不变）"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    for col_idx, dtype in enumerate(df.dtypes):
+        if dtype == object:
+            inferred = pd.api.types.infer_dtype(df.iloc[:, col_idx], skipna=True)
+            if inferred not in _ARROW_SAFE_INFERRED_TYPES:
+                return False
+    return True
+
+
+def is_arrow_lossless(df: pd.DataFrame) -> bool:
+    """
+    判断 DataFrame 经 _to_arrow_table / _from_arrow_table 往返后是否与原值完全一致（equals 且 dtype 不变）。
+
+    只接受 RangeIndex 行索引，以及以下列：
+      - numpy 数值 / bool / datetime64 / timedelta64 列、带时区的 datetime 列、pandas 字符串列
+      - 只含 str 与 None 的 object 列（读取时按原样转回 object）
+    其余 object 列（数值、日期、混合类型、NaN / pd.NA 缺失值等）读回后 dtype 或取值会改变，
+    以及 category 等扩展类型，均判为不可无损往返。
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    if not isinstance(df.index, pd.RangeIndex):
+        return False
+    for col_idx, dtype in enumerate(df.dtypes):
+        if dtype == object:
+            if not _is_lossless_object_column(df.iloc[:, col_idx]):
+                return False
+        elif not (
+            (isinstance(dtype, np.dtype) and dtype.kind in "biufmM")
+            or isinstance(dtype, (pd.DatetimeTZDtype, pd.StringDtype))
+        ):
+            return False
+    return True
+
+
+def _is_lossless_object_column(col: pd.Series) -> bool:
+    """object 列是否只含 str 与 None（Arrow 会把 NaN / pd.NA 统一读回为 None）"""
+    if pd.api.types.infer_dtype(col, skipna=True) not in ("string", "empty"):
+        return False
+    return all(value is None for value in col[col.isna()])
+
+
+def _to_arrow_table(df: pd.DataFrame):
+    """
+    DataFrame → pyarrow.Table。
+    列名统一替换为位置名 c0..cN（兼容 MultiIndex / 重复列名 / 非字符串列名），
+    原始列索引 pickle 后存入 schema metadata，原为 object 的列位置一并记录，读取时原样恢复。
+    """
+    import pyarrow as pa
+
+    flat = df.copy(deep=False)
+    flat.columns = [f"c{i}" for i in range(df.shape[1])]
+    table = pa.Table.from_pandas(flat)
+    metadata = dict(table.schema.metadata or {})
+    metadata[ARROW_COLUMNS_METADATA_KEY] = pickle.dumps(df.columns)
+    metadata[ARROW_OBJECT_COLUMNS_METADATA_KEY] = json.dumps(
+        [i for i, dtype in enumerate(df.dtypes) if dtype == object]
+    ).encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def _from_arrow_table(table) -> pd.DataFrame:
+    """_to_arrow_table 的逆操作（与 ARROW_READER_SHIM 保持一致）"""
+    metadata = table.schema.metadata
+    df = table.to_pandas()
+    for i in json.loads(metadata.get(ARROW_OBJECT_COLUMNS_METADATA_KEY, b"[]")):
+        values = table.column(i).to_numpy(zero_copy_only=False)
+        df[f"c{i}"] = pd.Series(values, index=df.index, dtype=object)
+    df.columns = pickle.loads(metadata[ARROW_COLUMNS_METADATA_KEY])
+    return df
+
+
+# 注入到 CodeAgent 脚本顶部的 Arrow 读取函数：子进程不依赖本项目代码即可恢复列索引与 object 列
+ARROW_READER_SHIM = '''def read_arrow_dataframe(path):
+    """内置函数：读取 .arrow 变量文件，恢复原始列名（MultiIndex 列为元组）与列类型。"""
+    import json
+    import pickle
+    import pandas as pd
+    import pyarrow as pa
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    metadata = table.schema.metadata
+    df = table.to_pandas()
+    for i in json.loads(metadata.get(b"agent_object_columns", b"[]")):
+        values = table.column(i).to_numpy(zero_copy_only=False)
+        df[f"c{i}"] = pd.Series(values, index=df.index, dtype=object)
+    df.columns = pickle.loads(metadata[b"agent_columns"])
+    return df
+'''
+
+
+def write_arrow(path: str, df: pd.DataFrame) -> None:
+    """将 DataFrame 写为 Arrow IPC (Feather v2) 文件"""
+    import pyarrow as pa
+
+    table = _to_arrow_table(df)
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def read_arrow_dataframe(path: str) -> pd.DataFrame:
+    """
+    读取 write_arrow 写入的文件，恢复原始列索引。
+    文件以内存映射方式打开（不经过解压 / 反序列化），to_pandas 时复制为可写的 DataFrame。
+    """
+    import pyarrow as pa
+
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    return _from_arrow_table(table)
+
+
 def save_variable_to_temp(key: str, value: Any, suffix: str, type_name: str) -> str:
     """
     根据类型将变量保存到临时文件，返回文件路径
     """
-    import tempfile
-    import os
-    import json
     temp_fd, temp_path = tempfile.mkstemp(suffix=suffix, prefix=f'{key}_', text=(type_name == 'txt'))
-    
+    os.close(temp_fd)
+    _write_variable(temp_path, value, type_name)
+    return temp_path
+
+
+def _write_variable(path: str, value: Any, type_name: str) -> None:
+    """按 type_name 将变量序列化到指定路径"""
     if type_name == 'txt':
         # 文本类型：str, 数值, bool
-        with os.fdopen(temp_fd, "w", encoding="utf-8") as f:
+        with open(path, "w", encoding="utf-8") as f:
             f.write(str(value))
     
     elif type_name == 'json':
         # JSON 类型：list, dict
-        with os.fdopen(temp_fd, "w", encoding="utf-8") as f:
+        with open(path, "w", encoding="utf-8") as f:
             json.dump(value, f, ensure_ascii=False, indent=2)
     
     elif type_name == 'ndarray':
-        # Numpy array
-        os.close(temp_fd)  # numpy.save 需要自己管理文件
-        np.save(temp_path, value)
+        # Numpy array（np.save 对无 .npy 后缀的路径会自动追加后缀，这里用文件对象避免）
+        with open(path, "wb") as f:
+            np.save(f, value)
     
     elif type_name == 'dataframe':
         # Pandas DataFrame (普通列)
-        os.close(temp_fd)  # pandas 需要自己管理文件
-        value.to_parquet(temp_path, index=False)
+        value.to_parquet(path, index=False)
     
     elif type_name == 'dataframe_pickle':
-        # Pandas DataFrame (MultiIndex 列) - parquet 无法保留 MultiIndex
-        os.close(temp_fd)
-        value.to_pickle(temp_path)
+        # Pandas DataFrame (含混合类型对象列) - Arrow / parquet 无法序列化
+        value.to_pickle(path)
+    
+    elif type_name == 'dataframe_arrow':
+        # Pandas DataFrame (MultiIndex columns，可无损往返) - Arrow IPC，子进程可内存映射读取
+        write_arrow(path, value)
     
     else:
         # 默认尝试 JSON
-        with os.fdopen(temp_fd, "w", encoding="utf-8") as f:
+        with open(path, "w", encoding="utf-8") as f:
             json.dump(value, f, ensure_ascii=False, indent=2)
-    
-    return temp_path   
\ No newline at end of file
+
+
+# ============================================================
+# 内容寻址的 DataFrame 临时文件缓存
+# ============================================================
+
+def dataframe_fingerprint(df: pd.DataFrame) -> str:
+    """
+    计算 DataFrame 的内容指纹：shape + dtypes + 列名 + 索引 + 逐列内容哈希。
+    内容相同的 DataFrame 得到相同指纹。
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(df.shape).encode())
+    h.update(repr([str(t) for t in df.dtypes]).encode())
+    h.update(repr(list(df.columns)).encode())
+    h.update(_hash_values(df.index))
+    for col_idx in range(df.shape[1]):
+        h.update(_hash_values(df.iloc[:, col_idx]))
+    return h.hexdigest()
+
+
+def _hash_values(obj) -> bytes:
+    """
+    对单列 / 索引计算内容哈希；含不可哈希对象时回退到 repr。
+    hash_pandas_object 会先把 object 值转成字符串（2023 与 "2023" 哈希相同），
+    因此 object 列 / 索引另外哈希每个值的类型。
+    """
+    try:
+        digest = pd.util.hash_pandas_object(obj, index=False).to_numpy().tobytes()
+    except TypeError:
+        return repr(obj.tolist()).encode()
+    if obj.dtype == object:
+        types = pd.Series([_value_type(v) for v in obj], dtype=object)
+        digest += pd.util.hash_pandas_object(types, index=False).to_numpy().tobytes()
+    return digest
+
+
+def _value_type(value) -> str:
+    """值的类型名（MultiIndex 的元组逐层取类型）"""
+    if isinstance(value, tuple):
+        return repr(tuple(type(v).__name__ for v in value))
+    return type(value).__name__
+
+
+@dataclass
+class _Artifact:
+    """缓存中的单个文件"""
+    path: str
+    type_name: str
+    size: int = 0
+    refcount: int = 0
+    ready: threading.Event = field(default_factory=threading.Event)
+    error: Optional[BaseException] = None
+
+
+class TempArtifactStore:
+    """
+    内容寻址的临时文件缓存。
+
+    相同内容的 DataFrame 在进程内只序列化一次，多个调用方通过引用计数共享同一文件；
+    无人引用的文件按 LRU 顺序淘汰，直到总大小 / 数量回到上限以内。
+
+    Args:
+        max_bytes: 缓存文件总大小上限（字节），<=0 表示不限制
+        max_entries: 缓存文件数量上限，<=0 表示不限制
+        root_dir: 缓存目录，默认在系统临时目录下新建
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 2 * 1024 ** 3,
+        max_entries: int = 256,
+        root_dir: Optional[str] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.root_dir = root_dir or tempfile.mkdtemp(prefix="agent_vars_")
+        os.makedirs(self.root_dir, exist_ok=True)
+        self._entries: "OrderedDict[str, _Artifact]" = OrderedDict()
+        self._path_index: Dict[str, str] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, value: pd.DataFrame) -> Tuple[str, str]:
+        """
+        获取 DataFrame 对应的缓存文件（不存在则写入），引用计数 +1。
+
+        Returns:
+            (file_path, type_name)
+        """
+        suffix, type_name = get_var_storage_info(value)
+        key = f"{dataframe_fingerprint(value)}{suffix}"
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.refcount += 1
+                self._entries.move_to_end(key)
+                self.hits += 1
+                is_owner = False
+            else:
+                entry = _Artifact(
+                    path=os.path.join(self.root_dir, key),
+                    type_name=type_name,
+                    refcount=1,
+                )
+                self._entries[key] = entry
+                self._path_index[entry.path] = key
+                self.misses += 1
+                is_owner = True
+
+        if is_owner:
+            try:
+                _write_variable(entry.path, value, type_name)
+                entry.size = os.path.getsize(entry.path)
+            except BaseException as e:
+                entry.error = e
+                with self._lock:
+                    self._entries.pop(key, None)
+                    self._path_index.pop(entry.path, None)
+                entry.ready.set()
+                raise
+            with self._lock:
+                self._total_bytes += entry.size
+            entry.ready.set()
+            self._evict()
+        else:
+            entry.ready.wait()
+            if entry.error is not None:
+                with self._lock:
+                    entry.refcount -= 1
+                raise entry.error
+
+        return entry.path, entry.type_name
+
+    def release(self, path: str) -> bool:
+        """
+        释放对缓存文件的引用（引用计数 -1）。
+
+        Returns:
+            bool: path 是否属于本缓存
+        """
+        with self._lock:
+            key = self._path_index.get(path)
+            if key is None:
+                return False
+            entry = self._entries[key]
+            entry.refcount = max(0, entry.refcount - 1)
+        self._evict()
+        return True
+
+    def _evict(self) -> None:
+        """按 LRU 顺序淘汰无人引用的文件，直到满足大小 / 数量上限。"""
+        to_remove = []
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                over_bytes = self.max_bytes > 0 and self._total_bytes > self.max_bytes
+                over_count = self.max_entries > 0 and len(self._entries) > self.max_entries
+                if not (over_bytes or over_count):
+                    break
+                if entry.refcount > 0 or not entry.ready.is_set():
+                    continue
+                del self._entries[key]
+                self._path_index.pop(entry.path, None)
+                self._total_bytes -= entry.size
+                to_remove.append(entry.path)
+        for path in to_remove:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.error(f"[TempArtifactStore] 无法删除缓存文件 {path}: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """返回缓存统计信息"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "total_bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def clear(self) -> None:
+        """删除全部缓存文件及目录"""
+        with self._lock:
+            self._entries.clear()
+            self._path_index.clear()
+            self._total_bytes = 0
+        shutil.rmtree(self.root_dir, ignore_errors=True)
+
+
+_default_store: Optional[TempArtifactStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> TempArtifactStore:
+    """获取（或创建）进程级共享的默认缓存，进程退出时自动清理"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = TempArtifactStore(
+                max_bytes=int(float(os.getenv("AGENT_VAR_CACHE_MAX_MB", "2048")) * 1024 ** 2),
+                max_entries=int(os.getenv("AGENT_VAR_CACHE_MAX_ENTRIES", "256")),
+            )
+            atexit.register(_default_store.clear)
+        return _default_store
+
+
+def acquire_variable_file(key: str, value: Any) -> Tuple[str, str]:
+    """
+    为 CodeAgent 准备变量文件：DataFrame 走内容寻址缓存（复用已写入的文件），
+    其他类型仍写入独立临时文件。使用完毕后需调用 release_variable_file。
+
+    Returns:
+        (file_path, type_name)
+    """
+    if isinstance(value, pd.DataFrame):
+        return get_artifact_store().acquire(value)
+    suffix, type_name = get_var_storage_info(value)
+    return save_variable_to_temp(key, value, suffix, type_name), type_name
+
+
+def release_variable_file(path: str) -> None:
+    """释放 acquire_variable_file 返回的文件：缓存文件引用计数 -1，其余直接删除"""
+    if _default_store is not None and _default_store.release(path):
+        return
+    os.remove(path)
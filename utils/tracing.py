@@ -0,0 +1,305 @@
+"""
+轻量级分阶段追踪（Span / Trace）
+参考 OpenTelemetry 的 span 模型，但不依赖任何外部服务：在进程内记录嵌套的阶段耗时，
+trace 结束时导出为 JSONL（每行一个 span）与 Chrome trace-event JSON
+（chrome://tracing / https://ui.perfetto.dev 打开即为火焰图）。
+
+特性:
+  - 当前 span 通过 contextvars 传递；线程池中执行的任务需用 contextvars.copy_context().run 提交
+  - 不在任何 trace 内时 span() 为空操作，库代码可以无条件埋点
+  - LLM 调用的 usage（prompt / completion / total tokens）记到当前 span，并累加到全部祖先 span
+  - 嵌套调用 trace() 时只创建普通 span，由最外层 trace 统一导出
+
+用法:
+    from utils import tracing
+
+    with tracing.trace("report", region="渝北区"):        # 最外层：新建 trace，结束时导出
+        with tracing.span("excel.load", file="..."):
+            ...
+        with tracing.span("planning") as sp:
+            response = llm.generate(messages)             # BaseLLM 自动创建 "llm" 子 span 并记录 usage
+            sp.set(queries=5)
+"""
+
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from utils import logger
+
+
+# 默认配置（可通过环境变量覆盖）
+_EXPORT_ENABLED = os.getenv("TRACE_EXPORT", "1") != "0"
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+# 相对路径按项目根目录解析（与 logs/ 一致），不随工作目录变化
+_DEFAULT_TRACE_DIR = _PROJECT_ROOT / os.getenv("TRACE_DIR", "logs/traces")
+
+_USAGE_KEYS = ("prompt_tokens", "completion_tokens", "total_tokens")
+
+_span_ids = itertools.count(1)
+
+
+@dataclass(eq=False)
+class Span:
+    """单个阶段的耗时记录"""
+    name: str
+    trace: "Trace"
+    parent: Optional["Span"] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    span_id: int = field(default_factory=lambda: next(_span_ids))
+    start: float = field(default_factory=time.time)
+    duration: Optional[float] = None
+    thread_id: int = field(default_factory=threading.get_ident)
+    thread_name: str = field(default_factory=lambda: threading.current_thread().name)
+    usage: Dict[str, int] = field(default_factory=dict)
+    error: Optional[str] = None
+    _t0: float = field(default_factory=time.perf_counter, repr=False)
+
+    def set(self, **attributes: Any) -> "Span":
+        """补充 span 属性"""
+        self.attributes.update(attributes)
+        return self
+
+    def add_usage(self, usage: Optional[Dict[str, Any]]) -> None:
+        """记录 token 用量，并累加到全部祖先 span"""
+        if not usage:
+            return
+        with self.trace._lock:
+            span: Optional[Span] = self
+            while span is not None:
+                for key in _USAGE_KEYS:
+                    value = usage.get(key)
+                    if value:
+                        span.usage[key] = span.usage.get(key, 0) + int(value)
+                span = span.parent
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent is not None else None,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "thread": self.thread_name,
+            "attributes": self.attributes,
+            "usage": self.usage,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """一次完整运行（如一个地区的报告生成）中全部已结束 span 的集合（线程安全）"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def export_jsonl(self, path: Union[str, Path]) -> Path:
+        """每行一个 span（按开始时间排序）"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        with open(path, "w", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+        return path
+
+    def export_chrome(self, path: Union[str, Path]) -> Path:
+        """Chrome trace-event JSON（完整事件 ph=X，时间单位微秒）"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+        events: List[Dict[str, Any]] = []
+        threads = {}
+        for span in spans:
+            threads[span.thread_id] = span.thread_name
+            args = dict(span.attributes)
+            args.update(span.usage)
+            if span.error:
+                args["error"] = span.error
+            events.append({
+                "name": span.name,
+                "cat": span.name.split(".", 1)[0],
+                "ph": "X",
+                "ts": span.start * 1e6,
+                "dur": (span.duration or 0.0) * 1e6,
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": args,
+            })
+        for tid, thread_name in threads.items():
+            events.append({
+                "name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                "args": {"name": thread_name},
+            })
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"traceEvents": events, "displayTimeUnit": "ms"},
+                f, ensure_ascii=False, default=str,
+            )
+        return path
+
+    def export(self, trace_dir: Union[str, Path] = _DEFAULT_TRACE_DIR) -> Dict[str, Path]:
+        """导出 JSONL 与 Chrome trace 到 trace_dir，文件名为 <时间>_<名称>_<trace_id>"""
+        stem = f"{datetime.now():%Y%m%d-%H%M%S}_{_safe_name(self.name)}_{self.trace_id}"
+        trace_dir = Path(trace_dir)
+        return {
+            "jsonl": self.export_jsonl(trace_dir / f"{stem}.jsonl"),
+            "chrome": self.export_chrome(trace_dir / f"{stem}.trace.json"),
+        }
+
+    def summary(self, depth: int = 2) -> str:
+        """按层级汇总各 span 的耗时与 token（只展示前 depth 层）"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        children: Dict[Optional[int], List[Span]] = {}
+        for span in spans:
+            children.setdefault(span.parent.span_id if span.parent else None, []).append(span)
+
+        lines: List[str] = []
+
+        def walk(parent_id: Optional[int], level: int) -> None:
+            if level >= depth:
+                return
+            for span in children.get(parent_id, []):
+                tokens = span.usage.get("total_tokens", 0)
+                lines.append(
+                    f"{'  ' * level}{span.name:<{32 - 2 * level}}{span.duration or 0:>9.2f}s"
+                    + (f"  tokens={tokens}" if tokens else "")
+                    + ("  [失败]" if span.error else "")
+                )
+                walk(span.span_id, level + 1)
+
+        walk(None, 0)
+        return "\n".join(lines)
+
+
+def _safe_name(name: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in name)[:60] or "trace"
+
+
+# ============================================================
+# 上下文与公开接口
+# ============================================================
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class _NoopSpan:
+    """不在 trace 内时返回的空 span"""
+
+    def set(self, **attributes: Any) -> "_NoopSpan":
+        return self
+
+    def add_usage(self, usage: Optional[Dict[str, Any]]) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def current_span() -> Optional[Span]:
+    """当前上下文中的 span（不在 trace 内时为 None）"""
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Union[Span, _NoopSpan]]:
+    """
+    在当前 trace 中记录一个嵌套 span；不在任何 trace 内时为空操作。
+
+    Args:
+        name: span 名称（建议 "阶段.子阶段" 形式，如 "code_agent.execute"）
+        **attributes: 附加属性（地区、模型、sheet 等）
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield _NOOP_SPAN
+        return
+    with _run_span(Span(name=name, trace=parent.trace, parent=parent, attributes=attributes)) as sp:
+        yield sp
+
+
+@contextmanager
+def trace(
+    name: str,
+    export: bool = _EXPORT_ENABLED,
+    trace_dir: Union[str, Path] = _DEFAULT_TRACE_DIR,
+    **attributes: Any,
+) -> Iterator[Union[Span, _NoopSpan]]:
+    """
+    开始一个 trace：已在 trace 内时等同于 span()，否则新建 Trace，
+    结束时记录耗时汇总并（export=True 时）导出 JSONL 与 Chrome trace。
+
+    Args:
+        name: trace（根 span）名称
+        export: 结束时是否导出文件，默认读取 TRACE_EXPORT
+        trace_dir: 导出目录，默认读取 TRACE_DIR
+        **attributes: 根 span 属性
+    """
+    if _current_span.get() is not None:
+        with span(name, **attributes) as sp:
+            yield sp
+        return
+
+    root = Span(name=name, trace=Trace(name), attributes=attributes)
+    try:
+        with _run_span(root) as sp:
+            yield sp
+    finally:
+        logger.info(f"[Trace] {name} 耗时汇总:\n{root.trace.summary()}")
+        if export:
+            try:
+                paths = root.trace.export(trace_dir)
+                logger.info(f"[Trace] 已导出: {paths['jsonl']} / {paths['chrome']}")
+            except OSError as e:
+                logger.warning(f"[Trace] 导出失败: {e}")
+
+
+@contextmanager
+def _run_span(sp: Span) -> Iterator[Span]:
+    token = _current_span.set(sp)
+    try:
+        yield sp
+    except BaseException as e:
+        sp.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        sp.duration = time.perf_counter() - sp._t0
+        _current_span.reset(token)
+        sp.trace._finish(sp)
+
+
+def set_attributes(**attributes: Any) -> None:
+    """为当前 span 补充属性（不在 trace 内时忽略）"""
+    sp = _current_span.get()
+    if sp is not None:
+        sp.set(**attributes)
+
+
+def record_usage(usage: Optional[Dict[str, Any]]) -> None:
+    """将 LLMResponse.usage 记到当前 span（不在 trace 内时忽略）"""
+    sp = _current_span.get()
+    if sp is not None:
+        sp.add_usage(usage)
@@ -0,0 +1,439 @@
+"""
+常驻预热 Python 工作进程池
+为 CodeAgent 执行 LLM 生成的代码提供「已导入 pandas / numpy / pyarrow 的常驻子进程」，
+避免每一步都重新启动解释器、重新 import 大型库。
+
+特性:
+  - 进程隔离：代码在独立子进程中执行，崩溃 / 死循环不会影响主进程
+  - 通过 Pipe 传递代码与 stdout / stderr；文件描述符 1 / 2 在执行期间重定向到临时文件，
+    C 扩展、os.write、子进程直接写 fd 的输出同样会被捕获
+  - 单任务超时：超时后强制终止该进程并补充新进程
+  - 进程回收：执行 N 个任务后、或常驻内存超过上限后自动替换为新进程。
+    默认每个进程只执行 1 个任务（与独立子进程同等隔离），替换进程在后台预热，下一个任务仍无需等待 import；
+    CODE_AGENT_POOL_MAX_JOBS > 1 时进程会被复用，任务之间重置 os.environ、sys.path、sys.argv、
+    warnings 过滤器、pandas / numpy 全局选项，但任务新 import 的模块与对模块全局变量的修改会保留
+
+用法:
+    from utils.worker_pool import get_worker_pool
+
+    pool = get_worker_pool()
+    success, stdout, stderr = pool.run("print(1 + 1)", timeout=60)
+"""
+
+import atexit
+import builtins
+import io
+import linecache
+import multiprocessing
+import os
+import queue
+import sys
+import tempfile
+import threading
+import traceback
+import warnings
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from typing import IO, Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from utils import logger
+
+
+# 默认配置（可通过环境变量覆盖）
+_DEFAULT_POOL_SIZE = int(os.getenv("CODE_AGENT_POOL_SIZE", "4"))
+_DEFAULT_MAX_JOBS_PER_WORKER = int(os.getenv("CODE_AGENT_POOL_MAX_JOBS", "1"))
+_DEFAULT_MAX_MEMORY_MB = float(os.getenv("CODE_AGENT_POOL_MAX_MEMORY_MB", "2048"))
+_DEFAULT_PRELOAD_MODULES = ("pandas", "numpy", "pyarrow")
+
+# 代码在 traceback 中显示的文件名
+_CODE_FILENAME = "<agent_code>"
+
+
+# ============================================================
+# 子进程端
+# ============================================================
+
+def _current_rss_mb() -> Optional[float]:
+    """返回当前进程常驻内存（MB），无法获取时返回 None。"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 单位为字节，Linux 为 KB
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except Exception:
+        return None
+
+
+@contextmanager
+def _redirect_fd(fd: int) -> Iterator[IO[bytes]]:
+    """将文件描述符 fd 临时重定向到一个临时文件，退出时恢复。"""
+    with tempfile.TemporaryFile() as tmp:
+        saved = os.dup(fd)
+        os.dup2(tmp.fileno(), fd)
+        try:
+            yield tmp
+        finally:
+            os.dup2(saved, fd)
+            os.close(saved)
+
+
+def _fd_writer(fd: int) -> io.TextIOWrapper:
+    """直接写入 fd 的无缓冲文本流，使 print 与 C 层输出保持原有先后顺序。"""
+    return io.TextIOWrapper(
+        io.FileIO(fd, "w", closefd=False),
+        encoding="utf-8", errors="replace", write_through=True,
+    )
+
+
+def _read_captured(tmp: IO[bytes]) -> str:
+    tmp.seek(0)
+    return tmp.read().decode("utf-8", errors="replace")
+
+
+def _exec_job(code: str, cwd: Optional[str]) -> Dict[str, Any]:
+    """在全新的全局命名空间中执行一段代码，在文件描述符层面捕获 stdout / stderr。"""
+    # 注册源码，保证 traceback 能显示出错行内容
+    linecache.cache[_CODE_FILENAME] = (
+        len(code), None, code.splitlines(True), _CODE_FILENAME,
+    )
+    namespace: Dict[str, Any] = {"__name__": "__main__", "__builtins__": builtins}
+    prev_cwd = os.getcwd()
+    success = True
+
+    sys.__stdout__.flush()
+    sys.__stderr__.flush()
+    with _redirect_fd(1) as out_file, _redirect_fd(2) as err_file:
+        stdout, stderr = _fd_writer(1), _fd_writer(2)
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                if cwd:
+                    os.chdir(cwd)
+                exec(compile(code, _CODE_FILENAME, "exec"), namespace)
+            except SystemExit as e:
+                # 与独立脚本一致：sys.exit(0) / sys.exit() 视为成功
+                if e.code not in (None, 0):
+                    success = False
+                    if not isinstance(e.code, int):
+                        print(e.code, file=sys.stderr)
+            except BaseException:
+                success = False
+                exc_type, exc_value, tb = sys.exc_info()
+                # 跳过 _exec_job 自身的栈帧，输出与直接运行脚本一致的 traceback
+                traceback.print_exception(exc_type, exc_value, tb.tb_next if tb else None)
+            finally:
+                try:
+                    os.chdir(prev_cwd)
+                except OSError:
+                    pass
+                for stream in (sys.stdout, sys.stderr, stdout, stderr):
+                    try:
+                        stream.flush()
+                    except Exception:
+                        pass
+        stdout_text, stderr_text = _read_captured(out_file), _read_captured(err_file)
+
+    namespace.clear()
+    linecache.cache.pop(_CODE_FILENAME, None)
+    return {
+        "success": success,
+        "stdout": stdout_text,
+        "stderr": stderr_text,
+        "rss_mb": _current_rss_mb(),
+    }
+
+
+def _snapshot_process_state() -> Dict[str, Any]:
+    """记录任务可能修改的进程级状态（在预加载之后、第一个任务之前调用）。"""
+    state: Dict[str, Any] = {
+        "environ": dict(os.environ),
+        "path": list(sys.path),
+        "argv": list(sys.argv),
+        "warnings": list(warnings.filters),
+    }
+    if "pandas" in sys.modules:
+        import pandas as pd
+        from pandas._config import config as pd_config
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            state["pandas"] = {key: pd.get_option(key) for key in list(pd_config._registered_options)}
+    if "numpy" in sys.modules:
+        import numpy as np
+
+        state["numpy"] = (np.get_printoptions(), np.geterr())
+    return state
+
+
+def _restore_process_state(state: Dict[str, Any]) -> None:
+    """将进程级状态恢复到 _snapshot_process_state 记录的值（进程被复用时，避免任务之间互相影响）。"""
+    if os.environ != state["environ"]:
+        os.environ.clear()
+        os.environ.update(state["environ"])
+    sys.path[:] = state["path"]
+    sys.argv[:] = state["argv"]
+    warnings.filters[:] = state["warnings"]
+    if "pandas" in state:
+        import pandas as pd
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for key, value in state["pandas"].items():
+                try:
+                    if pd.get_option(key) != value:
+                        pd.set_option(key, value)
+                except Exception:
+                    pass
+    if "numpy" in state:
+        import numpy as np
+
+        printoptions, errstate = state["numpy"]
+        np.set_printoptions(**printoptions)
+        np.seterr(**errstate)
+
+
+def _worker_main(conn, preload_modules: Tuple[str, ...]) -> None:
+    """子进程主循环：预加载模块 → 循环接收代码并返回执行结果。"""
+    import importlib
+
+    for name in preload_modules:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+    sys.stdin = open(os.devnull, "r")
+    state = _snapshot_process_state()
+    conn.send({"ready": True})
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        result = _exec_job(job["code"], job.get("cwd"))
+        _restore_process_state(state)
+        conn.send(result)
+    conn.close()
+
+
+# ============================================================
+# 主进程端
+# ============================================================
+
+class _Worker:
+    """单个常驻子进程的句柄。"""
+
+    def __init__(self, ctx, preload_modules: Tuple[str, ...]):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, preload_modules),
+            name="code-worker",
+        )
+        self.process.start()
+        child_conn.close()
+        self.jobs_done = 0
+        self.rss_mb: Optional[float] = None
+        self._ready = False
+
+    def execute(
+        self,
+        code: str,
+        cwd: Optional[str],
+        timeout: float,
+        startup_timeout: float,
+    ) -> Dict[str, Any]:
+        """
+        发送代码并等待结果。
+
+        Raises:
+            TimeoutError: 执行超时
+            EOFError: 子进程异常退出
+        """
+        if not self._ready:
+            if not self.conn.poll(startup_timeout):
+                raise TimeoutError("工作进程启动超时")
+            self.conn.recv()
+            self._ready = True
+
+        self.conn.send({"code": code, "cwd": cwd})
+        if not self.conn.poll(timeout):
+            raise TimeoutError
+        result = self.conn.recv()
+        self.jobs_done += 1
+        self.rss_mb = result.get("rss_mb")
+        return result
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def close(self, kill: bool = False) -> None:
+        """关闭子进程；kill=True 时直接终止。"""
+        try:
+            if not kill and self.process.is_alive():
+                self.conn.send(None)
+                self.process.join(timeout=2)
+        except Exception:
+            pass
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=2)
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+
+class WarmWorkerPool:
+    """
+    常驻预热 Python 工作进程池（线程安全）。
+
+    Args:
+        size: 进程数量（同时可执行的代码数）
+        max_jobs_per_worker: 单个进程执行多少个任务后回收（1 表示每个任务使用全新进程；<=0 表示不限制）
+        max_memory_mb: 单个进程常驻内存上限（MB），超过后回收；<=0 表示不限制
+        preload_modules: 进程启动时预先 import 的模块
+        startup_timeout: 等待进程完成预加载的超时秒数
+    """
+
+    def __init__(
+        self,
+        size: int = _DEFAULT_POOL_SIZE,
+        max_jobs_per_worker: int = _DEFAULT_MAX_JOBS_PER_WORKER,
+        max_memory_mb: float = _DEFAULT_MAX_MEMORY_MB,
+        preload_modules: Iterable[str] = _DEFAULT_PRELOAD_MODULES,
+        startup_timeout: float = 60.0,
+    ):
+        self.size = max(1, size)
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_memory_mb = max_memory_mb
+        self.preload_modules = tuple(preload_modules)
+        self.startup_timeout = startup_timeout
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: "queue.LifoQueue[_Worker]" = queue.LifoQueue()
+        self._closed = False
+
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+        logger.info(
+            f"[WorkerPool] 已启动 {self.size} 个预热工作进程 "
+            f"(preload={list(self.preload_modules)}, "
+            f"max_jobs={self.max_jobs_per_worker}, max_memory_mb={self.max_memory_mb})"
+        )
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._ctx, self.preload_modules)
+
+    def run(
+        self,
+        code: str,
+        timeout: float,
+        cwd: Optional[str] = None,
+    ) -> Tuple[bool, str, str]:
+        """
+        在空闲工作进程中执行代码。
+
+        Args:
+            code: 完整的 Python 源码
+            timeout: 执行超时秒数
+            cwd: 执行时的工作目录（默认保持子进程当前目录）
+
+        Returns:
+            (success, stdout, stderr)
+
+        Raises:
+            TimeoutError: 执行超时（对应进程已被终止并替换）
+        """
+        if self._closed:
+            raise RuntimeError("WarmWorkerPool 已关闭")
+
+        worker = self._idle.get()
+        broken = False
+        try:
+            result = worker.execute(code, cwd, timeout, self.startup_timeout)
+        except TimeoutError:
+            # 进程可能仍在执行，直接终止
+            broken = True
+            raise
+        except (EOFError, OSError) as e:
+            broken = True
+            worker.process.join(timeout=1)
+            exitcode = worker.process.exitcode
+            return False, "", f"工作进程异常退出 (exitcode={exitcode}): {type(e).__name__}: {e}"
+        except BaseException:
+            broken = True
+            raise
+        finally:
+            if self._closed:
+                # 执行期间进程池已关闭：shutdown 已清空空闲队列，直接关闭该进程
+                worker.close(kill=broken)
+            elif broken or self._should_recycle(worker):
+                worker.close(kill=broken)
+                self._idle.put(self._spawn())
+            else:
+                self._idle.put(worker)
+
+        return result["success"], result["stdout"], result["stderr"]
+
+    def _should_recycle(self, worker: _Worker) -> bool:
+        if not worker.is_alive():
+            return True
+        if self.max_jobs_per_worker > 0 and worker.jobs_done >= self.max_jobs_per_worker:
+            if self.max_jobs_per_worker > 1:
+                logger.info(f"[WorkerPool] 进程已执行 {worker.jobs_done} 个任务，回收")
+            return True
+        if (
+            self.max_memory_mb > 0
+            and worker.rss_mb is not None
+            and worker.rss_mb > self.max_memory_mb
+        ):
+            logger.info(
+                f"[WorkerPool] 进程内存 {worker.rss_mb:.0f}MB 超过上限 "
+                f"{self.max_memory_mb:.0f}MB，回收"
+            )
+            return True
+        return False
+
+    def shutdown(self) -> None:
+        """关闭所有工作进程。"""
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.close()
+
+
+# ============================================================
+# 模块级单例
+# ============================================================
+
+_default_pool: Optional[WarmWorkerPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> WarmWorkerPool:
+    """获取（或创建）进程级共享的默认工作进程池"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = WarmWorkerPool()
+            atexit.register(shutdown_worker_pool)
+        return _default_pool
+
+
+def shutdown_worker_pool() -> None:
+    """关闭默认工作进程池（进程退出时自动调用）"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is not None:
+            _default_pool.shutdown()
+            _default_pool = None